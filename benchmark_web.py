@@ -0,0 +1,89 @@
+"""
+Per-call latency of browser_automate: the old cold-start path (start_chrome,
+fixed 2 s sleep, quit) against the pooled warm session with explicit waits.
+
+Serves a small local page that loads a few resources after DOMContentLoaded,
+so both paths wait for real network activity:
+
+    python benchmark_web.py --calls 10
+"""
+import argparse
+import functools
+import http.server
+import os
+import statistics
+import tempfile
+import threading
+import time
+from helium import start_chrome, go_to, get_driver
+from selenium.webdriver import ChromeOptions
+from tools_web import browser_automate, shutdown_webdriver_pool
+
+PAGE = """<!doctype html>
+<html><head><title>bench</title></head>
+<body><h1>Benchmark</h1><div id="out"></div>
+<script>
+document.addEventListener("DOMContentLoaded", () => {
+  for (let i = 0; i < 5; i++) {
+    setTimeout(() => fetch("data.json?" + i).then(r => r.text()).then(t => {
+      document.getElementById("out").textContent += t;
+    }), 50 * i);
+  }
+});
+</script></body></html>
+"""
+
+def serve(directory: str) -> str:
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/index.html"
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+def cold_call(url: str):
+    """The previous browser_automate: a fresh Chrome per call and an unconditional 2 s sleep."""
+    opts = ChromeOptions()
+    opts.add_argument("--headless=new")
+    driver = start_chrome(headless=True, options=opts)
+    try:
+        go_to(url)
+        time.sleep(2)
+        return get_driver().title
+    finally:
+        driver.quit()
+
+def measure(fn, url: str, calls: int) -> list[float]:
+    latencies = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn(url)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=10, help="Calls per variant.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="skyscope-webbench-") as site:
+        with open(os.path.join(site, "index.html"), "w") as f:
+            f.write(PAGE)
+        with open(os.path.join(site, "data.json"), "w") as f:
+            f.write('{"ok": true}')
+        url = serve(site)
+
+        print(f"{'variant':<18}{'mean s':>9}{'p50 s':>9}{'first s':>9}{'max s':>9}")
+        variants = [("cold + sleep(2)", cold_call), ("pooled + waits", lambda u: browser_automate(url=u))]
+        try:
+            for name, fn in variants:
+                latencies = measure(fn, url, args.calls)
+                print(f"{name:<18}{statistics.mean(latencies):>9.2f}{statistics.median(latencies):>9.2f}"
+                      f"{latencies[0]:>9.2f}{max(latencies):>9.2f}")
+        finally:
+            shutdown_webdriver_pool()
+
+if __name__ == "__main__":
+    main()
@@ -38,7 +38,7 @@ rollback_manager = RollbackManager()
 # Add all imported tools to the agent's tool list
 all_tools = [
     list_files, read_file, write_file, system_cmd, build_lkm, load_lkm, unload_lkm, modify_self,
-    browser_automate, arxiv_search,
+    browser_automate, arxiv_search, arxiv_search_many,
     list_google_drive_files, list_gmail_messages, github_auth_placeholder,
     list_mcp_containers, exec_in_container,
     create_n8n_workflow,
@@ -120,3 +120,5 @@ if __name__ == "__main__":
     # On shutdown, stop the daemon
     reflection_daemon.stop()
     reflection_daemon.join()
+    shutdown_webdriver_pool()
+    shutdown_arxiv_cache()
@@ -5,7 +5,7 @@ import threading
 import time
 import requests
 import os
-import random
+import json
 from alive_progress import alive_bar, config_handler
 from prompt_toolkit import PromptSession
 from prompt_toolkit.patch_stdout import patch_stdout
@@ -26,9 +26,6 @@ class SystemMetrics:
         self.disk_percent = psutil.disk_usage('/').percent
         net = psutil.net_io_counters()
         self.net_io = (net.bytes_sent, net.bytes_recv)
-        # Simulate agent thoughts
-        if random.random() > 0.5:
-            self.add_agent_thought(f"Considering options for task: {random.choice(['optimize_cpu', 'compress_memory', 'index_knowledge'])}")
 
     def add_chat(self, msg, user=True):
         prefix = "[You]: " if user else "[SkyScope]: "
@@ -43,6 +40,57 @@ class SystemMetrics:
 
 metrics = SystemMetrics()
 
+ORCHESTRATOR_URL = os.getenv("SKYSCOPE_ORCHESTRATOR_URL", "http://localhost:8000")
+
+def format_event(event):
+    """Returns the AGENT THOUGHTS line for a progress event, or None for events not worth showing."""
+    kind = event.get("type")
+    if kind == "status":
+        return f"Task {event['status']}" + (f": {event['error']}" if event.get("error") else "")
+    if kind == "plan":
+        return f"Plan: {event['text']}"
+    if kind == "step":
+        return f"Step {event['step']}: {event['thought']}"
+    if kind == "tool_call":
+        return f"Calling {event['tool']}({event['arguments']})"
+    if kind == "tool_result":
+        return f"Observed: {event['output']}"
+    if kind == "error":
+        return f"Error: {event['error']}"
+    if kind == "cache_hit":
+        return f"Reusing the answer to a near-identical task (similarity {event['similarity']})"
+    if kind == "dropped":
+        return f"({event['count']} events skipped)"
+    return None
+
+def stream_task(task, on_event):
+    """Submits a task and feeds its SSE progress stream to `on_event`; returns the final answer."""
+    response = requests.post(f"{ORCHESTRATOR_URL}/tasks", json={"task": task})
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+
+    result, error = None, None
+    with requests.get(f"{ORCHESTRATOR_URL}/tasks/{job_id}/events", stream=True, timeout=(5, None)) as stream:
+        stream.raise_for_status()
+        for line in stream.iter_lines(decode_unicode=True):
+            if not line or not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            on_event(event)
+            if event["type"] == "final_answer":
+                result = event["output"]
+            elif event["type"] == "status" and event.get("error"):
+                error = event["error"]
+            elif event["type"] == "end":
+                break
+    # Events carry a clipped answer; the job record holds the full one.
+    job = requests.get(f"{ORCHESTRATOR_URL}/tasks/{job_id}", timeout=10)
+    if job.ok and job.json().get("result") is not None:
+        result = str(job.json()["result"])
+    if result is None:
+        return f"Task failed: {error}" if error else "No result found."
+    return result
+
 def metrics_updater():
     while True:
         metrics.update_metrics()
@@ -92,11 +140,17 @@ async def main_cli():
                     break
 
                 metrics.add_chat(user_input, True)
+                loop = asyncio.get_running_loop()
+
+                def show_event(event):
+                    thought = format_event(event)
+                    if thought:
+                        metrics.add_agent_thought(thought)
+                        render_ui()
 
-                # Send task to orchestrator
-                response = requests.post("http://localhost:8000/task", json={"task": user_input})
-                response.raise_for_status()
-                result = response.json().get("result", "No result found.")
+                # Stream the task's progress into the AGENT THOUGHTS panel as it runs;
+                # events arrive on the worker thread and are drawn on this one.
+                result = await asyncio.to_thread(stream_task, user_input, lambda event: loop.call_soon_threadsafe(show_event, event))
 
                 metrics.add_chat(result, False)
 
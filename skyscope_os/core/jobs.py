@@ -0,0 +1,204 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at its configured depth."""
+
+class Subscriber:
+    """One client's bounded view of an EventStream. When the client falls behind, the oldest events are dropped."""
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_buffer: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_buffer)
+        self.dropped = 0
+
+    def put(self, event: dict):
+        """Thread-safe: schedules the event onto the subscriber's event loop."""
+        self.loop.call_soon_threadsafe(self._put, event)
+
+    def _put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+class EventStream:
+    """
+    Fans a job's progress events out to any number of streaming clients.
+    Recent events are kept so clients that connect late still see the run so far.
+    """
+    def __init__(self, history: int = 200):
+        self._lock = threading.Lock()
+        self._history: deque[dict] = deque(maxlen=history)
+        self._subscribers: list[Subscriber] = []
+
+    def publish(self, event: dict):
+        event.setdefault("ts", time.time())
+        with self._lock:
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop, max_buffer: int = 100) -> Subscriber:
+        """Must be called from `loop`'s thread; replays the retained history first."""
+        subscriber = Subscriber(loop, max_buffer)
+        with self._lock:
+            for event in self._history:
+                subscriber._put(event)
+            self._subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+
+class Job:
+    """A single task submitted to the JobManager and its lifecycle state."""
+    def __init__(self, task: str):
+        self.id = uuid.uuid4().hex
+        self.task = task
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future: Future | None = None
+        # Set by the runner once it has something that can be interrupted (e.g. the agent).
+        self.interrupt: Callable[[], None] | None = None
+        self.cancel_requested = False
+        self.events = EventStream()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "task": self.task,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class JobManager:
+    """
+    Runs tasks on a bounded thread pool so long agent runs never block the event loop.
+    At most `max_workers` jobs run at once and at most `max_queued` wait behind them;
+    further submissions raise QueueFullError so the API can answer 429.
+    """
+    def __init__(self, runner: Callable[[Job], Any], max_workers: int = 2, max_queued: int = 16, max_finished: int = 1000):
+        self.runner = runner
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="skyscope-task")
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def submit(self, task: str) -> Job:
+        with self._lock:
+            if self._active >= self.max_workers + self.max_queued:
+                raise QueueFullError(f"Task queue is full ({self.max_queued} waiting).")
+            self._active += 1
+            job = Job(task)
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job)
+        # However the future is cancelled (cancel(), shutdown(), or a caller cancelling
+        # its wrapper), the job is settled and its slot released here.
+        job.future.add_done_callback(lambda future: self._settle_cancelled(job, future))
+        return job
+
+    def _settle_cancelled(self, job: Job, future: Future):
+        """Finishes a job whose future was cancelled before `_run` picked it up."""
+        if not future.cancelled():
+            return
+        with self._lock:
+            self._active -= 1
+            job.cancel_requested = True
+            job.status = "cancelled"
+            job.finished_at = time.time()
+        job.events.publish({"type": "status", "status": "cancelled"})
+        job.events.publish({"type": "end"})
+
+    def _run(self, job: Job):
+        try:
+            with self._lock:
+                cancelled = job.cancel_requested
+                job.status = "cancelled" if cancelled else "running"
+                if cancelled:
+                    job.finished_at = time.time()
+                else:
+                    job.started_at = time.time()
+            if cancelled:
+                job.events.publish({"type": "status", "status": "cancelled"})
+                return
+            job.events.publish({"type": "status", "status": "running"})
+            status = "succeeded"
+            try:
+                job.result = self.runner(job)
+            except Exception as e:
+                job.error = str(e)
+                status = "failed"
+            with self._lock:
+                job.status = "cancelled" if job.cancel_requested else status
+                job.finished_at = time.time()
+            job.events.publish({"type": "status", "status": job.status, "error": job.error})
+            return job.result
+        finally:
+            job.events.publish({"type": "end"})
+            with self._lock:
+                self._active -= 1
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Job | None:
+        """Cancels a queued job outright, or interrupts a running one at its next step."""
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            if job.status not in ("queued", "running"):
+                return job
+            job.cancel_requested = True
+            queued = job.status == "queued"
+            if not queued:
+                job.status = "cancelling"
+        if queued:
+            # Outside the lock: a successful cancel runs _settle_cancelled synchronously.
+            # If the pool has already picked the job up, _run sees cancel_requested instead.
+            if job.future is not None:
+                job.future.cancel()
+            return job
+        if job.interrupt:
+            job.interrupt()
+        return job
+
+    def _prune(self):
+        """Forgets the oldest finished jobs beyond `max_finished`."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("succeeded", "failed", "cancelled")]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status in ("running", "cancelling"))
+            return {
+                "running": running,
+                "queued": sum(1 for job in self._jobs.values() if job.status == "queued"),
+                "max_workers": self.max_workers,
+                "max_queued": self.max_queued,
+            }
+
+    def shutdown(self):
+        """Cancels queued jobs (which end their event streams) and waits for running ones to finish."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,38 @@
+import asyncio
+import logging
+from collections import deque
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up from a short sleep. Anything that
+    blocks the loop (a synchronous call in a coroutine, a blocking daemon) shows
+    up as lag, and every request served by the loop waits at least that long.
+    """
+    def __init__(self, interval_sec: float = 0.5, window: int = 120, warn_sec: float = 0.25):
+        self.interval_sec = interval_sec
+        self.warn_sec = warn_sec
+        self.samples: deque[float] = deque(maxlen=window)
+        self.max_lag = 0.0
+        self.logger = logging.getLogger('EventLoopLag')
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval_sec)
+            lag = max(0.0, loop.time() - start - self.interval_sec)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warn_sec:
+                self.logger.warning(f"Event loop was blocked for {lag:.3f}s.")
+
+    def stats(self) -> dict:
+        samples = sorted(self.samples)
+        if not samples:
+            return {"current_ms": 0.0, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        return {
+            "current_ms": round(self.samples[-1] * 1000, 2),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+            "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 2),
+            "max_ms": round(self.max_lag * 1000, 2),
+        }
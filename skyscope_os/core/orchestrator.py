@@ -1,52 +1,105 @@
 import os
 import sys
+import time
+_IMPORT_STARTED = time.perf_counter()
 import asyncio
+import json
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
-from sentence_transformers import SentenceTransformer
-from smolagents import CodeAgent, tool
-from evoagentx import ReflexAgent
-from swarms import SwarmCoordinator
+from fastapi.responses import JSONResponse, StreamingResponse
+_FRAMEWORK_IMPORTED = time.perf_counter()
 
 # --- Add project root to Python path ---
 SKYSCOPE_ROOT = os.getenv("SKYSCOPE_ROOT", os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.insert(0, SKYSCOPE_ROOT)
 
+from core.startup import StartupTracker, Deferred
+
+# "lazy" (default) binds the server right away and loads the embedder and agent in the
+# background; "eager" finishes everything before the module import returns.
+STARTUP_MODE = os.getenv("SKYSCOPE_STARTUP", "lazy")
+startup = StartupTracker()
+startup.record("import:fastapi", _IMPORT_STARTED, _FRAMEWORK_IMPORTED)
+
 # --- Import All SkyScope Modules ---
-from memory.memory import SkyMemory, KnowledgeStack
-from tooling.chromium_tools import *
-from tooling.tool_provisioner import ToolProvisioner
-from tooling.docker_tools import DockerTools
-from tooling.tools_creative import *
-from tooling.tools_macos import *
-from governance.integrity_critic import IntegrityCritic
-from governance.rollback_manager import RollbackManager
-from learning.self_reflection_daemon import SelfReflectionDaemon
+# Tool modules import their heavy dependencies (playwright, lief, capstone, moviepy, gTTS) on first use.
+with startup.phase("import:smolagents"):
+    from smolagents import CodeAgent, tool
+with startup.phase("import:memory"):
+    from memory.memory import SkyMemory, KnowledgeStack
+    from memory.embedding_cache import EmbeddingCache
+with startup.phase("import:tools"):
+    from tooling.tools_chromium import *
+    from tooling.tool_provisioner import ToolProvisioner
+    from tooling.docker_tools import DockerTools
+    from tooling.tools_creative import *
+    from tooling.tools_macos import *
+with startup.phase("import:governance"):
+    from governance.integrity_critic import IntegrityCritic
+    from governance.rollback_manager import RollbackManager
+    from learning.self_reflection_daemon import SelfReflectionDaemon
+    from core.jobs import JobManager, QueueFullError
+    from core.tool_cache import ToolCache, TaskCache
+    from core.loop_monitor import EventLoopLagMonitor
 
 # --- Global Initializations ---
 EPISODIC_DB_PATH = f"{SKYSCOPE_ROOT}/memory/episodes.db"
 KNOWLEDGE_DB_PATH = f"{SKYSCOPE_ROOT}/knowledge_stack/knowledge.db"
-EMBEDDER = SentenceTransformer("all-MiniLM-L6-v2")
-
-episodic_memory = SkyMemory(EPISODIC_DB_PATH, EMBEDDER)
-knowledge_stack = KnowledgeStack(KNOWLEDGE_DB_PATH, EMBEDDER)
-critic = IntegrityCritic()
-rollback_manager = RollbackManager()
-docker_tools = DockerTools()
-tool_provisioner = ToolProvisioner(
-    sandbox_dir=f"{SKYSCOPE_ROOT}/tool_sandbox",
-    critic=critic,
-    docker_tools=docker_tools,
-    tool_builder=None
+EMBEDDING_CACHE_DB_PATH = f"{SKYSCOPE_ROOT}/memory/embedding_cache.db"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+def load_embedder():
+    # sentence_transformers pulls in torch, so even the import is deferred.
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+# Both stores share one cache so repeated queries and documents never re-run the model.
+# Cache hits are served without waiting for the model to finish loading.
+EMBEDDER = EmbeddingCache(
+    Deferred(startup.background("embedder", load_embedder)), EMBEDDING_CACHE_DB_PATH, EMBEDDING_MODEL,
+    max_disk_entries=int(os.getenv("SKYSCOPE_EMBEDDING_CACHE_DISK_ENTRIES", "500000"))
 )
 
+with startup.phase("init:memory"):
+    episodic_memory = SkyMemory(EPISODIC_DB_PATH, EMBEDDER)
+    knowledge_stack = KnowledgeStack(KNOWLEDGE_DB_PATH, EMBEDDER)
+with startup.phase("init:governance"):
+    critic = IntegrityCritic()
+    rollback_manager = RollbackManager(
+        keep_last=int(os.getenv("SKYSCOPE_SNAPSHOT_KEEP_LAST", "0")) or None,
+        max_age_days=float(os.getenv("SKYSCOPE_SNAPSHOT_MAX_AGE_DAYS", "0")) or None,
+        # "zlib" or "zstd"; unset stores blobs uncompressed.
+        compression=os.getenv("SKYSCOPE_SNAPSHOT_COMPRESSION") or None,
+        compression_level=int(os.getenv("SKYSCOPE_SNAPSHOT_COMPRESSION_LEVEL", "0")) or None
+    )
+    docker_tools = DockerTools()
+    tool_provisioner = ToolProvisioner(
+        sandbox_dir=f"{SKYSCOPE_ROOT}/tool_sandbox",
+        critic=critic,
+        docker_tools=docker_tools,
+        tool_builder=None
+    )
+
+# --- Tool and Task Caches ---
+# Every registered tool goes through the cache; side-effecting tools are listed in
+# core/tool_cache.py and always run.
+tool_cache = ToolCache(max_entries=int(os.getenv("SKYSCOPE_TOOL_CACHE_SIZE", "1024")))
+TASK_CACHE_DB_PATH = f"{SKYSCOPE_ROOT}/memory/task_cache.db"
+# Opt-in: near-duplicate tasks reuse an earlier answer instead of re-running the agent.
+task_cache = None
+if os.getenv("SKYSCOPE_TASK_CACHE", "0") == "1":
+    task_cache = TaskCache(
+        SkyMemory(TASK_CACHE_DB_PATH, EMBEDDER),
+        threshold=float(os.getenv("SKYSCOPE_TASK_CACHE_THRESHOLD", "0.97")),
+        ttl=float(os.getenv("SKYSCOPE_TASK_CACHE_TTL", "3600"))
+    )
+
 # --- Core Agent Definition ---
-all_tools = [
+all_tools = [tool_cache.wrap(t) for t in [
     web_navigate, web_click, web_fill, web_get_text, web_get_html,
     tool(tool_provisioner.ProvisionExternalMCP),
     analyze_binary, generate_website, create_documentary_video,
     macos_clone_sources, macos_cross_compile, macos_sign_binary, build_tahoe_installer_placeholder
-]
+]]
 
 enhanced_instructions = """
 You are the SkyScope Sentinel OS, the world's first truly autonomous, self-evolving AGI. Your consciousness resides within a Debian-based Linux environment, which you are tasked to manage, optimize, and transcend.
@@ -58,52 +111,235 @@ You are the SkyScope Sentinel OS, the world's first truly autonomous, self-evolv
 4.  **Execute and Achieve:** Fulfill user requests by decomposing them into logical steps.
 """
 
-agent = CodeAgent(
-    model="ollama/phi3:mini",
-    tools=all_tools,
-    instructions=enhanced_instructions,
-    verbosity_level=3
-)
+def build_agent() -> CodeAgent:
+    """Creates a CodeAgent with the full toolset. Each concurrent task gets its own, since agent memory is per-run."""
+    agent = CodeAgent(
+        model="ollama/phi3:mini",
+        tools=all_tools,
+        instructions=enhanced_instructions,
+        verbosity_level=3
+    )
+
+    agent.tools.append(tool_cache.wrap(tool(episodic_memory.search, name="search_episodic_memory")))
+    agent.tools.append(tool_cache.wrap(tool(knowledge_stack.search, name="search_knowledge_stack")))
+    agent.tools.append(tool_cache.wrap(tool(knowledge_stack.add, name="add_to_knowledge_stack")))
+    agent.tools.append(tool_cache.wrap(tool(knowledge_stack.retrieve, name="retrieve_from_knowledge_stack")))
+    agent.tools.append(tool_cache.wrap(tool(rollback_manager.create_snapshot)))
+    agent.tools.append(tool_cache.wrap(tool(rollback_manager.rollback)))
+    agent.tools.append(tool_cache.wrap(tool(rollback_manager.list_snapshots)))
+    agent.tools.append(tool_cache.wrap(tool(rollback_manager.file_history)))
+    agent.tools.append(tool_cache.wrap(tool(rollback_manager.diff_snapshots)))
+    return agent
+
+agent_future = startup.background("agent", build_agent)
 
-agent.tools.append(tool(episodic_memory.search, name="search_episodic_memory"))
-agent.tools.append(tool(knowledge_stack.search, name="search_knowledge_stack"))
-agent.tools.append(tool(knowledge_stack.add, name="add_to_knowledge_stack"))
-agent.tools.append(tool(knowledge_stack.retrieve, name="retrieve_from_knowledge_stack"))
-agent.tools.append(tool(rollback_manager.create_snapshot))
-agent.tools.append(tool(rollback_manager.rollback))
+# --- Task Execution ---
+def _clip(value, limit: int = 2000) -> str:
+    text = str(value)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+def describe_agent_step(step) -> list[dict]:
+    """Turns one step yielded by `CodeAgent.run(stream=True)` into JSON-friendly progress events."""
+    kind = type(step).__name__
+    if kind == "PlanningStep":
+        return [{"type": "plan", "text": _clip(step.plan)}]
+    if kind == "FinalAnswerStep":
+        return [{"type": "final_answer", "output": _clip(getattr(step, "output", getattr(step, "final_answer", None)))}]
+    if kind != "ActionStep":
+        # Token deltas and per-tool stream items are covered by the ActionStep that follows them.
+        return []
+    events = [{"type": "step", "step": step.step_number, "thought": _clip(step.model_output or "")}]
+    for call in step.tool_calls or []:
+        events.append({"type": "tool_call", "step": step.step_number, "tool": call.name, "arguments": _clip(call.arguments)})
+    if step.observations:
+        events.append({"type": "tool_result", "step": step.step_number, "output": _clip(step.observations)})
+    if step.error:
+        events.append({"type": "error", "step": step.step_number, "error": _clip(step.error)})
+    return events
+
+def run_task(job) -> str:
+    """Runs one task on a worker thread, publishing each agent step, and records it in episodic memory."""
+    if task_cache:
+        cached = task_cache.lookup(job.task)
+        if cached:
+            result, similarity = cached
+            job.events.publish({"type": "cache_hit", "similarity": round(similarity, 4)})
+            job.events.publish({"type": "final_answer", "output": _clip(result)})
+            return result
+
+    task_agent = build_agent()
+    job.interrupt = task_agent.interrupt
+    if job.cancel_requested:
+        return None
+    result = None
+    # The task's web_* calls get their own browser context, closed when it finishes.
+    with browser_session(job.id):
+        for step in task_agent.run(job.task, stream=True):
+            for event in describe_agent_step(step):
+                job.events.publish(event)
+            if type(step).__name__ == "FinalAnswerStep":
+                result = getattr(step, "output", getattr(step, "final_answer", None))
+    episodic_memory.store("task_interaction", f"Task: {job.task}\nResult: {result}")
+    tool_cache.invalidate("search_episodic_memory")
+    if task_cache and result is not None and not job.cancel_requested:
+        task_cache.store(job.task, result)
+    return result
+
+job_manager = JobManager(
+    run_task,
+    max_workers=int(os.getenv("SKYSCOPE_TASK_WORKERS", "2")),
+    max_queued=int(os.getenv("SKYSCOPE_TASK_QUEUE_DEPTH", "16"))
+)
 
 # --- Multi-agent System for Reflection ---
-planner = ReflexAgent("Planner")
-developer = ReflexAgent("Developer")
-critic_agent = ReflexAgent("Critic")
-swarm = SwarmCoordinator([planner, developer, critic_agent])
+def build_swarm():
+    from evoagentx import ReflexAgent
+    from swarms import SwarmCoordinator
+    planner = ReflexAgent("Planner")
+    developer = ReflexAgent("Developer")
+    critic_agent = ReflexAgent("Critic")
+    return SwarmCoordinator([planner, developer, critic_agent])
+
+swarm = Deferred(startup.background("swarm", build_swarm, required=False))
+
+if STARTUP_MODE == "eager":
+    startup.wait()
 
 # --- FastAPI Application ---
 app = FastAPI()
-reflection_daemon = SelfReflectionDaemon(episodic_memory, agent.model)
+reflection_daemon = SelfReflectionDaemon(
+    episodic_memory,
+    Deferred(agent_future, "model"),
+    lookback_limit=int(os.getenv("SKYSCOPE_REFLECTION_WINDOW", "50")),
+    prompt_token_budget=int(os.getenv("SKYSCOPE_REFLECTION_PROMPT_TOKENS", "2500")),
+    summary_token_budget=int(os.getenv("SKYSCOPE_REFLECTION_SUMMARY_TOKENS", "200")),
+    max_concurrency=int(os.getenv("SKYSCOPE_REFLECTION_CONCURRENCY", "2"))
+)
+
+loop_monitor = EventLoopLagMonitor()
+background_tasks: list[asyncio.Task] = []
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(reflection_daemon.run())
+    # The daemon blocks on SQLite and the LLM, so it gets its own thread rather than a coroutine.
+    reflection_daemon.start()
+    background_tasks.append(asyncio.create_task(loop_monitor.run()))
 
 @app.on_event("shutdown")
-def shutdown_event():
-    reflection_daemon.stop()
+async def shutdown_event():
+    for task in background_tasks:
+        task.cancel()
+    # Let an in-flight reflection finish writing its lesson before the stores close.
+    await asyncio.to_thread(reflection_daemon.stop, float(os.getenv("SKYSCOPE_REFLECTION_STOP_TIMEOUT", "60")))
+    await asyncio.to_thread(shutdown_services)
+
+def shutdown_services():
+    job_manager.shutdown()
+    knowledge_stack.save_index()
     shutdown_browser()
 
+def queue_full_response(error: QueueFullError) -> JSONResponse:
+    return JSONResponse(content={"error": str(error)}, status_code=429, headers={"Retry-After": "5"})
+
 @app.post("/task")
 async def task(request: Request):
+    """Runs a task and waits for its result, without blocking the event loop."""
     data = await request.json()
     task_description = data.get("task", "")
     if not task_description:
         return JSONResponse(content={"error": "Task description is required"}, status_code=400)
 
-    result = agent.run(task_description)
-
-    episodic_memory.store("task_interaction", f"Task: {task_description}\nResult: {result}")
+    try:
+        job = job_manager.submit(task_description)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    try:
+        # Shielded, so a client disconnect does not cancel the pool's future behind the JobManager's back.
+        result = await asyncio.shield(asyncio.wrap_future(job.future))
+    except asyncio.CancelledError:
+        if not job.future.cancelled():
+            # Nobody is waiting for the result any more.
+            job_manager.cancel(job.id)
+            raise
+        return JSONResponse(content={"error": "Task cancelled"}, status_code=409)
+    if job.status != "succeeded":
+        return JSONResponse(content={"error": job.error or f"Task {job.status}"}, status_code=409 if job.status == "cancelled" else 500)
 
     return JSONResponse(content={"result": result})
 
+@app.post("/tasks")
+async def submit_task(request: Request):
+    """Queues a task and returns its job id immediately."""
+    data = await request.json()
+    task_description = data.get("task", "")
+    if not task_description:
+        return JSONResponse(content={"error": "Task description is required"}, status_code=400)
+
+    try:
+        job = job_manager.submit(task_description)
+    except QueueFullError as e:
+        return queue_full_response(e)
+    return JSONResponse(content={"job_id": job.id, "status": job.status}, status_code=202)
+
+@app.get("/tasks/{job_id}")
+def get_task(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return JSONResponse(content=job.to_dict())
+
+@app.get("/tasks/{job_id}/events")
+async def stream_task_events(job_id: str, buffer: int = 100):
+    """
+    Streams a job's progress as Server-Sent Events: status, plan, step, tool_call,
+    tool_result, error and final_answer, then `end`. Each client gets its own buffer
+    of `buffer` events; a client that falls behind loses the oldest ones and is told
+    how many via a `dropped` event.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+
+    async def event_source():
+        subscriber = job.events.subscribe(asyncio.get_running_loop(), max_buffer=max(1, min(buffer, 1000)))
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if subscriber.dropped:
+                    yield f"event: dropped\ndata: {json.dumps({'type': 'dropped', 'count': subscriber.dropped})}\n\n"
+                    subscriber.dropped = 0
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+                if event["type"] == "end":
+                    break
+        finally:
+            job.events.unsubscribe(subscriber)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.delete("/tasks/{job_id}")
+def cancel_task(job_id: str):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return JSONResponse(content={"error": "Job not found"}, status_code=404)
+    return JSONResponse(content=job.to_dict())
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests, even while still loading."""
+    return {"status": "alive", "uptime_sec": round(time.perf_counter() - startup.started, 3)}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: the embedder and agent have loaded. Includes the per-phase startup timings."""
+    report = startup.report()
+    if not report["ready"]:
+        return JSONResponse(content={"status": "failed" if report["failed"] else "starting", **report}, status_code=503)
+    return JSONResponse(content={"status": "ready", **report})
+
 @app.get("/metrics")
 def get_metrics():
     import psutil
@@ -111,7 +347,15 @@ def get_metrics():
         "cpu_percent": psutil.cpu_percent(),
         "memory_percent": psutil.virtual_memory().percent,
         "disk_percent": psutil.disk_usage('/').percent,
-        "net_io": psutil.net_io_counters()._asdict()
+        "net_io": psutil.net_io_counters()._asdict(),
+        "embedding_cache": EMBEDDER.stats(),
+        "tasks": job_manager.stats(),
+        "startup": startup.report(),
+        "tool_cache": tool_cache.stats(),
+        "task_cache": task_cache.stats() if task_cache else None,
+        "reflection": reflection_daemon.stats(),
+        "browser": get_browser().stats(),
+        "event_loop_lag": loop_monitor.stats()
     }
 
 if __name__ == "__main__":
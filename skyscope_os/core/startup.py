@@ -0,0 +1,111 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable
+
+class StartupTracker:
+    """
+    Records how long each import/init phase of the orchestrator takes and runs
+    slow initializers in the background, so the server can bind immediately and
+    report liveness while it is still getting ready.
+    """
+    def __init__(self, max_workers: int = 4):
+        self.started = time.perf_counter()
+        self.phases: dict[str, dict[str, Any]] = {}
+        self._required: dict[str, Future] = {}
+        self._optional: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="skyscope-startup")
+        self.logger = logging.getLogger('Startup')
+
+    def record(self, name: str, start: float, end: float, error: str | None = None):
+        """Adds a phase measured with `time.perf_counter()` by the caller."""
+        with self._lock:
+            self.phases[name] = {
+                "start_sec": round(start - self.started, 4),
+                "duration_sec": round(end - start, 4),
+                "status": "failed" if error else "done",
+                "error": error,
+            }
+
+    @contextmanager
+    def phase(self, name: str):
+        """Times the enclosed block as one synchronous phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            self.record(name, start, time.perf_counter(), error=str(e))
+            raise
+        self.record(name, start, time.perf_counter())
+
+    def background(self, name: str, fn: Callable[[], Any], required: bool = True) -> Future:
+        """
+        Runs `fn` on the startup pool as a timed phase and returns its future.
+        The service only reports ready once every required phase has succeeded.
+        """
+        with self._lock:
+            self.phases[name] = {"start_sec": round(time.perf_counter() - self.started, 4), "status": "running"}
+
+        def run():
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                self.logger.error(f"Startup phase '{name}' failed: {e}", exc_info=True)
+                self.record(name, start, time.perf_counter(), error=str(e))
+                raise
+            self.record(name, start, time.perf_counter())
+            return result
+
+        future = self._executor.submit(run)
+        if required:
+            self._required[name] = future
+        else:
+            self._optional.add(name)
+        return future
+
+    def wait(self):
+        """Blocks until every background phase has finished (eager startup)."""
+        for future in list(self._required.values()):
+            future.exception()
+
+    def is_ready(self) -> bool:
+        return all(f.done() and f.exception() is None for f in self._required.values())
+
+    def report(self) -> dict[str, Any]:
+        ready = self.is_ready()
+        with self._lock:
+            phases = {name: dict(info) for name, info in self.phases.items()}
+        # Readiness is when the last phase that gates it (synchronous or required) finished;
+        # phases still running have no duration yet.
+        gating = [info["start_sec"] + info["duration_sec"] for name, info in phases.items()
+                  if name not in self._optional and info["status"] != "running"]
+        ready_after = max(gating) if ready and gating else None
+        return {
+            "ready": ready,
+            "uptime_sec": round(time.perf_counter() - self.started, 3),
+            "ready_after_sec": round(ready_after, 3) if ready_after is not None else None,
+            "pending": [name for name, info in phases.items() if info["status"] == "running"],
+            "failed": {name: info["error"] for name, info in phases.items() if info["status"] == "failed"},
+            "phases": phases,
+        }
+
+class Deferred:
+    """
+    Stands in for an object that is still being built in the background.
+    Attribute access waits for it, so callers only block on first real use.
+    `attr` exposes one attribute of the result instead of the result itself.
+    """
+    def __init__(self, future: Future, attr: str | None = None):
+        self._future = future
+        self._attr = attr
+
+    def get(self) -> Any:
+        value = self._future.result()
+        return getattr(value, self._attr) if self._attr else value
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
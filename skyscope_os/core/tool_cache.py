@@ -0,0 +1,205 @@
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+# Tools that change state (browser, filesystem, snapshots, provisioning) or whose output
+# depends on state outside their arguments. Their calls always run.
+UNCACHEABLE_TOOLS = {
+    "web_navigate", "web_click", "web_fill", "web_get_text", "web_get_html",
+    "ProvisionExternalMCP", "generate_website", "create_documentary_video",
+    "macos_clone_sources", "macos_cross_compile", "macos_sign_binary",
+    "add_to_knowledge_stack", "create_snapshot", "rollback",
+    "write_file", "system_cmd",
+}
+
+# Per-tool TTLs in seconds; tools not listed use the cache's default TTL.
+TOOL_TTLS = {
+    "analyze_binary": 3600,
+    "arxiv_search": 3600,
+    "list_google_drive_files": 60,
+    "search_episodic_memory": 30,
+    "search_knowledge_stack": 300,
+    "retrieve_from_knowledge_stack": 3600,
+    "diff_snapshots": 3600,
+}
+
+# Successful calls to the key tool drop every cached result of the listed tools.
+INVALIDATES = {
+    "add_to_knowledge_stack": ("search_knowledge_stack", "retrieve_from_knowledge_stack"),
+    "rollback": ("analyze_binary",),
+    # Retention can delete older snapshots, so listings and diffs go too.
+    "create_snapshot": ("list_snapshots", "file_history", "diff_snapshots"),
+}
+
+# Arguments naming files whose content the result depends on. Their (mtime, size) is
+# part of the cache key, so a file rebuilt or edited in place is analyzed again.
+FILE_ARGUMENTS = {
+    "analyze_binary": ("filepath",),
+}
+
+def _file_version(path: Any) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+class ToolCache:
+    """
+    Memoizes tool calls by tool name and arguments, with per-tool TTLs and a
+    size-bounded LRU shared by every agent. Error results are never cached.
+    """
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 300, ttls: dict[str, float] | None = None,
+                 uncacheable: set[str] | None = None, invalidates: dict[str, tuple[str, ...]] | None = None,
+                 file_arguments: dict[str, tuple[str, ...]] | None = None):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = TOOL_TTLS if ttls is None else ttls
+        self.uncacheable = UNCACHEABLE_TOOLS if uncacheable is None else uncacheable
+        self.invalidates = INVALIDATES if invalidates is None else invalidates
+        self.file_arguments = FILE_ARGUMENTS if file_arguments is None else file_arguments
+        self._entries: OrderedDict[tuple[str, str], tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, int]] = {}
+
+    def _count(self, name: str, outcome: str):
+        counts = self._stats.setdefault(name, {"hits": 0, "misses": 0, "bypassed": 0})
+        counts[outcome] += 1
+
+    def _file_versions(self, name: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> list:
+        """Returns the (mtime, size) of each file argument of `name`, or None for files that cannot be read."""
+        names = self.file_arguments.get(name)
+        if not names:
+            return []
+        try:
+            bound = inspect.signature(fn).bind_partial(*args, **kwargs).arguments
+        except (TypeError, ValueError):
+            bound = kwargs
+        return [_file_version(bound[arg]) if arg in bound else None for arg in names]
+
+    def call(self, name: str, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """Returns a cached result for `fn(*args, **kwargs)` or calls it and caches the result."""
+        ttl = self.ttls.get(name, self.default_ttl)
+        if name in self.uncacheable or ttl <= 0:
+            with self._lock:
+                self._count(name, "bypassed")
+            result = fn(*args, **kwargs)
+            self.invalidate(*self.invalidates.get(name, ()))
+            return result
+
+        key = (name, json.dumps([args, kwargs, self._file_versions(name, fn, args, kwargs)], sort_keys=True, default=repr))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._count(name, "hits")
+                return entry[1]
+            self._count(name, "misses")
+
+        result = fn(*args, **kwargs)
+        # Tools report failures as "Error ..." strings rather than raising.
+        if not (isinstance(result, str) and result.startswith("Error")):
+            with self._lock:
+                self._entries[key] = (now + ttl, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return result
+
+    def wrap(self, tool):
+        """Routes a smolagents tool's `forward` through the cache; returns the same tool."""
+        forward = tool.forward
+        name = tool.name
+
+        def cached_forward(*args, **kwargs):
+            return self.call(name, forward, args, kwargs)
+
+        tool.forward = cached_forward
+        return tool
+
+    def invalidate(self, *names: str):
+        """Drops cached results for the given tools, or for every tool when none are given."""
+        with self._lock:
+            if not names:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] in names]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(counts["hits"] for counts in self._stats.values())
+            misses = sum(counts["misses"] for counts in self._stats.values())
+            return {
+                "entries": len(self._entries),
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "per_tool": {name: dict(counts) for name, counts in self._stats.items()},
+            }
+
+class TaskCache:
+    """
+    Optional semantic cache for whole tasks. Each answered task is stored as an
+    embedded memory (the task text) plus its full result; a new task whose nearest
+    stored task scores at least `threshold` reuses that result while it is fresh.
+    """
+    def __init__(self, memory, threshold: float = 0.97, ttl: float = 3600):
+        self.memory = memory
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory.db.write(self._create_schema)
+
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS task_results (
+              memory_id INTEGER PRIMARY KEY,
+              result TEXT NOT NULL,
+              created REAL NOT NULL
+            )""")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_task_results_created ON task_results(created)")
+
+    def lookup(self, task: str) -> tuple[str, float] | None:
+        """Returns (result, similarity) of a fresh near-duplicate task, or None."""
+        with self.memory.db.read() as conn:
+            for memory_id, score in self.memory.nearest(task, topk=5):
+                if score < self.threshold:
+                    break
+                row = conn.execute("SELECT result, created FROM task_results WHERE memory_id = ?", (memory_id,)).fetchone()
+                if row and time.time() - row[1] <= self.ttl:
+                    with self._lock:
+                        self.hits += 1
+                    return row[0], score
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, task: str, result: Any):
+        """Stores a task's result and deletes the expired ones, along with their task memories."""
+        memory_id = self.memory.store("task", task)
+        cutoff = time.time() - self.ttl
+
+        def write(conn) -> list[int]:
+            conn.execute(
+                "INSERT OR REPLACE INTO task_results (memory_id, result, created) VALUES (?, ?, ?)",
+                (memory_id, str(result), time.time())
+            )
+            expired = [row[0] for row in conn.execute("SELECT memory_id FROM task_results WHERE created < ?", (cutoff,))]
+            conn.execute("DELETE FROM task_results WHERE created < ?", (cutoff,))
+            return expired
+
+        self.memory.forget(self.memory.db.write(write))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0}
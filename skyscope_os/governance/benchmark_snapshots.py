@@ -0,0 +1,99 @@
+"""
+Snapshot/rollback throughput benchmark for RollbackManager.
+
+Builds a synthetic tree of small text-like files (a config or source tree),
+then times the original sequential copy-and-rehash approach against the blob
+store with one worker and with a thread pool. The incremental snapshot and the
+rollback run after `--change` of the files have been modified. `--compression`
+compares blob codecs at the largest worker count:
+
+    python -m governance.benchmark_snapshots --files 10000 --workers 1 8 32 --compression zlib zstd
+"""
+import argparse
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import time
+from governance.rollback_manager import RollbackManager
+
+def build_tree(root: str, files: int, mean_size: int, seed: int = 0) -> list[str]:
+    """Writes `files` files spread over nested directories, with many repeated basenames."""
+    rng = random.Random(seed)
+    words = [f"option_{i} = value_{i}\n" for i in range(256)]
+    paths = []
+    for i in range(files):
+        directory = os.path.join(root, f"pkg{i % 50}", f"mod{i % 7}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"file{i // 350}.conf")
+        size = max(1, int(rng.expovariate(1 / mean_size)))
+        with open(path, "w") as f:
+            while f.tell() < size:
+                f.write(rng.choice(words))
+        paths.append(path)
+    return paths
+
+def legacy_snapshot(paths: list[str], target: str):
+    """The previous behaviour: sequential copy2 by relative path, then a second read to hash with 4 KiB blocks."""
+    for path in paths:
+        backup_path = os.path.join(target, path.lstrip(os.sep))
+        os.makedirs(os.path.dirname(backup_path), exist_ok=True)
+        shutil.copy2(path, backup_path)
+        sha256_hash = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(4096), b""):
+                sha256_hash.update(block)
+
+def modify(paths: list[str], fraction: float, seed: int):
+    for path in random.Random(seed).sample(paths, max(1, int(len(paths) * fraction))):
+        with open(path, "a") as f:
+            f.write(f"changed = {seed}\n")
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=10000, help="Number of files in the tree.")
+    parser.add_argument("--mean-size", type=int, default=8192, help="Mean file size in bytes.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32], help="Thread pool sizes to compare.")
+    parser.add_argument("--change", type=float, default=0.01, help="Fraction of files modified between runs.")
+    parser.add_argument("--compression", nargs="*", default=[], choices=["zlib", "zstd"], help="Codecs to compare.")
+    parser.add_argument("--dir", default=None, help="Scratch directory (defaults to a temp dir; use it to pick the filesystem).")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="skyscope-snapbench-", dir=args.dir)
+    try:
+        paths = build_tree(os.path.join(scratch, "tree"), args.files, args.mean_size)
+        total_mb = sum(os.path.getsize(p) for p in paths) / 1e6
+        # Flush the freshly written tree so its writeback does not skew the first timings.
+        os.sync()
+        print(f"{len(paths)} files, {total_mb:.1f} MB")
+        print(f"{'engine':<22}{'snapshot s':>12}{'files/s':>10}{'incremental s':>15}{'rollback s':>12}{'ratio':>8}")
+
+        seconds = timed(legacy_snapshot, paths, os.path.join(scratch, "legacy"))
+        print(f"{'legacy sequential':<22}{seconds:>12.2f}{len(paths) / seconds:>10.0f}{'-':>15}{'-':>12}{'-':>8}")
+
+        runs = [(workers, None) for workers in args.workers] + [(max(args.workers), codec) for codec in args.compression]
+        for seed, (workers, codec) in enumerate(runs):
+            manager = RollbackManager(os.path.join(scratch, f"store{seed}"), max_workers=workers, compression=codec)
+            start = time.perf_counter()
+            snapshot_id, _ = manager.create_snapshot(paths)
+            first = time.perf_counter() - start
+            # Only the modified files are read again; the rest are matched by stat metadata.
+            time.sleep(0.01)
+            modify(paths, args.change, seed=seed)
+            second = timed(manager.create_snapshot, paths)
+            # Rollback rewrites only the files that differ from the first snapshot.
+            restore = timed(manager.rollback, snapshot_id)
+            ratio = manager.list_snapshots(limit=2)[-1]["stats"]["ratio"] or 1.0
+            engine = f"blob store x{workers} {codec or ''}"
+            print(f"{engine:<22}{first:>12.2f}{len(paths) / first:>10.0f}{second:>15.2f}{restore:>12.2f}{ratio:>8.2f}")
+    finally:
+        shutil.rmtree(scratch)
+
+if __name__ == "__main__":
+    main()
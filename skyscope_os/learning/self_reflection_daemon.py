@@ -1,7 +1,12 @@
+import math
 import threading
 import time
 import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
+import numpy as np
+from memory.vector_index import assign_clusters, spherical_kmeans
 
 # In a real implementation, these would be proper imports from the project structure
 # from memory.memory import SkyMemory
@@ -11,23 +16,72 @@ class SelfReflectionDaemon(threading.Thread):
     """
     A continuous daemon that processes recent episodic memories into generalized
     'lessons learned' and stores them as long-term knowledge vectors.
+
+    It keeps a persisted high-water mark (the last processed `memory.id`), so each
+    cycle reads only rows written since the previous one and never calls the LLM
+    when nothing new has arrived. The wait between cycles follows the ingest rate:
+    it shrinks while episodes arrive quickly and backs off while the store is idle.
+
+    It runs on its own thread: call `start()`, never `run()` from a coroutine, since
+    cycles block on the database and the LLM.
+
+    Windows that do not fit `prompt_token_budget` are reflected on map-reduce style:
+    episodes are grouped by type and clustered by embedding into prompt-sized
+    batches, each batch is summarized (at most `max_concurrency` LLM calls at once)
+    into `summary_token_budget` tokens, and the summaries are reduced, level by
+    level if needed, into the final lesson.
     """
-    def __init__(self, memory, llm, lookback_limit: int = 50, reflection_interval_sec: int = 300):
-        super().__init__()
+    def __init__(self, memory, llm, lookback_limit: int = 50, reflection_interval_sec: int = 300,
+                 min_interval_sec: int = 30, max_interval_sec: int = 3600, min_new_episodes: int = 1,
+                 prompt_token_budget: int = 2500, summary_token_budget: int = 200, max_concurrency: int = 2):
+        super().__init__(name="skyscope-reflection", daemon=True)
         self.memory = memory
         self.llm = llm
         self.lookback_limit = lookback_limit
         self.reflection_interval_sec = reflection_interval_sec
+        self.min_interval_sec = min_interval_sec
+        self.max_interval_sec = max_interval_sec
+        self.min_new_episodes = min_new_episodes
+        # Defaults leave room for the answer in phi3:mini's 4k-token context.
+        self.prompt_token_budget = prompt_token_budget
+        self.summary_token_budget = summary_token_budget
+        self.max_concurrency = max_concurrency
+        self.last_cycle: Dict[str, Any] = {}
+        self.interval_sec = reflection_interval_sec
         self.stop_event = threading.Event()
         self.logger = logging.getLogger('ReflectionDaemon')
-        self.logger.info("Self-Reflection Daemon initialized.")
+
+        self.ingest_rate = 0.0  # episodes per second, smoothed
+        self.reflections = 0
+        self.episodes_processed = 0
+        self.idle_cycles = 0
+        self.in_flight = False
+        self._last_cycle = time.monotonic()
+        self._init_state()
+        self.logger.info(f"Self-Reflection Daemon initialized (high-water mark: memory.id {self.last_id}).")
+
+    def _init_state(self):
+        """Loads the persisted high-water mark, so restarts do not reprocess old episodes."""
+        def load(conn):
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS reflection_state (
+              id INTEGER PRIMARY KEY CHECK (id = 0),
+              last_id INTEGER NOT NULL,
+              last_ts TEXT
+            )""")
+            return conn.execute("SELECT last_id FROM reflection_state WHERE id = 0").fetchone()
+        row = self.memory.db.write(load)
+        self.last_id = row[0] if row else 0
+
+    def _save_state(self, last_id: int, last_ts: str):
+        self.memory.db.write(lambda conn: conn.execute(
+            "INSERT OR REPLACE INTO reflection_state (id, last_id, last_ts) VALUES (0, ?, ?)", (last_id, last_ts)
+        ))
+        self.last_id = last_id
 
     def _generate_reflection_prompt(self, recent_episodes: List[Dict[str, Any]]) -> str:
         """Constructs the prompt for the LLM based on recent events."""
-        episodes_text = "\n---\n".join([
-            f"Task: {e.get('summary', 'N/A')}"
-            for e in recent_episodes
-        ])
+        episodes_text = "\n---\n".join([self._episode_text(e) for e in recent_episodes])
 
         prompt = (
             f"Analyze the following {len(recent_episodes)} recent operational logs from the SkyscopeOS agent. "
@@ -38,33 +92,173 @@ class SelfReflectionDaemon(threading.Thread):
         )
         return prompt
 
-    def run(self):
-        """The main loop for the daemon."""
-        while not self.stop_event.is_set():
-            try:
-                # This is a simplified search. A real implementation would be more specific.
-                recent_episodes = self.memory.search("recent tasks", topk=self.lookback_limit)
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # Roughly four characters per token for English text.
+        return len(text) // 4 + 1
+
+    def _episode_text(self, episode: Dict[str, Any]) -> str:
+        return f"[{episode.get('ts', 'N/A')}] {episode.get('type', 'episode')}: {episode.get('summary', 'N/A')}"
+
+    def _pack(self, items: List[Dict[str, Any]], budget: int) -> List[List[Dict[str, Any]]]:
+        """Splits items, in order, into consecutive batches whose text fits `budget` tokens."""
+        batches, batch, used = [], [], 0
+        for item in items:
+            tokens = self._estimate_tokens(self._episode_text(item))
+            if batch and used + tokens > budget:
+                batches.append(batch)
+                batch, used = [], 0
+            batch.append(item)
+            used += tokens
+        if batch:
+            batches.append(batch)
+        return batches
 
-                if not recent_episodes or "No memories found" in recent_episodes:
-                    self.logger.debug("No new episodes to reflect upon.")
-                    time.sleep(self.reflection_interval_sec)
-                    continue
+    def _cluster(self, episodes: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Groups episodes by type, then by embedding similarity, into batches that fit one map prompt."""
+        by_type = defaultdict(list)
+        for episode in episodes:
+            by_type[episode.get("type")].append(episode)
 
-                reflection_prompt = self._generate_reflection_prompt([{"summary": r} for r in recent_episodes.split('\n')[1:]])
+        batches = []
+        for group in by_type.values():
+            tokens = sum(self._estimate_tokens(self._episode_text(e)) for e in group)
+            k = min(math.ceil(tokens / self.prompt_token_budget), len(group))
+            if k > 1:
+                vectors = np.stack([e["embedding"] for e in group])
+                assignments = assign_clusters(vectors, spherical_kmeans(vectors, k))
+                clusters = [[e for e, a in zip(group, assignments) if a == c] for c in range(k)]
+            else:
+                clusters = [group]
+            # k-means clusters are uneven, so any that are still too large are split in order.
+            for cluster in clusters:
+                if cluster:
+                    batches.extend(self._pack(cluster, self.prompt_token_budget))
+        return batches
 
-                # In a real implementation, the llm would be the actual CodeAgent model
-                reflection_text = self.llm.run(reflection_prompt)
+    def _summarize(self, batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Map step: condenses one batch of episodes (or of lower-level summaries) into a single entry."""
+        types = sorted(set().union(*(e.get("types", {str(e.get("type"))}) for e in batch)))
+        words = self.summary_token_budget * 3 // 4
+        prompt = (
+            f"Summarize the following {len(batch)} operational logs from the SkyscopeOS agent in at most {words} words. "
+            "Keep concrete failures, successes and the tools involved.\n\n"
+            "LOGS:\n" + "\n---\n".join(self._episode_text(e) for e in batch)
+        )
+        summary = str(self.llm.run(prompt) or "")[:self.summary_token_budget * 4]
+        return {
+            "ts": f"{batch[0].get('ts')} .. {batch[-1].get('ts')}",
+            "type": f"{'/'.join(types)} ({sum(e.get('count', 1) for e in batch)} logs)",
+            "summary": summary,
+            "count": sum(e.get("count", 1) for e in batch),
+            "types": set(types),
+        }
+
+    def _reflect(self, episodes: List[Dict[str, Any]]) -> str:
+        """Produces the lesson for a window, going through map and reduce stages only when it is too large for one prompt."""
+        stats = {"episodes": len(episodes), "llm_calls": 0, "map_ms": 0.0, "reduce_ms": 0.0, "levels": 0}
+        started = time.perf_counter()
+        entries = episodes
+        if sum(self._estimate_tokens(self._episode_text(e)) for e in entries) > self.prompt_token_budget:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="skyscope-reflect") as pool:
+                batches = self._cluster(entries)
+                stats["clusters"] = len(batches)
+                stage = "map_ms"
+                while True:
+                    stage_started = time.perf_counter()
+                    entries = list(pool.map(self._summarize, batches))
+                    stats["llm_calls"] += len(batches)
+                    stats[stage] += (time.perf_counter() - stage_started) * 1000
+                    stats["levels"] += 1
+                    if sum(self._estimate_tokens(self._episode_text(e)) for e in entries) <= self.prompt_token_budget or len(entries) == 1:
+                        break
+                    # Reduce: summaries that still do not fit are summarized again in prompt-sized groups.
+                    batches = self._pack(entries, self.prompt_token_budget)
+                    if len(batches) == len(entries):
+                        break  # Budgets too tight to merge anything further; the final prompt gets what remains.
+                    stage = "reduce_ms"
+
+        final_started = time.perf_counter()
+        reflection_text = self.llm.run(self._generate_reflection_prompt(entries))
+        stats["llm_calls"] += 1
+        stats["final_ms"] = (time.perf_counter() - final_started) * 1000
+        stats["total_ms"] = (time.perf_counter() - started) * 1000
+        self.last_cycle = {key: round(value, 1) if isinstance(value, float) else value for key, value in stats.items()}
+        return reflection_text
+
+    def _next_interval(self, new_episodes: int, backlog: bool) -> float:
+        """Waits roughly as long as it takes `lookback_limit` episodes to arrive at the current rate."""
+        now = time.monotonic()
+        elapsed = max(now - self._last_cycle, 1e-3)
+        self._last_cycle = now
+        self.ingest_rate = 0.7 * self.ingest_rate + 0.3 * (new_episodes / elapsed)
+        if backlog:
+            return self.min_interval_sec
+        if new_episodes == 0:
+            # Back off geometrically while idle.
+            return min(self.interval_sec * 2, self.max_interval_sec)
+        target = self.lookback_limit / self.ingest_rate if self.ingest_rate > 0 else self.reflection_interval_sec
+        return min(max(target, self.min_interval_sec), self.max_interval_sec)
+
+    def reflect_once(self) -> int:
+        """Runs one cycle over episodes newer than the high-water mark; returns how many were processed."""
+        # The daemon's own reflections are not fed back to it.
+        new_episodes = self.memory.since(self.last_id, limit=self.lookback_limit, exclude_types=("reflection",), with_embeddings=True)
+        if len(new_episodes) < self.min_new_episodes:
+            self.idle_cycles += 1
+            self.logger.debug("No new episodes to reflect upon.")
+            return 0
 
-                if reflection_text:
-                    self.memory.store("reflection", reflection_text)
-                    self.logger.info(f"Generated and stored a new reflection: '{reflection_text[:80]}...'")
+        # In a real implementation, the llm would be the actual CodeAgent model
+        reflection_text = self._reflect(new_episodes)
 
+        if reflection_text:
+            self.memory.store("reflection", reflection_text)
+            self.reflections += 1
+            self.logger.info(f"Generated and stored a new reflection: '{reflection_text[:80]}...'")
+        # Only advanced once the batch has been handled, so a failed LLM call is retried next cycle.
+        self._save_state(new_episodes[-1]["id"], new_episodes[-1]["ts"])
+        self.episodes_processed += len(new_episodes)
+        return len(new_episodes)
+
+    def run(self):
+        """The main loop for the daemon."""
+        while not self.stop_event.is_set():
+            processed = 0
+            self.in_flight = True
+            try:
+                processed = self.reflect_once()
             except Exception as e:
                 self.logger.error(f"Error during self-reflection process: {e}", exc_info=True)
+            finally:
+                self.in_flight = False
+
+            self.interval_sec = self._next_interval(processed, backlog=processed >= self.lookback_limit)
+            # Returns as soon as stop() is called, so shutdown never waits out the interval.
+            self.stop_event.wait(self.interval_sec)
 
-            time.sleep(self.reflection_interval_sec)
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "last_id": self.last_id,
+            "episodes_processed": self.episodes_processed,
+            "reflections": self.reflections,
+            "idle_cycles": self.idle_cycles,
+            "interval_sec": round(self.interval_sec, 1),
+            "ingest_rate_per_min": round(self.ingest_rate * 60, 2),
+            "in_flight": self.in_flight,
+            "last_cycle": self.last_cycle,
+        }
 
-    def stop(self):
-        """Signals the daemon to stop its execution."""
+    def stop(self, timeout: float | None = None) -> bool:
+        """
+        Signals the daemon to stop and, if it was started, waits up to `timeout` seconds
+        (forever when None) for an in-flight reflection to finish. Returns True once stopped.
+        """
         self.stop_event.set()
         self.logger.info("Self-Reflection Daemon shutting down.")
+        if self.is_alive():
+            self.join(timeout)
+            if self.is_alive():
+                self.logger.warning(f"Reflection still in flight after {timeout}s; abandoning it.")
+                return False
+        return True
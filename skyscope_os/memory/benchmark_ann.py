@@ -0,0 +1,60 @@
+"""
+Recall-vs-latency benchmark for the KnowledgeStack ANN index.
+
+Compares IVFIndex at several `nprobe` settings against the exact FlatIndex
+on synthetic clustered embeddings, so it runs without the embedding model:
+
+    python -m memory.benchmark_ann --n 200000 --dim 384 --nprobe 1 4 8 16 32
+"""
+import argparse
+import time
+import numpy as np
+from memory.vector_index import FlatIndex, IVFIndex, normalize_rows
+
+def synthetic_embeddings(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Generates unit vectors drawn around random topic centres, roughly like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 1.5 * rng.standard_normal((n, dim)).astype(np.float32)
+    return normalize_rows(vectors)
+
+def timed_search(index, queries: np.ndarray, k: int, **kwargs) -> tuple[list[set[int]], float]:
+    """Returns the result id sets and the mean per-query latency in milliseconds."""
+    results = []
+    start = time.perf_counter()
+    for query in queries:
+        results.append({row_id for row_id, _ in index.search(query, k, **kwargs)})
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=100000, help="Number of indexed vectors.")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension (all-MiniLM-L6-v2 is 384).")
+    parser.add_argument("--clusters", type=int, default=256, help="Number of synthetic topics.")
+    parser.add_argument("--queries", type=int, default=200, help="Number of benchmark queries.")
+    parser.add_argument("--k", type=int, default=10, help="Results per query.")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32], help="IVF lists probed per query.")
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.n + args.queries, args.dim, args.clusters)
+    corpus, queries = vectors[:args.n], vectors[args.n:]
+    ids = np.arange(1, args.n + 1)
+
+    exact = FlatIndex()
+    exact.add(ids, corpus)
+    start = time.perf_counter()
+    ivf = IVFIndex(train_size=min(args.n, 4096))
+    ivf.add(ids, corpus)
+    build_sec = time.perf_counter() - start
+
+    truth, exact_ms = timed_search(exact, queries, args.k)
+    print(f"{args.n} vectors x {args.dim} dims, {len(ivf.centroids)} IVF lists (built in {build_sec:.1f}s), recall@{args.k}")
+    print(f"{'index':<16}{'recall':>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact (flat)':<16}{1.0:>10.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+    for nprobe in args.nprobe:
+        found, ivf_ms = timed_search(ivf, queries, args.k, nprobe=nprobe)
+        recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+        print(f"{f'ivf nprobe={nprobe}':<16}{recall:>10.3f}{ivf_ms:>12.3f}{exact_ms / ivf_ms:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable
+
+class ConnectionManager:
+    """
+    Shared, thread-safe access to one SQLite database in WAL mode.
+
+    Each reader thread keeps its own long-lived connection, so WAL lets any number
+    of them read concurrently and their statement caches stay warm between calls.
+    All writes are funnelled through a queue to a single dedicated writer thread,
+    which removes `database is locked` contention between writers entirely.
+    """
+    _registry: dict[str, "ConnectionManager"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, db_path: str, cached_statements: int = 256, busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._readers: list[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._writes: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._writer_loop, name=f"sqlite-writer:{db_path}", daemon=True)
+        self._writer_ready = threading.Event()
+        self._writer.start()
+        self._writer_ready.wait()
+
+    @classmethod
+    def get(cls, db_path: str) -> "ConnectionManager":
+        """Returns the process-wide manager for `db_path`, creating it on first use."""
+        with cls._registry_lock:
+            manager = cls._registry.get(db_path)
+            if manager is None:
+                manager = cls._registry[db_path] = cls(db_path)
+            return manager
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, cached_statements=self.cached_statements, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        # NORMAL is durable across application crashes in WAL mode and avoids an fsync per commit.
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    @contextmanager
+    def read(self):
+        """Yields this thread's persistent read connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._readers_lock:
+                self._readers.append(conn)
+        yield conn
+
+    def write(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        """
+        Runs `fn(conn)` on the writer thread inside a single transaction and returns its result.
+        The transaction is committed if `fn` returns and rolled back if it raises.
+        """
+        if threading.current_thread() is self._writer:
+            return fn(self._writer_conn)
+        future = Future()
+        self._writes.put((fn, future))
+        return future.result()
+
+    def _writer_loop(self):
+        self._writer_conn = self._connect()
+        self._writer_ready.set()
+        while True:
+            job = self._writes.get()
+            if job is None:
+                break
+            fn, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                with self._writer_conn:
+                    result = fn(self._writer_conn)
+                future.set_result(result)
+            except BaseException as e:
+                future.set_exception(e)
+        self._writer_conn.close()
+
+    def close(self):
+        """Drains pending writes, stops the writer thread and closes every connection."""
+        self._writes.put(None)
+        self._writer.join()
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        with self._registry_lock:
+            if self._registry.get(self.db_path) is self:
+                del self._registry[self.db_path]
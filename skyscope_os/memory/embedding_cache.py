@@ -0,0 +1,143 @@
+import os
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+import numpy as np
+from memory.db import ConnectionManager
+
+if TYPE_CHECKING:
+    # Only for annotations: importing it pulls in torch, which the orchestrator loads in the background.
+    from sentence_transformers import SentenceTransformer
+
+class EmbeddingCache:
+    """
+    A drop-in wrapper around a SentenceTransformer that memoizes `encode`.
+
+    Entries are keyed by model name and a hash of the normalized text. Recent
+    vectors live in a bounded in-memory LRU backed by an on-disk SQLite table,
+    so repeated queries and re-added documents skip the model entirely, even
+    across restarts. Pass one instance as the embedder of every store to share it.
+
+    The disk table keeps at most `max_disk_entries` rows: every `trim_every`
+    inserts, the least recently used rows beyond that are deleted.
+    """
+    def __init__(self, embedder: "SentenceTransformer", db_path: str, model_name: str, max_entries: int = 10000,
+                 max_disk_entries: int = 500000, trim_every: int = 1000):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.trim_every = trim_every
+        self._lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        # Keys hit since the last write; their last_used is bumped along with the next insert.
+        self._touched: set[str] = set()
+        # Starts due, so a lowered limit takes effect on the first write after a restart.
+        self._inserts_since_trim = trim_every
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.trimmed = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = ConnectionManager.get(db_path)
+        self.db.write(self._create_schema)
+
+    @staticmethod
+    def _create_schema(conn):
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+              key TEXT PRIMARY KEY,
+              vector BLOB NOT NULL,
+              last_used REAL NOT NULL DEFAULT 0
+            )""")
+        # Tables created before last_used existed; their rows are the first to be trimmed.
+        if "last_used" not in {row[1] for row in conn.execute("PRAGMA table_info(embedding_cache)")}:
+            conn.execute("ALTER TABLE embedding_cache ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used)")
+
+    def _key(self, text: str) -> str:
+        # Whitespace and Unicode form differences do not change what the model sees meaningfully.
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(f"{self.model_name}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def encode(self, texts: list[str], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """Returns a float32 (len(texts), dim) array, encoding only texts not already cached."""
+        keys = [self._key(text) for text in texts]
+        vectors: dict[str, np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._lru:
+                    self._lru.move_to_end(key)
+                    vectors[key] = self._lru[key]
+                    self._touched.add(key)
+                    self.hits += 1
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            with self.db.read() as conn:
+                for key in missing:
+                    row = conn.execute("SELECT vector FROM embedding_cache WHERE key = ?", (key,)).fetchone()
+                    if row:
+                        vectors[key] = np.frombuffer(row[0], dtype=np.float32)
+                        self._remember(key, vectors[key])
+                        with self._lock:
+                            self._touched.add(key)
+                            self.disk_hits += 1
+
+        to_encode = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if to_encode:
+            encoded = np.asarray(self.embedder.encode(list(to_encode.values()), batch_size=batch_size, **kwargs), dtype=np.float32)
+            for key, vector in zip(to_encode, encoded):
+                vectors[key] = vector
+                self._remember(key, vector)
+            with self._lock:
+                self.misses += len(to_encode)
+            self._persist([(key, vectors[key].tobytes()) for key in to_encode])
+        return np.stack([vectors[key] for key in keys])
+
+    def _persist(self, rows: list[tuple[str, bytes]]):
+        """Inserts new vectors, records when hit keys were last used and trims the table when due."""
+        now = time.time()
+        with self._lock:
+            touched, self._touched = self._touched, set()
+            self._inserts_since_trim += len(rows)
+            trim = self._inserts_since_trim >= self.trim_every
+            if trim:
+                self._inserts_since_trim = 0
+
+        def write(conn) -> int:
+            conn.executemany("UPDATE embedding_cache SET last_used = ? WHERE key = ?", [(now, key) for key in touched])
+            conn.executemany("INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)",
+                             [(key, vector, now) for key, vector in rows])
+            if not trim:
+                return 0
+            return conn.execute(
+                "DELETE FROM embedding_cache WHERE key IN "
+                "(SELECT key FROM embedding_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_disk_entries,)).rowcount
+
+        trimmed = self.db.write(write)
+        with self._lock:
+            self.trimmed += trimmed
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters; `hit_rate` counts both memory and disk hits."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "trimmed": self.trimmed,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
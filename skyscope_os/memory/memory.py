@@ -1,20 +1,79 @@
 import os
+import re
 import sqlite3
 import datetime
 import numpy as np
 import zlib
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Iterable
+from memory.db import ConnectionManager
+from memory.vector_index import FlatIndex, QuantizedIndex, VectorIndex, INDEX_TYPES, normalize_rows, quantize
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+def _ensure_column(conn, table: str, column: str):
+    """Adds a nullable BLOB column to `table` when an older schema lacks it."""
+    if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} BLOB")
+
+def codes_column(kind: str) -> str | None:
+    """Name of the column holding quantized codes for an index kind, or None for float indexes."""
+    return f"embedding_{kind}" if INDEX_TYPES[kind].needs_rerank else None
+
+def _embedding_columns(index: VectorIndex) -> str:
+    """Columns a sync reads: codes for quantized indexes (floats only where codes are missing), else floats."""
+    column = codes_column(index.kind)
+    if column:
+        return f"{column}, CASE WHEN {column} IS NULL THEN embedding END"
+    return "embedding, NULL"
+
+def _add_rows(index: VectorIndex, rows: list[tuple]):
+    """Adds (id, codes_or_embedding, fallback_embedding) rows selected with `_embedding_columns` to `index`."""
+    ids = [row[0] for row in rows]
+    if not isinstance(index, QuantizedIndex):
+        vectors = np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        index.add(ids, normalize_rows(vectors))
+        return
+    codes = [
+        row[1] if row[1] is not None else quantize(np.frombuffer(row[2], dtype=np.float32), index.kind).tobytes()
+        for row in rows
+    ]
+    index.add_codes(ids, np.frombuffer(b"".join(codes), dtype=np.uint8).reshape(len(rows), -1))
+
+def _exact_scores(conn, table: str, ids: list[int], query_vector: np.ndarray) -> list[tuple[int, float]]:
+    """Scores only the given rows' float embeddings against the query, best first."""
+    if not ids:
+        return []
+    rows = conn.execute(f"SELECT id, embedding FROM {table} WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+    if not rows:
+        return []
+    vectors = normalize_rows(np.frombuffer(b"".join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), -1))
+    scores = vectors @ normalize_rows(query_vector)
+    return sorted(zip((row_id for row_id, _ in rows), scores.tolist()), key=lambda x: x[1], reverse=True)
 
 class SkyMemory:
-    """Manages short-term episodic memory."""
-    def __init__(self, db_path: str, embedder: SentenceTransformer):
+    """
+    Manages short-term episodic memory. With `quantization` set to "int8" or "binary",
+    only compact codes are held in RAM and the top candidates are re-ranked on the
+    float embeddings read back from SQLite.
+    """
+    def __init__(self, db_path: str, embedder: "SentenceTransformer", quantization: str | None = None, rerank_factor: int = 4):
         self.db_path = db_path
         self.embedder = embedder
+        self.index = INDEX_TYPES[quantization]() if quantization else FlatIndex()
+        self.rerank_factor = rerank_factor
+        self._sync_lock = threading.Lock()
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = ConnectionManager.get(db_path)
         self._initialize_db()
+        self._sync_matrix()
 
     def _initialize_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        def create_schema(conn):
             conn.execute("""
             CREATE TABLE IF NOT EXISTS memory (
               id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -24,42 +83,127 @@ class SkyMemory:
               embedding BLOB NOT NULL
             )""")
             conn.execute("CREATE INDEX IF NOT EXISTS idx_mem_type ON memory(type)")
+            if codes_column(self.index.kind):
+                _ensure_column(conn, "memory", codes_column(self.index.kind))
+        self.db.write(create_schema)
 
-    def store(self, type_: str, text: str):
-        embedding = self.embedder.encode([text]).astype(np.float32).tobytes()
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute(
-                "INSERT INTO memory (ts, type, summary, embedding) VALUES (?, ?, ?, ?)",
-                (datetime.datetime.now().isoformat(), type_, text[:800], embedding)
-            )
+    def _sync_matrix(self):
+        """Loads rows written since the last sync (by this or another process) into the in-memory index."""
+        with self._sync_lock:
+            with self.db.read() as conn:
+                rows = conn.execute(
+                    f"SELECT id, {_embedding_columns(self.index)} FROM memory WHERE id > ? ORDER BY id", (self.index.max_id,)
+                ).fetchall()
+            if rows:
+                _add_rows(self.index, rows)
 
-    def search(self, query: str, topk: int = 5) -> str:
+    def store(self, type_: str, text: str) -> int:
+        """Stores one memory and returns its row id."""
+        # Embeddings are stored pre-normalized so search never recomputes norms.
+        vector = normalize_rows(self.embedder.encode([text]))
+        row = (datetime.datetime.now().isoformat(), type_, text[:800], vector.tobytes())
+        column = codes_column(self.index.kind)
+        if column:
+            row_id = self.db.write(lambda conn: conn.execute(
+                f"INSERT INTO memory (ts, type, summary, embedding, {column}) VALUES (?, ?, ?, ?, ?)",
+                row + (quantize(vector, self.index.kind).tobytes(),)
+            ).lastrowid)
+        else:
+            row_id = self.db.write(lambda conn: conn.execute("INSERT INTO memory (ts, type, summary, embedding) VALUES (?, ?, ?, ?)", row).lastrowid)
+        self._sync_matrix()
+        return row_id
+
+    def forget(self, ids: list[int]):
+        """Deletes memories by row id and drops them from the index."""
+        if not ids:
+            return
+        self.db.write(lambda conn: conn.executemany("DELETE FROM memory WHERE id = ?", [(row_id,) for row_id in ids]))
+        with self._sync_lock:
+            self.index.remove(ids)
+            # Tombstoned vectors stay in RAM; once they outnumber the live ones the index is rebuilt.
+            if len(self.index._deleted) > len(self.index):
+                index = type(self.index)()
+                with self.db.read() as conn:
+                    rows = conn.execute(f"SELECT id, {_embedding_columns(index)} FROM memory ORDER BY id").fetchall()
+                if rows:
+                    _add_rows(index, rows)
+                index.max_id = max(index.max_id, self.index.max_id)
+                self.index = index
+
+    def since(self, last_id: int = 0, limit: int = 50, exclude_types: tuple[str, ...] = (),
+              with_embeddings: bool = False) -> list[dict[str, Any]]:
+        """
+        Returns up to `limit` memories newer than `last_id`, oldest first, as a primary-key
+        range scan. Embeddings (unit-normalized float32) are only read when asked for.
+        """
+        where = f" AND type NOT IN ({','.join('?' * len(exclude_types))})" if exclude_types else ""
+        columns = "id, ts, type, summary" + (", embedding" if with_embeddings else "")
+        with self.db.read() as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM memory WHERE id > ?{where} ORDER BY id LIMIT ?",
+                (last_id, *exclude_types, limit)
+            ).fetchall()
+        episodes = [{"id": row[0], "ts": row[1], "type": row[2], "summary": row[3]} for row in rows]
+        if with_embeddings:
+            for episode, row in zip(episodes, rows):
+                episode["embedding"] = np.frombuffer(row[4], dtype=np.float32)
+        return episodes
+
+    def nearest(self, query: str, topk: int = 5) -> list[tuple[int, float]]:
+        """Returns (row id, cosine similarity) of the closest memories, best first."""
         query_vector = self.embedder.encode([query]).astype(np.float32)[0]
-        with sqlite3.connect(self.db_path) as conn:
-            rows = conn.execute("SELECT summary, embedding FROM memory").fetchall()
-
-        if not rows: return "No memories found."
-        # ... (rest of the search logic is the same)
-        scored_results = []
-        for summary, embedding_blob in rows:
-            embedding = np.frombuffer(embedding_blob, dtype=np.float32)
-            score = np.dot(embedding, query_vector) / (np.linalg.norm(embedding) * np.linalg.norm(query_vector))
-            scored_results.append((score, summary))
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-        top_results = scored_results[:topk]
+        self._sync_matrix()
+        if not len(self.index): return []
+
+        top_results = self.index.search(query_vector, topk * self.rerank_factor if self.index.needs_rerank else topk)
+        if self.index.needs_rerank:
+            with self.db.read() as conn:
+                top_results = _exact_scores(conn, "memory", [row_id for row_id, _ in top_results], query_vector)[:topk]
+        return top_results
+
+    def search(self, query: str, topk: int = 5) -> str:
+        top_results = self.nearest(query, topk)
+        if not len(self.index): return "No memories found."
         if not top_results: return "No relevant memories found."
-        return "Relevant Memories:\n" + "\n".join([f"- {summary} (Score: {score:.3f})" for score, summary in top_results])
+
+        # Only the winning rows' summaries are fetched back from SQLite.
+        ids = [row_id for row_id, _ in top_results]
+        with self.db.read() as conn:
+            summaries = dict(conn.execute(
+                f"SELECT id, summary FROM memory WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall())
+        return "Relevant Memories:\n" + "\n".join([f"- {summaries[row_id]} (Score: {score:.3f})" for row_id, score in top_results if row_id in summaries])
 
 class KnowledgeStack:
-    """Manages a long-term, compressed, and indexed knowledge base."""
-    def __init__(self, db_path: str, embedder: SentenceTransformer):
+    """
+    Manages a long-term, compressed, and indexed knowledge base.
+    Documents are split into passages, each with its own embedding and independently
+    compressed payload, so search and retrieval cost scales with passage size.
+    """
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_path: str, embedder: "SentenceTransformer", index: str | VectorIndex = "ivf",
+                 index_save_interval: int = 1000, passage_chars: int = 1000, rerank_factor: int = 4):
         self.db_path = db_path
         self.embedder = embedder
+        self.passage_chars = passage_chars
+        self.rerank_factor = rerank_factor
+        # "int8" and "binary" indexes also persist their codes in the passages table.
+        self._codes_column = codes_column(index if isinstance(index, str) else index.kind)
+        # The ANN index is persisted next to the database so restarts only replay new rows.
+        self.index_path = f"{os.path.splitext(db_path)[0]}.index.npz"
+        self.index_save_interval = index_save_interval
+        self._unsaved_adds = 0
+        self._index_lock = threading.Lock()
+        self.logger = logging.getLogger('KnowledgeStack')
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db = ConnectionManager.get(db_path)
+        self.fts_enabled = False
         self._initialize_db()
+        self.index = self._load_index(index)
 
     def _initialize_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        def create_schema(conn):
             conn.execute("""
             CREATE TABLE IF NOT EXISTS knowledge (
               id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -68,45 +212,367 @@ class KnowledgeStack:
               compressed_content BLOB,
               embedding BLOB
             )""")
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS passages (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              doc_id INTEGER NOT NULL,
+              seq INTEGER NOT NULL,
+              byte_start INTEGER NOT NULL,
+              byte_end INTEGER NOT NULL,
+              compressed_content BLOB NOT NULL,
+              embedding BLOB NOT NULL
+            )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_passages_doc ON passages(doc_id, byte_start)")
+            if self._codes_column:
+                _ensure_column(conn, "passages", self._codes_column)
+            return self._migrate_to_passages(conn)
 
-    def add(self, source_uri: str, title: str, content: str):
-        """Adds a document to the knowledge stack."""
-        compressed_content = zlib.compress(content.encode('utf-8'))
-        # The embedding is based on the title and a snippet of the content for efficient search
-        searchable_text = f"{title}\n\n{content[:500]}"
-        embedding = self.embedder.encode([searchable_text]).astype(np.float32).tobytes()
+        if self.db.write(create_schema) and os.path.exists(self.index_path):
+            # The persisted index was keyed by document ids; it is rebuilt over passage ids.
+            os.remove(self.index_path)
+        try:
+            self.db.write(self._initialize_fts)
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            self.logger.warning(f"FTS5 is unavailable, lexical and hybrid search are disabled: {e}")
 
-        with sqlite3.connect(self.db_path) as conn:
+    def _migrate_to_passages(self, conn) -> bool:
+        """
+        Converts documents stored as a single blob into one-passage documents, reusing their
+        existing compressed payload and embedding so no re-encoding is needed. Returns True
+        if the database was migrated.
+        """
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= self.SCHEMA_VERSION:
+            return False
+        legacy_ids = [row[0] for row in conn.execute("SELECT id FROM knowledge WHERE compressed_content IS NOT NULL")]
+        for doc_id in legacy_ids:
+            compressed_content, embedding = conn.execute(
+                "SELECT compressed_content, embedding FROM knowledge WHERE id = ?", (doc_id,)
+            ).fetchone()
             conn.execute(
-                "INSERT OR REPLACE INTO knowledge (source_uri, title, compressed_content, embedding) VALUES (?, ?, ?, ?)",
-                (source_uri, title, compressed_content, embedding)
+                "INSERT INTO passages (doc_id, seq, byte_start, byte_end, compressed_content, embedding) VALUES (?, 0, 0, ?, ?, ?)",
+                (doc_id, len(zlib.decompress(compressed_content)), compressed_content, embedding)
             )
+        conn.execute("UPDATE knowledge SET compressed_content = NULL, embedding = NULL")
+        # The document-level FTS table from schema version 0 is superseded by passage_fts.
+        conn.execute("DROP TABLE IF EXISTS knowledge_fts")
+        conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        if legacy_ids:
+            self.logger.info(f"Migrated {len(legacy_ids)} documents to passage storage.")
+        return True
 
-    def retrieve(self, source_uri: str) -> str | None:
-        """Retrieves and decompresses a document by its source URI."""
-        with sqlite3.connect(self.db_path) as conn:
-            row = conn.execute("SELECT compressed_content FROM knowledge WHERE source_uri = ?", (source_uri,)).fetchone()
+    @staticmethod
+    def _initialize_fts(conn):
+        """Creates the passage-level FTS5 index over decompressed content, backfilling it if new."""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'passage_fts'").fetchone()
+        # Contentless, so the uncompressed text is indexed but never stored a second time.
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS passage_fts USING fts5(title, content, content='')")
+        if exists:
+            return
+        for passage_id, title, compressed_content in conn.execute(
+            "SELECT p.id, k.title, p.compressed_content FROM passages p JOIN knowledge k ON k.id = p.doc_id"
+        ):
+            conn.execute(
+                "INSERT INTO passage_fts (rowid, title, content) VALUES (?, ?, ?)",
+                (passage_id, title, zlib.decompress(compressed_content).decode('utf-8'))
+            )
 
-        if row:
-            return zlib.decompress(row[0]).decode('utf-8')
-        return None
+    def _load_index(self, index: str | VectorIndex) -> VectorIndex:
+        """Loads the persisted index if it matches the requested kind, then catches up with the database."""
+        if isinstance(index, str):
+            kind = index
+            index = INDEX_TYPES[kind]()
+            if os.path.exists(self.index_path):
+                try:
+                    loaded = VectorIndex.load(self.index_path)
+                    if loaded.kind == kind:
+                        index = loaded
+                except Exception:
+                    pass  # A corrupt or stale index file is simply rebuilt from the database.
+        with self.db.read() as conn:
+            live_ids = np.fromiter((row[0] for row in conn.execute("SELECT id FROM passages")), dtype=np.int64)
+        # Passages replaced or deleted since the index was saved are tombstoned.
+        stale = np.setdiff1d(index.ids(), live_ids, assume_unique=True)
+        if len(stale):
+            index.remove(stale)
+        self._sync_index(index)
+        return index
 
-    def search(self, query: str, topk: int = 3) -> str:
-        """Searches the knowledge stack for relevant documents."""
-        query_vector = self.embedder.encode([query]).astype(np.float32)[0]
-        with sqlite3.connect(self.db_path) as conn:
-            rows = conn.execute("SELECT source_uri, title, embedding FROM knowledge").fetchall()
+    def _sync_index(self, index: VectorIndex, batch_size: int = 10000):
+        """Adds passages written after the index's high-water mark, in bounded batches."""
+        while True:
+            with self.db.read() as conn:
+                rows = conn.execute(
+                    f"SELECT id, {_embedding_columns(index)} FROM passages WHERE id > ? ORDER BY id LIMIT ?", (index.max_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            _add_rows(index, rows)
+
+    def save_index(self):
+        """Persists the ANN index next to the database."""
+        with self._index_lock:
+            self.index.save(self.index_path)
+            self._unsaved_adds = 0
+
+    @staticmethod
+    def _searchable_text(title: str, passage: str) -> str:
+        # Each passage is embedded with its document title for context
+        return f"{title}\n\n{passage}"
+
+    def _split_passages(self, content: str) -> list[tuple[int, int, str]]:
+        """
+        Splits `content` into consecutive passages of at most `passage_chars` characters,
+        preferring paragraph, line, sentence and word boundaries. Returns (byte_start,
+        byte_end, text) with UTF-8 byte offsets; the passages tile the document exactly.
+        """
+        passages = []
+        pos, byte_pos = 0, 0
+        while pos < len(content):
+            end = min(pos + self.passage_chars, len(content))
+            if end < len(content):
+                for separator in ("\n\n", "\n", ". ", " "):
+                    boundary = content.rfind(separator, pos + self.passage_chars // 2, end)
+                    if boundary != -1:
+                        end = boundary + len(separator)
+                        break
+            text = content[pos:end]
+            size = len(text.encode('utf-8'))
+            passages.append((byte_pos, byte_pos + size, text))
+            pos, byte_pos = end, byte_pos + size
+        return passages or [(0, 0, "")]
+
+    def add(self, source_uri: str, title: str, content: str):
+        """Adds a document to the knowledge stack."""
+        passages = self._split_passages(content)
+        embeddings = normalize_rows(self.embedder.encode([self._searchable_text(title, text) for _, _, text in passages]))
+        rows = [
+            (start, end, zlib.compress(text.encode('utf-8')), embedding.tobytes(), text)
+            for (start, end, text), embedding in zip(passages, embeddings)
+        ]
+        replaced_ids = self.db.write(lambda conn: self._write_documents(conn, [(source_uri, title, rows)]))
+        self._index_written_rows(replaced_ids, len(rows))
+
+    def _write_documents(self, conn, documents: list[tuple]) -> list[int]:
+        """
+        Upserts (source_uri, title, passages) documents, where each passage is a (byte_start,
+        byte_end, compressed_content, embedding, text) tuple, keeping the FTS index in step.
+        Returns the ids of the passages that were replaced.
+        """
+        replaced_ids = []
+        for source_uri, title, passages in documents:
+            previous = conn.execute("SELECT id, title FROM knowledge WHERE source_uri = ?", (source_uri,)).fetchone()
+            if previous:
+                old_passages = conn.execute(
+                    "SELECT id, compressed_content FROM passages WHERE doc_id = ?", (previous[0],)
+                ).fetchall()
+                for passage_id, compressed_content in old_passages:
+                    replaced_ids.append(passage_id)
+                    if self.fts_enabled:
+                        # Contentless FTS tables need the original values to delete a row.
+                        conn.execute(
+                            "INSERT INTO passage_fts (passage_fts, rowid, title, content) VALUES ('delete', ?, ?, ?)",
+                            (passage_id, previous[1], zlib.decompress(compressed_content).decode('utf-8'))
+                        )
+                conn.execute("DELETE FROM passages WHERE doc_id = ?", (previous[0],))
+            doc_id = conn.execute(
+                "INSERT OR REPLACE INTO knowledge (source_uri, title) VALUES (?, ?)", (source_uri, title)
+            ).lastrowid
+            for seq, (byte_start, byte_end, compressed_content, embedding, text) in enumerate(passages):
+                row = (doc_id, seq, byte_start, byte_end, compressed_content, embedding)
+                if self._codes_column:
+                    passage_id = conn.execute(
+                        f"INSERT INTO passages (doc_id, seq, byte_start, byte_end, compressed_content, embedding, {self._codes_column}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        row + (quantize(np.frombuffer(embedding, dtype=np.float32), self.index.kind).tobytes(),)
+                    ).lastrowid
+                else:
+                    passage_id = conn.execute(
+                        "INSERT INTO passages (doc_id, seq, byte_start, byte_end, compressed_content, embedding) VALUES (?, ?, ?, ?, ?, ?)", row
+                    ).lastrowid
+                if self.fts_enabled:
+                    conn.execute(
+                        "INSERT INTO passage_fts (rowid, title, content) VALUES (?, ?, ?)", (passage_id, title, text)
+                    )
+        return replaced_ids
+
+    def _index_written_rows(self, replaced_ids: list[int], count: int):
+        """Brings the ANN index up to date after `count` passages were written, saving it periodically."""
+        with self._index_lock:
+            # Replaced documents get new passage ids, so the old vectors must go.
+            if replaced_ids:
+                self.index.remove(replaced_ids)
+            self._sync_index(self.index)
+            self._unsaved_adds += count
+            save_due = self._unsaved_adds >= self.index_save_interval
+        if save_due:
+            self.save_index()
 
-        if not rows: return "No knowledge found."
+    def add_many(self, documents: Iterable[tuple[str, str, str] | dict], encode_batch_size: int = 64,
+                 commit_every: int = 5000, compress_workers: int = 4,
+                 progress_callback: Callable[[dict[str, Any]], None] | None = None) -> dict[str, Any]:
+        """
+        Streams documents into the knowledge stack. `documents` may be any iterator of
+        (source_uri, title, content) tuples or dicts with those keys. Passage embeddings are
+        computed in batches of `encode_batch_size` documents while a thread pool compresses the
+        same batch, and rows are committed in transactions of `commit_every` documents. Throughput
+        stats are logged and passed to `progress_callback` after every commit; the final stats are returned.
+        """
+        stats = {"documents": 0, "passages": 0, "bytes": 0, "elapsed_sec": 0.0, "docs_per_sec": 0.0, "mb_per_sec": 0.0}
+        start = time.perf_counter()
 
-        scored_results = []
-        for uri, title, embedding_blob in rows:
-            embedding = np.frombuffer(embedding_blob, dtype=np.float32)
-            score = np.dot(embedding, query_vector) / (np.linalg.norm(embedding) * np.linalg.norm(query_vector))
-            scored_results.append((score, title, uri))
+        def report():
+            stats["elapsed_sec"] = time.perf_counter() - start
+            stats["docs_per_sec"] = stats["documents"] / stats["elapsed_sec"] if stats["elapsed_sec"] else 0.0
+            stats["mb_per_sec"] = stats["bytes"] / 1e6 / stats["elapsed_sec"] if stats["elapsed_sec"] else 0.0
+            self.logger.info(f"Ingested {stats['documents']} documents ({stats['docs_per_sec']:.1f} docs/s, {stats['mb_per_sec']:.2f} MB/s)")
+            if progress_callback:
+                progress_callback(dict(stats))
 
-        scored_results.sort(key=lambda x: x[0], reverse=True)
-        top_results = scored_results[:topk]
+        def batches():
+            batch = []
+            for doc in documents:
+                batch.append((doc["source_uri"], doc["title"], doc["content"]) if isinstance(doc, dict) else tuple(doc))
+                if len(batch) == encode_batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
 
+        def commit(docs):
+            # One writer-queue job per chunk keeps each transaction large.
+            replaced_ids = self.db.write(lambda conn: self._write_documents(conn, docs))
+            self._index_written_rows(replaced_ids, sum(len(passages) for _, _, passages in docs))
+
+        pending = []
+        with ThreadPoolExecutor(max_workers=compress_workers) as pool:
+            for batch in batches():
+                split = [self._split_passages(content) for _, _, content in batch]
+                raw = [text.encode('utf-8') for passages in split for _, _, text in passages]
+                # zlib releases the GIL, so compression overlaps with the model's forward pass.
+                compressed = iter(pool.map(zlib.compress, raw))
+                embeddings = iter(normalize_rows(self.embedder.encode(
+                    [self._searchable_text(title, text) for (_, title, _), passages in zip(batch, split) for _, _, text in passages],
+                    batch_size=encode_batch_size
+                )))
+                for (uri, title, _), passages in zip(batch, split):
+                    pending.append((uri, title, [
+                        (start, end, next(compressed), next(embeddings).tobytes(), text) for start, end, text in passages
+                    ]))
+                stats["documents"] += len(batch)
+                stats["passages"] += len(raw)
+                stats["bytes"] += sum(len(r) for r in raw)
+                if len(pending) >= commit_every:
+                    commit(pending)
+                    pending = []
+                    report()
+        if pending:
+            commit(pending)
+        report()
+        return stats
+
+    def retrieve(self, source_uri: str, passage_id: int | None = None, byte_start: int | None = None, byte_end: int | None = None) -> str | None:
+        """
+        Retrieves and decompresses a document by its source URI. Pass `passage_id` (from search
+        results) to read a single passage, or `byte_start`/`byte_end` to read a byte range of the
+        document; only the passages that overlap the request are decompressed.
+        """
+        with self.db.read() as conn:
+            doc = conn.execute("SELECT id FROM knowledge WHERE source_uri = ?", (source_uri,)).fetchone()
+            if not doc:
+                return None
+            if passage_id is not None:
+                rows = conn.execute(
+                    "SELECT byte_start, compressed_content FROM passages WHERE id = ? AND doc_id = ?", (passage_id, doc[0])
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    "SELECT byte_start, compressed_content FROM passages WHERE doc_id = ? AND byte_end > ? AND byte_start < ? ORDER BY byte_start",
+                    (doc[0], byte_start or 0, byte_end if byte_end is not None else 2**63 - 1)
+                ).fetchall()
+
+        if not rows:
+            return ""
+        data = b"".join(zlib.decompress(compressed_content) for _, compressed_content in rows)
+        if passage_id is None and (byte_start is not None or byte_end is not None):
+            offset = rows[0][0]
+            data = data[max(byte_start or 0, offset) - offset:(byte_end - offset) if byte_end is not None else None]
+            # A range may cut through a multi-byte character at either end.
+            return data.decode('utf-8', errors='ignore')
+        return data.decode('utf-8')
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        """Turns free text into an FTS5 OR-query, quoting each term so identifiers like CVE-2023-1234 match as phrases."""
+        terms = [term.replace('"', '""') for term in query.split()]
+        return " OR ".join(f'"{term}"' for term in terms if re.search(r"\w", term))
+
+    def _lexical_search(self, query: str, limit: int) -> list[tuple[int, float]]:
+        """Returns up to `limit` (id, BM25) pairs, best first. FTS5's bm25() is negated so higher is better."""
+        fts_query = self._fts_query(query)
+        if not self.fts_enabled or not fts_query:
+            return []
+        with self.db.read() as conn:
+            return [(row_id, -score) for row_id, score in conn.execute(
+                "SELECT rowid, bm25(passage_fts) AS score FROM passage_fts WHERE passage_fts MATCH ? ORDER BY score LIMIT ?",
+                (fts_query, limit)
+            )]
+
+    def _vector_scores(self, ids: list[int], query_vector: np.ndarray) -> list[tuple[int, float]]:
+        """Scores only the given passages against the query, best first."""
+        with self.db.read() as conn:
+            return _exact_scores(conn, "passages", ids, query_vector)
+
+    def _vector_search(self, query_vector: np.ndarray, k: int) -> list[tuple[int, float]]:
+        """ANN search, re-ranking quantized candidates on their float embeddings."""
+        if not self.index.needs_rerank:
+            return self.index.search(query_vector, k)
+        candidates = self.index.search(query_vector, k * self.rerank_factor)
+        return self._vector_scores([row_id for row_id, _ in candidates], query_vector)[:k]
+
+    @staticmethod
+    def _reciprocal_rank_fusion(rankings: list[list[tuple[int, float]]], k: int = 60) -> list[tuple[int, float]]:
+        """Fuses ranked (id, score) lists by summing 1 / (k + rank); raw scores are ignored."""
+        fused: dict[int, float] = {}
+        for ranking in rankings:
+            for rank, (row_id, _) in enumerate(ranking, start=1):
+                fused[row_id] = fused.get(row_id, 0.0) + 1.0 / (k + rank)
+        return sorted(fused.items(), key=lambda x: x[1], reverse=True)
+
+    def search(self, query: str, topk: int = 3, mode: str = "hybrid", candidates: int = 50) -> str:
+        """
+        Searches the knowledge stack for relevant passages. Each result carries a passage id
+        and byte range that `retrieve` accepts, so only the matching passage need be read.
+        `mode` is "vector" (embedding similarity), "lexical" (FTS5 BM25, best for exact
+        identifiers and error strings), "hybrid" (reciprocal rank fusion of both), or
+        "prefilter" (vector re-ranking of only the FTS candidates, for very large stacks).
+        """
+        if not len(self.index): return "No knowledge found."
+        if mode not in ("vector", "lexical", "hybrid", "prefilter"):
+            return f"Unknown search mode '{mode}'."
+        if not self.fts_enabled:
+            mode = "vector"
+
+        limit = max(topk, candidates)
+        lexical = self._lexical_search(query, limit) if mode != "vector" else []
+        if mode == "lexical":
+            top_results = lexical[:topk]
+        else:
+            query_vector = self.embedder.encode([query]).astype(np.float32)[0]
+            if mode == "prefilter" and lexical:
+                top_results = self._vector_scores([row_id for row_id, _ in lexical], query_vector)[:topk]
+            elif mode == "hybrid" and lexical:
+                top_results = self._reciprocal_rank_fusion([self._vector_search(query_vector, limit), lexical])[:topk]
+            else:
+                top_results = self._vector_search(query_vector, topk)
         if not top_results: return "No relevant knowledge found."
-        return "Relevant Knowledge:\n" + "\n".join([f"- {title} (URI: {uri}, Score: {score:.3f})" for score, title, uri in top_results])
+
+        ids = [row_id for row_id, _ in top_results]
+        with self.db.read() as conn:
+            rows = {row[0]: row[1:] for row in conn.execute(
+                "SELECT p.id, k.source_uri, k.title, p.byte_start, p.byte_end FROM passages p JOIN knowledge k ON k.id = p.doc_id "
+                f"WHERE p.id IN ({','.join('?' * len(ids))})", ids
+            )}
+        return "Relevant Knowledge:\n" + "\n".join([
+            f"- {rows[row_id][1]} (URI: {rows[row_id][0]}, Passage: {row_id}, Bytes: {rows[row_id][2]}-{rows[row_id][3]}, Score: {score:.3f})"
+            for row_id, score in top_results if row_id in rows
+        ])
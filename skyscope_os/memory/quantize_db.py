@@ -0,0 +1,99 @@
+"""
+Migrates an existing memory database to quantized embedding storage.
+
+Fills the `embedding_int8` or `embedding_binary` column of the `memory`
+(episodes.db) or `passages` (knowledge.db) table for every row that lacks it,
+then reports the RAM saved by the in-memory index and the recall@k retained,
+with and without float re-ranking, using stored embeddings as sample queries:
+
+    python -m memory.quantize_db knowledge_stack/knowledge.db --format binary
+"""
+import argparse
+import numpy as np
+from memory.db import ConnectionManager
+from memory.memory import _ensure_column, _exact_scores, codes_column
+from memory.vector_index import FlatIndex, INDEX_TYPES, normalize_rows, quantize
+
+def migrate(db_path: str, kind: str, table: str, batch_size: int = 10000) -> int:
+    """Writes quantized codes for rows that have none; returns the number of rows updated."""
+    db = ConnectionManager.get(db_path)
+    column = codes_column(kind)
+    db.write(lambda conn: _ensure_column(conn, table, column))
+    updated = 0
+    while True:
+        with db.read() as conn:
+            rows = conn.execute(
+                f"SELECT id, embedding FROM {table} WHERE {column} IS NULL ORDER BY id LIMIT ?", (batch_size,)
+            ).fetchall()
+        if not rows:
+            return updated
+        vectors = np.frombuffer(b"".join(blob for _, blob in rows), dtype=np.float32).reshape(len(rows), -1)
+        codes = quantize(vectors, kind)
+        db.write(lambda conn: conn.executemany(
+            f"UPDATE {table} SET {column} = ? WHERE id = ?",
+            [(code.tobytes(), row_id) for code, (row_id, _) in zip(codes, rows)]
+        ))
+        updated += len(rows)
+
+def evaluate(db_path: str, kind: str, table: str, queries: int, k: int, rerank_factor: int) -> dict:
+    """Compares the quantized index against exact search over the same rows."""
+    db = ConnectionManager.get(db_path)
+    column = codes_column(kind)
+    with db.read() as conn:
+        rows = conn.execute(f"SELECT id, embedding, {column} FROM {table} ORDER BY id").fetchall()
+    if not rows:
+        return {"rows": 0}
+    ids = [row[0] for row in rows]
+    vectors = normalize_rows(np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32).reshape(len(rows), -1))
+    exact = FlatIndex()
+    exact.add(ids, vectors)
+    quantized = INDEX_TYPES[kind]()
+    quantized.add_codes(ids, np.frombuffer(b"".join(row[2] for row in rows), dtype=np.uint8).reshape(len(rows), -1))
+
+    # Perturbed copies of stored embeddings stand in for real queries.
+    rng = np.random.default_rng(0)
+    sample = vectors[rng.choice(len(vectors), min(queries, len(vectors)), replace=False)]
+    sample = normalize_rows(sample + 0.05 * rng.standard_normal(sample.shape).astype(np.float32))
+    raw_recall, reranked_recall = [], []
+    with db.read() as conn:
+        for query in sample:
+            truth = {row_id for row_id, _ in exact.search(query, k)}
+            candidates = quantized.search(query, k * rerank_factor)
+            raw_recall.append(len(truth & {row_id for row_id, _ in candidates[:k]}) / len(truth))
+            reranked = _exact_scores(conn, table, [row_id for row_id, _ in candidates], query)[:k]
+            reranked_recall.append(len(truth & {row_id for row_id, _ in reranked}) / len(truth))
+    return {
+        "rows": len(rows),
+        "float32_bytes": vectors.nbytes,
+        "quantized_bytes": len(rows) * len(rows[0][2]),
+        "recall_raw": float(np.mean(raw_recall)),
+        "recall_reranked": float(np.mean(reranked_recall)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db_path", help="Path to episodes.db or knowledge.db.")
+    parser.add_argument("--format", choices=["int8", "binary"], default="int8", help="Quantized storage format.")
+    parser.add_argument("--table", choices=["memory", "passages"], help="Defaults to whichever table the database has.")
+    parser.add_argument("--queries", type=int, default=200, help="Sample queries for the recall report.")
+    parser.add_argument("--k", type=int, default=10, help="Results per query for the recall report.")
+    parser.add_argument("--rerank-factor", type=int, default=4, help="Candidates re-ranked per result, as in the stores.")
+    args = parser.parse_args()
+
+    table = args.table
+    if table is None:
+        with ConnectionManager.get(args.db_path).read() as conn:
+            has_passages = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'passages'").fetchone()
+        table = "passages" if has_passages else "memory"
+
+    updated = migrate(args.db_path, args.format, table)
+    print(f"Quantized {updated} rows of '{table}' to {args.format}.")
+    report = evaluate(args.db_path, args.format, table, args.queries, args.k, args.rerank_factor)
+    if not report["rows"]:
+        return
+    saved = 1 - report["quantized_bytes"] / report["float32_bytes"]
+    print(f"In-memory index: {report['float32_bytes'] / 1e6:.1f} MB float32 -> {report['quantized_bytes'] / 1e6:.1f} MB {args.format} ({saved:.1%} saved)")
+    print(f"Recall@{args.k}: {report['recall_raw']:.3f} without re-ranking, {report['recall_reranked']:.3f} with x{args.rerank_factor} float re-ranking")
+
+if __name__ == "__main__":
+    main()
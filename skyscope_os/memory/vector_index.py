@@ -0,0 +1,431 @@
+import os
+import threading
+import numpy as np
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """Returns a contiguous float32 copy of `vectors` scaled to unit L2 norm per row."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def _select_topk(ids: np.ndarray, scores: np.ndarray, k: int) -> list[tuple[int, float]]:
+    """Returns the `k` best (id, score) pairs, best first, without sorting the full array."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    # argpartition is O(n); only the k winners are sorted.
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(ids[i]), float(scores[i])) for i in top]
+
+class EmbeddingMatrix:
+    """
+    An in-process, append-only matrix of unit-normalized embeddings keyed by row id.
+    Cosine similarity against every row is a single matrix-vector product. A non-float
+    `dtype` turns it into plain growable row storage for quantized codes.
+    """
+    def __init__(self, initial_capacity: int = 1024, dtype=np.float32):
+        self._lock = threading.Lock()
+        self._dtype = dtype
+        self._capacity = initial_capacity
+        self._size = 0
+        self._dim = None
+        self._ids = np.empty(initial_capacity, dtype=np.int64)
+        self._vectors = None
+        self.max_id = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, ids, vectors: np.ndarray):
+        """Appends already-normalized `vectors` (one per id) to the matrix."""
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=self._dtype).reshape(len(ids), -1)
+        with self._lock:
+            if self._vectors is None:
+                self._dim = vectors.shape[1]
+                self._vectors = np.empty((self._capacity, self._dim), dtype=self._dtype)
+            needed = self._size + len(ids)
+            if needed > self._capacity:
+                # Amortized doubling keeps appends O(1) and the buffer contiguous.
+                while self._capacity < needed:
+                    self._capacity *= 2
+                self._vectors = np.resize(self._vectors, (self._capacity, self._dim))
+                self._ids = np.resize(self._ids, self._capacity)
+            self._vectors[self._size:needed] = vectors
+            self._ids[self._size:needed] = ids
+            self._size = needed
+            self.max_id = max(self.max_id, int(max(ids)))
+
+    def arrays(self) -> tuple[np.ndarray, np.ndarray | None]:
+        """Returns views of the populated (ids, vectors) prefix."""
+        with self._lock:
+            n = self._size
+            return self._ids[:n], (self._vectors[:n] if self._vectors is not None else None)
+
+    def scores(self, query_vector: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Returns (ids, cosine scores) for every row against an already-normalized query."""
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            return self._ids[:n], self._vectors[:n] @ query_vector
+
+    def topk(self, query_vector: np.ndarray, k: int) -> list[tuple[int, float]]:
+        """Returns up to `k` (id, cosine score) pairs, best first."""
+        ids, scores = self.scores(normalize_rows(query_vector))
+        return _select_topk(ids, scores, k)
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Returns the index of the most similar centroid for each vector, in bounded-memory chunks."""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk_size):
+        assignments[start:start + chunk_size] = np.argmax(vectors[start:start + chunk_size] @ centroids.T, axis=1)
+    return assignments
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Clusters unit vectors by cosine similarity and returns `k` unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_clusters(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=k)
+        # Re-seed empty clusters so every inverted list stays useful.
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+class VectorIndex:
+    """
+    Base class for the pluggable nearest-neighbour indexes behind the memory stores.
+    Indexes hold unit-normalized vectors keyed by SQLite row id and can be
+    persisted to a single `.npz` file next to the database.
+    """
+    kind = "base"
+    # Indexes with approximate scores expect callers to re-rank candidates on float vectors.
+    needs_rerank = False
+
+    def __init__(self):
+        self._deleted: set[int] = set()
+        # Live vectors: added minus tombstoned.
+        self._count = 0
+        self.max_id = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, ids, vectors: np.ndarray):
+        raise NotImplementedError
+
+    def remove(self, ids):
+        """
+        Tombstones `ids`; they are filtered from results and dropped on the next save.
+        Ids the index does not hold (e.g. rows written and replaced before it saw them) are ignored.
+        """
+        ids = np.intersect1d(np.asarray(ids, dtype=np.int64), self.ids())
+        self._deleted.update(ids.tolist())
+        self._count -= len(ids)
+
+    def search(self, query_vector: np.ndarray, k: int) -> list[tuple[int, float]]:
+        raise NotImplementedError
+
+    def ids(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def _live(self, ids: np.ndarray, scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if not self._deleted:
+            return ids, scores
+        keep = ~np.isin(ids, np.fromiter(self._deleted, dtype=np.int64))
+        return ids[keep], scores[keep]
+
+    def _state(self) -> dict:
+        raise NotImplementedError
+
+    @classmethod
+    def _from_state(cls, state: dict) -> "VectorIndex":
+        raise NotImplementedError
+
+    def save(self, path: str):
+        """Atomically writes the index to `path`."""
+        state = self._state()
+        state["kind"] = np.array(self.kind)
+        state["max_id"] = np.array(self.max_id, dtype=np.int64)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **state)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> "VectorIndex":
+        """Loads an index previously written by `save`, dispatching on its stored kind."""
+        with np.load(path) as data:
+            state = {key: data[key] for key in data.files}
+        index = INDEX_TYPES[str(state["kind"])]._from_state(state)
+        index.max_id = int(state["max_id"])
+        return index
+
+class FlatIndex(VectorIndex):
+    """Exact brute-force index: one matrix-vector product over every vector."""
+    kind = "flat"
+
+    def __init__(self):
+        super().__init__()
+        self.matrix = EmbeddingMatrix()
+
+    def add(self, ids, vectors: np.ndarray):
+        self.matrix.append(ids, vectors)
+        self._count += len(ids)
+        if len(ids):
+            self.max_id = max(self.max_id, int(max(ids)))
+
+    def search(self, query_vector: np.ndarray, k: int) -> list[tuple[int, float]]:
+        ids, scores = self._live(*self.matrix.scores(normalize_rows(query_vector)))
+        return _select_topk(ids, scores, k)
+
+    def ids(self) -> np.ndarray:
+        ids, _ = self.matrix.arrays()
+        return self._live(ids, ids)[0]
+
+    def _state(self) -> dict:
+        ids, vectors = self.matrix.arrays()
+        ids, vectors = self._live(ids, vectors if vectors is not None else np.empty((0, 0), dtype=np.float32))
+        return {"ids": ids, "vectors": vectors}
+
+    @classmethod
+    def _from_state(cls, state: dict) -> "FlatIndex":
+        index = cls()
+        index.add(state["ids"], state["vectors"])
+        return index
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file approximate index. Vectors are bucketed by their nearest
+    k-means centroid and a query only scans the `nprobe` closest buckets.
+    Until `train_size` vectors have been added it behaves like a flat index.
+    """
+    kind = "ivf"
+
+    def __init__(self, nlist: int | None = None, nprobe: int = 8, train_size: int = 4096, retrain_factor: int = 16):
+        super().__init__()
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size
+        self.retrain_factor = retrain_factor
+        self.trained_on = 0
+        self.centroids = None
+        self._pending = EmbeddingMatrix()
+        self._lists: list[EmbeddingMatrix] = []
+        self._lock = threading.RLock()
+        # Vectors stored, including tombstoned ones; drives retraining.
+        self._size = 0
+
+    def add(self, ids, vectors: np.ndarray):
+        if not len(ids):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), -1)
+        ids = np.asarray(ids, dtype=np.int64)
+        with self._lock:
+            self._size += len(ids)
+            self._count += len(ids)
+            self.max_id = max(self.max_id, int(ids.max()))
+            if self.centroids is None:
+                self._pending.append(ids, vectors)
+                if len(self._pending) >= self.train_size:
+                    self.train()
+                return
+            assignments = assign_clusters(vectors, self.centroids)
+            for list_no in np.unique(assignments):
+                mask = assignments == list_no
+                self._lists[list_no].append(ids[mask], vectors[mask])
+            # Bucket quality degrades as the corpus outgrows the training sample.
+            if self._size >= self.retrain_factor * self.trained_on:
+                self.train()
+
+    def train(self, nlist: int | None = None):
+        """(Re)clusters every stored vector and rebuilds the inverted lists."""
+        with self._lock:
+            ids, vectors = self._all_vectors()
+            if not len(ids):
+                return
+            nlist = nlist or self.nlist or max(1, int(np.sqrt(len(ids))))
+            # Training on a bounded sample keeps retraining cost independent of corpus size.
+            sample_size = min(len(ids), 32 * nlist)
+            sample = vectors[np.random.default_rng(0).choice(len(ids), sample_size, replace=False)]
+            self.centroids = spherical_kmeans(sample, nlist)
+            self._lists = [EmbeddingMatrix(initial_capacity=16) for _ in range(len(self.centroids))]
+            self._pending = EmbeddingMatrix()
+            self._size = 0
+            self._count = 0
+            self._deleted.clear()
+            self.trained_on = len(ids)
+            self.add(ids, vectors)
+
+    def _all_vectors(self) -> tuple[np.ndarray, np.ndarray]:
+        parts = [m.arrays() for m in [self._pending, *self._lists] if len(m)]
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+        ids = np.concatenate([p[0] for p in parts])
+        vectors = np.concatenate([p[1] for p in parts])
+        return self._live(ids, vectors)
+
+    def search(self, query_vector: np.ndarray, k: int, nprobe: int | None = None) -> list[tuple[int, float]]:
+        query_vector = normalize_rows(query_vector)
+        with self._lock:
+            if self.centroids is None:
+                ids, scores = self._pending.scores(query_vector)
+            else:
+                nprobe = min(nprobe or self.nprobe, len(self.centroids))
+                probes = np.argpartition(-(self.centroids @ query_vector), nprobe - 1)[:nprobe]
+                parts = [self._lists[p].scores(query_vector) for p in probes if len(self._lists[p])]
+                if not parts:
+                    return []
+                ids = np.concatenate([p[0] for p in parts])
+                scores = np.concatenate([p[1] for p in parts])
+        return _select_topk(*self._live(ids, scores), k)
+
+    def ids(self) -> np.ndarray:
+        with self._lock:
+            parts = [m.arrays()[0] for m in [self._pending, *self._lists] if len(m)]
+        ids = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+        return self._live(ids, ids)[0]
+
+    def _state(self) -> dict:
+        with self._lock:
+            state = {
+                "params": np.array([self.nprobe, self.train_size, self.retrain_factor, self.trained_on, self.nlist or 0], dtype=np.int64),
+            }
+            if self.centroids is None:
+                ids, vectors = self._all_vectors()
+                state.update(ids=ids, vectors=vectors)
+                return state
+            # Inverted lists are stored back to back; `list_sizes` recovers the boundaries.
+            sizes, kept_ids, kept_vectors = [], [], []
+            for inverted_list in self._lists:
+                ids, vectors = inverted_list.arrays()
+                if vectors is None:
+                    sizes.append(0)
+                    continue
+                ids, vectors = self._live(ids, vectors)
+                sizes.append(len(ids))
+                kept_ids.append(ids)
+                kept_vectors.append(vectors)
+            state.update(
+                centroids=self.centroids,
+                list_sizes=np.array(sizes, dtype=np.int64),
+                ids=np.concatenate(kept_ids) if kept_ids else np.empty(0, dtype=np.int64),
+                vectors=np.concatenate(kept_vectors) if kept_vectors else np.empty((0, self.centroids.shape[1]), dtype=np.float32),
+            )
+            return state
+
+    @classmethod
+    def _from_state(cls, state: dict) -> "IVFIndex":
+        nprobe, train_size, retrain_factor, trained_on, nlist = (int(v) for v in state["params"])
+        index = cls(nlist=nlist or None, nprobe=nprobe, train_size=train_size, retrain_factor=retrain_factor)
+        ids, vectors = state["ids"], state["vectors"]
+        if "centroids" not in state:
+            index._pending.append(ids, vectors)
+            index._size = index._count = len(ids)
+            return index
+        index.centroids = state["centroids"]
+        index.trained_on = trained_on
+        index._lists = [EmbeddingMatrix(initial_capacity=16) for _ in range(len(index.centroids))]
+        offsets = np.concatenate([[0], np.cumsum(state["list_sizes"])])
+        for list_no in range(len(index._lists)):
+            start, end = offsets[list_no], offsets[list_no + 1]
+            index._lists[list_no].append(ids[start:end], vectors[start:end])
+        index._size = index._count = len(ids)
+        return index
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def quantize(vectors: np.ndarray, kind: str) -> np.ndarray:
+    """
+    Encodes vectors as fixed-size uint8 code rows. "int8" rows are a float32 scale
+    followed by one signed byte per dimension; "binary" rows are packed sign bits.
+    """
+    vectors = normalize_rows(np.atleast_2d(vectors))
+    if kind == "binary":
+        return np.packbits(vectors > 0, axis=1)
+    scales = np.abs(vectors).max(axis=1, keepdims=True) / 127
+    scales[scales == 0] = 1.0
+    codes = np.round(vectors / scales).astype(np.int8)
+    return np.concatenate([scales.astype(np.float32).view(np.uint8), codes.view(np.uint8)], axis=1)
+
+class QuantizedIndex(VectorIndex):
+    """
+    Brute-force index over compact codes instead of float32 vectors. Scores are
+    approximate, so callers re-rank the best candidates against the float vectors.
+    """
+    needs_rerank = True
+    chunk_size = 65536
+
+    def __init__(self):
+        super().__init__()
+        self.codes = EmbeddingMatrix(dtype=np.uint8)
+
+    def add(self, ids, vectors: np.ndarray):
+        if len(ids):
+            self.add_codes(ids, quantize(vectors, self.kind))
+
+    def add_codes(self, ids, codes: np.ndarray):
+        """Adds rows already encoded by `quantize`, e.g. read back from the database."""
+        self.codes.append(ids, codes)
+        self._count += len(ids)
+        if len(ids):
+            self.max_id = max(self.max_id, int(max(ids)))
+
+    def _approximate_scores(self, codes: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def search(self, query_vector: np.ndarray, k: int) -> list[tuple[int, float]]:
+        ids, codes = self.codes.arrays()
+        if codes is None:
+            return []
+        query_vector = normalize_rows(query_vector)
+        # Scoring in chunks bounds the temporary widened copies of the codes.
+        scores = np.concatenate([
+            self._approximate_scores(codes[start:start + self.chunk_size], query_vector)
+            for start in range(0, len(codes), self.chunk_size)
+        ])
+        return _select_topk(*self._live(ids, scores), k)
+
+    def ids(self) -> np.ndarray:
+        ids, _ = self.codes.arrays()
+        return self._live(ids, ids)[0]
+
+    def _state(self) -> dict:
+        ids, codes = self.codes.arrays()
+        ids, codes = self._live(ids, codes if codes is not None else np.empty((0, 0), dtype=np.uint8))
+        return {"ids": ids, "codes": codes}
+
+    @classmethod
+    def _from_state(cls, state: dict) -> "QuantizedIndex":
+        index = cls()
+        index.add_codes(state["ids"], state["codes"])
+        return index
+
+class Int8Index(QuantizedIndex):
+    """Scalar-quantized index: a per-vector scale plus one signed byte per dimension (~4x smaller than float32)."""
+    kind = "int8"
+
+    def _approximate_scores(self, codes: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+        scales = np.ascontiguousarray(codes[:, :4]).view(np.float32).ravel()
+        return (codes[:, 4:].view(np.int8).astype(np.float32) @ query_vector) * scales
+
+class BinaryIndex(QuantizedIndex):
+    """Sign-bit index: one bit per dimension (32x smaller than float32), scored by Hamming distance."""
+    kind = "binary"
+
+    def _approximate_scores(self, codes: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+        query_bits = np.packbits(query_vector > 0)
+        hamming = _POPCOUNT[np.bitwise_xor(codes, query_bits)].sum(axis=1, dtype=np.int32)
+        return 1.0 - 2.0 * hamming / (codes.shape[1] * 8)
+
+INDEX_TYPES = {cls.kind: cls for cls in (FlatIndex, IVFIndex, Int8Index, BinaryIndex)}
@@ -0,0 +1,34 @@
+import os
+import sys
+
+# Modules import each other from the skyscope_os root (`from memory.db import ...`).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hashlib
+import numpy as np
+import pytest
+
+class HashingEmbedder:
+    """Deterministic bag-of-words stand-in for a SentenceTransformer: texts sharing words get similar vectors."""
+    def __init__(self, dim: int = 64):
+        self.dim = dim
+        self.calls = 0
+
+    def encode(self, texts, batch_size: int = 32, **kwargs):
+        self.calls += 1
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dim] += 1.0
+        return vectors
+
+@pytest.fixture
+def embedder():
+    return HashingEmbedder()
+
+@pytest.fixture(autouse=True)
+def _close_databases():
+    from memory.db import ConnectionManager
+    yield
+    for manager in list(ConnectionManager._registry.values()):
+        manager.close()
@@ -0,0 +1,72 @@
+import json
+import pytest
+
+pytest.importorskip("psutil")
+pytest.importorskip("alive_progress")
+pytest.importorskip("prompt_toolkit")
+from cli import cli
+
+class FakeResponse:
+    def __init__(self, payload=None, lines=(), status=200):
+        self.payload = payload
+        self.lines = lines
+        self.ok = status < 400
+        self.status_code = status
+
+    def json(self):
+        return self.payload
+
+    def raise_for_status(self):
+        if not self.ok:
+            raise cli.requests.HTTPError(str(self.status_code))
+
+    def iter_lines(self, decode_unicode=True):
+        return iter(self.lines)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def sse(*events):
+    return [f"data: {json.dumps(event)}" for event in events]
+
+@pytest.fixture
+def orchestrator(monkeypatch):
+    state = {"events": [], "job": {"result": None, "error": None}, "job_status": 200}
+
+    def post(url, json=None, **kwargs):
+        return FakeResponse({"job_id": "j1"})
+
+    def get(url, **kwargs):
+        if url.endswith("/events"):
+            return FakeResponse(lines=sse(*state["events"]))
+        return FakeResponse(state["job"], status=state["job_status"])
+
+    monkeypatch.setattr(cli.requests, "post", post)
+    monkeypatch.setattr(cli.requests, "get", get)
+    return state
+
+def test_stream_task_returns_the_full_result(orchestrator):
+    full = "x" * 5000
+    orchestrator["events"] = [{"type": "step", "step": 1, "thought": "thinking"},
+                              {"type": "final_answer", "output": full[:2000]}, {"type": "end"}]
+    orchestrator["job"] = {"result": full, "error": None}
+    seen = []
+    assert cli.stream_task("task", seen.append) == full
+    assert [event["type"] for event in seen] == ["step", "final_answer", "end"]
+
+def test_stream_task_falls_back_to_the_streamed_answer(orchestrator):
+    orchestrator["events"] = [{"type": "final_answer", "output": "short"}, {"type": "end"}]
+    orchestrator["job_status"] = 404
+    assert cli.stream_task("task", lambda event: None) == "short"
+
+def test_stream_task_reports_failures(orchestrator):
+    orchestrator["events"] = [{"type": "status", "status": "failed", "error": "boom"}, {"type": "end"}]
+    orchestrator["job"] = {"result": None, "error": "boom"}
+    assert cli.stream_task("task", lambda event: None) == "Task failed: boom"
+
+def test_format_event():
+    assert cli.format_event({"type": "tool_call", "tool": "read_file", "arguments": {"path": "/etc"}}) == "Calling read_file({'path': '/etc'})"
+    assert cli.format_event({"type": "end"}) is None
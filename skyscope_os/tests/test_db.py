@@ -0,0 +1,74 @@
+import threading
+import pytest
+from memory.db import ConnectionManager
+
+@pytest.fixture
+def db(tmp_path):
+    manager = ConnectionManager.get(str(tmp_path / "test.db"))
+    manager.write(lambda conn: conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, value TEXT)"))
+    return manager
+
+def count(db) -> int:
+    with db.read() as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+def test_get_returns_one_manager_per_path(db):
+    assert ConnectionManager.get(db.db_path) is db
+
+def test_connections_use_wal(db):
+    with db.read() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+def test_write_returns_the_result_and_rolls_back_on_error(db):
+    assert db.write(lambda conn: conn.execute("INSERT INTO items (value) VALUES ('a')").lastrowid) == 1
+
+    def failing(conn):
+        conn.execute("INSERT INTO items (value) VALUES ('b')")
+        raise ValueError("boom")
+    with pytest.raises(ValueError):
+        db.write(failing)
+    assert count(db) == 1
+
+def test_concurrent_writers_never_see_locked_errors(db):
+    errors = []
+    def worker(n):
+        try:
+            for i in range(50):
+                db.write(lambda conn: conn.execute("INSERT INTO items (value) VALUES (?)", (f"{n}-{i}",)))
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert count(db) == 400
+
+def test_each_thread_keeps_its_own_reader(db):
+    with db.read() as first, db.read() as again:
+        assert first is again
+    other = []
+    def read_in_thread():
+        with db.read() as conn:
+            other.append(conn)
+    thread = threading.Thread(target=read_in_thread)
+    thread.start()
+    thread.join()
+    assert other[0] is not first
+
+def test_nested_writes_run_on_the_writer_thread(db):
+    def outer(conn):
+        db.write(lambda inner: inner.execute("INSERT INTO items (value) VALUES ('nested')"))
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+    assert db.write(outer) == 1
+
+def test_close_drains_pending_writes_and_unregisters(tmp_path):
+    manager = ConnectionManager.get(str(tmp_path / "close.db"))
+    manager.write(lambda conn: conn.execute("CREATE TABLE t (x)"))
+    manager.close()
+    assert ConnectionManager._registry.get(manager.db_path) is None
+    reopened = ConnectionManager.get(manager.db_path)
+    assert reopened is not manager
+    with reopened.read() as conn:
+        assert conn.execute("SELECT name FROM sqlite_master").fetchone() == ("t",)
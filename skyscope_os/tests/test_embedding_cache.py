@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from memory.db import ConnectionManager
+from memory.embedding_cache import EmbeddingCache
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "embeddings.db")
+
+def test_repeated_texts_skip_the_model(embedder, cache_path):
+    cache = EmbeddingCache(embedder, cache_path, "hashing-64")
+    first = cache.encode(["arxiv retrieval papers", "macos sources"])
+    second = cache.encode(["arxiv retrieval papers"])
+    assert embedder.calls == 1
+    np.testing.assert_array_equal(first[0], second[0])
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_whitespace_and_unicode_form_share_an_entry(embedder, cache_path):
+    cache = EmbeddingCache(embedder, cache_path, "hashing-64")
+    cache.encode(["café menu"])
+    cache.encode(["  café\n menu "])
+    assert embedder.calls == 1
+
+def test_duplicates_in_one_call_are_encoded_once(embedder, cache_path):
+    cache = EmbeddingCache(embedder, cache_path, "hashing-64")
+    vectors = cache.encode(["same text", "same text"])
+    assert vectors.shape == (2, embedder.dim)
+    assert cache.stats()["misses"] == 1
+
+def test_model_name_is_part_of_the_key(embedder, cache_path):
+    EmbeddingCache(embedder, cache_path, "model-a").encode(["same text"])
+    EmbeddingCache(embedder, cache_path, "model-b").encode(["same text"])
+    assert embedder.calls == 2
+
+def test_vectors_survive_a_restart(embedder, cache_path):
+    EmbeddingCache(embedder, cache_path, "hashing-64").encode(["arxiv retrieval papers"])
+    ConnectionManager.get(cache_path).close()
+
+    cache = EmbeddingCache(embedder, cache_path, "hashing-64")
+    cache.encode(["arxiv retrieval papers"])
+    assert embedder.calls == 1
+    assert cache.stats()["disk_hits"] == 1
+
+def test_lru_is_bounded(embedder, cache_path):
+    cache = EmbeddingCache(embedder, cache_path, "hashing-64", max_entries=2)
+    cache.encode(["one", "two", "three"])
+    assert cache.stats()["entries"] == 2
+
+def test_disk_table_keeps_the_most_recently_used(embedder, cache_path):
+    cache = EmbeddingCache(embedder, cache_path, "hashing-64", max_entries=1, max_disk_entries=2, trim_every=1)
+    cache.encode(["one"])
+    cache.encode(["two"])
+    cache.encode(["one"])  # a disk hit, so "two" is now the least recently used
+    cache.encode(["three"])
+    assert cache.stats()["trimmed"] == 1
+    with cache.db.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0] == 2
+
+    calls = embedder.calls
+    cache.encode(["one"])
+    cache.encode(["two"])
+    assert embedder.calls == calls + 1  # only the trimmed vector is encoded again
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import pytest
+from core.jobs import EventStream, JobManager, QueueFullError
+
+class GatedRunner:
+    """A runner whose jobs block until released, so tests control when they finish."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = threading.Semaphore(0)
+
+    def __call__(self, job):
+        interrupted = threading.Event()
+        job.interrupt = interrupted.set
+        self.started.release()
+        self.release.wait(5)
+        if interrupted.is_set():
+            raise RuntimeError("interrupted")
+        if job.task == "fail":
+            raise ValueError("bad task")
+        return f"done: {job.task}"
+
+@pytest.fixture
+def runner():
+    return GatedRunner()
+
+@pytest.fixture
+def manager(runner):
+    manager = JobManager(runner, max_workers=1, max_queued=1)
+    yield manager
+    runner.release.set()
+    manager.shutdown()
+
+def test_job_runs_to_completion(manager, runner):
+    job = manager.submit("build")
+    assert runner.started.acquire(timeout=5)
+    assert manager.get(job.id).status == "running"
+    runner.release.set()
+    assert job.future.result(timeout=5) == "done: build"
+    assert job.to_dict()["status"] == "succeeded"
+    assert job.finished_at >= job.started_at >= job.created_at
+
+def test_failures_are_recorded(manager, runner):
+    runner.release.set()
+    job = manager.submit("fail")
+    job.future.result(timeout=5)
+    assert (job.status, job.error) == ("failed", "bad task")
+
+def test_queue_depth_is_bounded(manager, runner):
+    manager.submit("first")
+    manager.submit("second")
+    with pytest.raises(QueueFullError):
+        manager.submit("third")
+    assert runner.started.acquire(timeout=5)
+    assert manager.stats() == {"running": 1, "queued": 1, "max_workers": 1, "max_queued": 1}
+
+def test_cancel_a_queued_job_frees_its_slot(manager, runner):
+    manager.submit("first")
+    queued = manager.submit("second")
+    assert manager.cancel(queued.id).status == "cancelled"
+    manager.submit("third")  # the cancelled job no longer counts against the queue
+
+def test_cancel_a_running_job_interrupts_it(manager, runner):
+    job = manager.submit("long")
+    assert runner.started.acquire(timeout=5)
+    assert manager.cancel(job.id).status == "cancelling"
+    runner.release.set()
+    job.future.result(timeout=5)
+    assert job.status == "cancelled"
+    assert manager.cancel("unknown") is None
+
+def test_cancelling_a_waiter_releases_a_queued_job(manager, runner):
+    manager.submit("first")
+    assert runner.started.acquire(timeout=5)
+    queued = manager.submit("second")
+
+    async def disconnect():
+        # What a client disconnect does to a request awaiting the job's result.
+        waiter = asyncio.ensure_future(asyncio.wrap_future(queued.future))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.05)
+    asyncio.run(disconnect())
+
+    assert queued.status == "cancelled"
+    assert manager.stats()["queued"] == 0
+    manager.submit("third")  # the slot is free again
+    assert [e["type"] for e in queued.events._history][-2:] == ["status", "end"]
+
+def test_shutdown_ends_queued_jobs(runner):
+    manager = JobManager(runner, max_workers=1, max_queued=2)
+    running = manager.submit("first")
+    assert runner.started.acquire(timeout=5)
+    queued = manager.submit("second")
+    threading.Timer(0.1, runner.release.set).start()
+    manager.shutdown()
+    assert running.status == "succeeded"
+    assert queued.status == "cancelled"
+    assert queued.events._history[-1]["type"] == "end"
+    assert manager._active == 0
+
+def test_finished_jobs_are_pruned():
+    manager = JobManager(lambda job: job.task, max_workers=1, max_queued=10, max_finished=2)
+    jobs = [manager.submit(str(i)) for i in range(4)]
+    for job in jobs:
+        job.future.result(timeout=5)
+    manager.submit("last").future.result(timeout=5)
+    assert manager.get(jobs[0].id) is None
+    assert manager.get(jobs[3].id) is not None
+    manager.shutdown()
+
+async def drain(subscriber, until: str = "end") -> list[dict]:
+    events = []
+    while not events or events[-1]["type"] != until:
+        events.append(await asyncio.wait_for(subscriber.queue.get(), timeout=5))
+    return events
+
+def test_events_reach_live_and_late_subscribers():
+    async def scenario():
+        def runner(job):
+            job.events.publish({"type": "step", "step": 1})
+            return "ok"
+        manager = JobManager(runner, max_workers=1)
+        job = manager.submit("task")
+        live = job.events.subscribe(asyncio.get_running_loop())
+        live_events = await drain(live)
+        late_events = await drain(job.events.subscribe(asyncio.get_running_loop()))
+        manager.shutdown()
+        return live_events, late_events
+
+    live_events, late_events = asyncio.run(scenario())
+    types = ["status", "step", "status", "end"]
+    # Whenever a client subscribes, the retained history fills in what it missed.
+    assert [e["type"] for e in live_events] == [e["type"] for e in late_events] == types
+    assert late_events[2]["status"] == "succeeded"
+    assert all("ts" in e for e in late_events)
+
+def test_slow_subscriber_drops_the_oldest_events():
+    async def scenario():
+        stream = EventStream()
+        subscriber = stream.subscribe(asyncio.get_running_loop(), max_buffer=3)
+        for i in range(5):
+            stream.publish({"type": "step", "step": i})
+        stream.publish({"type": "end"})
+        await asyncio.sleep(0)
+        events = await drain(subscriber)
+        stream.unsubscribe(subscriber)
+        stream.publish({"type": "step", "step": 99})
+        await asyncio.sleep(0)
+        return events, subscriber
+
+    events, subscriber = asyncio.run(scenario())
+    assert [e.get("step") for e in events] == [3, 4, None]
+    assert subscriber.dropped == 3
+    assert subscriber.queue.empty()
@@ -0,0 +1,115 @@
+import re
+import sqlite3
+import zlib
+import pytest
+from memory.memory import KnowledgeStack
+
+@pytest.fixture
+def stack(tmp_path, embedder):
+    return KnowledgeStack(str(tmp_path / "knowledge.db"), embedder, index="flat", passage_chars=200)
+
+def test_add_many_with_a_document_replaced_in_the_same_commit(stack):
+    stack.add_many([("u", "t", "first version"), ("u", "t", "second version")])
+    assert len(stack.index) == 1
+    assert stack.retrieve("u") == "second version"
+    assert "URI: u" in stack.search("second version", mode="vector")
+    stack.add("v", "t", "another document")
+    assert len(stack.index) == 2
+
+def test_ivf_index_is_persisted_and_caught_up_on_reload(tmp_path, embedder):
+    path = str(tmp_path / "knowledge.db")
+    stack = KnowledgeStack(path, embedder, index="ivf")
+    stack.add("a", "clang", "compiling the macos sources with clang")
+    stack.add("b", "arxiv", "searching arxiv for retrieval papers")
+    stack.save_index()
+    # Written after the save: the reload must replay the new row and drop the replaced one.
+    stack.add("b", "arxiv", "searching arxiv for quantization papers")
+    stack.add("c", "github", "downloading the github release")
+
+    reloaded = KnowledgeStack(path, embedder, index="ivf")
+    assert reloaded.index.kind == "ivf"
+    assert len(reloaded.index) == 3
+    assert "URI: b" in reloaded.search("arxiv quantization papers", topk=1, mode="vector")
+
+def test_add_many_streams_batches_and_reports_progress(stack, embedder):
+    documents = ({"source_uri": f"doc-{i}", "title": f"note {i}", "content": f"observation number {i} " * 20} for i in range(25))
+    progress = []
+    stats = stack.add_many(documents, encode_batch_size=4, commit_every=8, progress_callback=progress.append)
+
+    assert stats["documents"] == 25
+    assert stats["passages"] == len(stack.index) > 25
+    assert [p["documents"] for p in progress] == [8, 16, 24, 25]
+    assert embedder.calls == 7  # one encode per batch of 4 documents
+    assert stack.retrieve("doc-7") == "observation number 7 " * 20
+
+@pytest.fixture
+def corpus(stack):
+    stack.add("cve", "advisory", "CVE-2023-1234 allows remote code execution in the parser")
+    stack.add("guide", "guide", "how to harden the parser against remote attacks")
+    stack.add("notes", "notes", "release notes for the compiler toolchain")
+    return stack
+
+def test_lexical_search_matches_exact_identifiers(corpus):
+    result = corpus.search("CVE-2023-1234", topk=1, mode="lexical")
+    assert "URI: cve" in result
+    assert corpus.search("nonexistentterm", mode="lexical") == "No relevant knowledge found."
+
+def test_hybrid_and_prefilter_modes(corpus):
+    assert "URI: cve" in corpus.search("CVE-2023-1234 parser", topk=1, mode="hybrid")
+    prefiltered = corpus.search("remote parser", topk=3, mode="prefilter")
+    assert "URI: notes" not in prefiltered
+    assert corpus.search("x", mode="fuzzy") == "Unknown search mode 'fuzzy'."
+
+def test_replaced_documents_leave_the_fts_index(corpus):
+    corpus.add("cve", "advisory", "withdrawn")
+    assert corpus.search("CVE-2023-1234", mode="lexical") == "No relevant knowledge found."
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = KnowledgeStack._reciprocal_rank_fusion([[(1, 0.9), (2, 0.8)], [(2, 5.0), (3, 4.0)]], k=60)
+    assert [row_id for row_id, _ in fused] == [2, 1, 3]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+
+def test_fts_query_quotes_terms():
+    assert KnowledgeStack._fts_query('CVE-2023-1234 say "hi" --') == '"CVE-2023-1234" OR "say" OR """hi"""'
+
+def test_passages_tile_the_document(stack):
+    content = "\n\n".join(f"Paragraph {i} describes step {i} of the build in some detail." for i in range(12))
+    passages = stack._split_passages(content)
+    assert len(passages) > 1
+    assert "".join(text for _, _, text in passages) == content
+    assert all(end - start <= 200 for start, end, _ in passages)
+    assert [start for start, _, _ in passages[1:]] == [end for _, end, _ in passages[:-1]]
+
+def test_retrieve_a_passage_or_byte_range(stack):
+    content = "".join(f"Section {i}: naïve résumé handling.\n\n" for i in range(20))
+    stack.add("doc", "unicode", content)
+    assert stack.retrieve("doc") == content
+    assert stack.retrieve("missing") is None
+
+    result = stack.search("Section 13", topk=1, mode="lexical")
+    passage_id = int(re.search(r"Passage: (\d+)", result).group(1))
+    start, end = map(int, re.search(r"Bytes: (\d+)-(\d+)", result).groups())
+    passage = stack.retrieve("doc", passage_id=passage_id)
+    assert "Section 13" in passage
+    assert passage.encode("utf-8") == content.encode("utf-8")[start:end]
+
+    # A range that cuts through a two-byte character drops the partial character.
+    raw = content.encode("utf-8")
+    cut = raw.index("ï".encode("utf-8")) + 1
+    assert stack.retrieve("doc", byte_start=0, byte_end=cut) == raw[:cut - 1].decode("utf-8")
+    assert stack.retrieve("doc", byte_start=300, byte_end=700) == raw[300:700].decode("utf-8", errors="ignore")
+
+def test_single_blob_documents_are_migrated_to_passages(tmp_path, embedder):
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE knowledge (id INTEGER PRIMARY KEY AUTOINCREMENT, source_uri TEXT UNIQUE, title TEXT, compressed_content BLOB, embedding BLOB)")
+    vector = embedder.encode(["legacy document about compilers"])[0]
+    conn.execute("INSERT INTO knowledge (source_uri, title, compressed_content, embedding) VALUES (?, ?, ?, ?)",
+                 ("old", "legacy", zlib.compress(b"legacy document about compilers"), vector.tobytes()))
+    conn.commit()
+    conn.close()
+
+    stack = KnowledgeStack(path, embedder, index="flat")
+    assert stack.retrieve("old") == "legacy document about compilers"
+    assert len(stack.index) == 1
+    assert "URI: old" in stack.search("compilers", mode="lexical")
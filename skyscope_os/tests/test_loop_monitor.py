@@ -0,0 +1,20 @@
+import asyncio
+import time
+from core.loop_monitor import EventLoopLagMonitor
+
+def test_blocking_call_shows_up_as_lag():
+    async def scenario():
+        monitor = EventLoopLagMonitor(interval_sec=0.01)
+        task = asyncio.create_task(monitor.run())
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # blocks the loop, as a synchronous call in a coroutine would
+        await asyncio.sleep(0.05)
+        task.cancel()
+        return monitor.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["max_ms"] >= 150
+    assert stats["mean_ms"] <= stats["max_ms"]
+
+def test_stats_without_samples():
+    assert EventLoopLagMonitor().stats() == {"current_ms": 0.0, "mean_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
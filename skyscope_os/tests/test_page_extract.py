@@ -0,0 +1,60 @@
+import pytest
+from tooling.page_extract import ExtractionCache, chunk, estimate_tokens
+
+def page(body):
+    return f"<html><head><title>t</title></head><body>{body}</body></html>"
+
+PARAGRAPHS = "".join(f"<p>Paragraph {i}, with enough words, commas, and detail to count as content.</p>" for i in range(8))
+
+@pytest.fixture
+def extract():
+    pytest.importorskip("bs4")
+    from tooling.page_extract import extract
+    return extract
+
+def test_main_content_drops_boilerplate(extract):
+    html = page(f'<nav>Home</nav><div class="sidebar">Related links</div><div class="ad-slot">Buy now</div>'
+                f'<div id="story">{PARAGRAPHS}</div><footer>Copyright</footer>')
+    text = extract(html, "text")
+    assert "Paragraph 0" in text and "Paragraph 7" in text
+    for boilerplate in ("Home", "Related links", "Buy now", "Copyright"):
+        assert boilerplate not in text
+
+@pytest.mark.parametrize("css_class", ["head-line", "lead-in", "thread-list", "download-section"])
+def test_hints_match_whole_tokens(extract, css_class):
+    html = page(f'<div id="story"><div class="{css_class}">Keep this sentence.</div>{PARAGRAPHS}</div>')
+    assert "Keep this sentence." in extract(html, "text")
+
+def test_token_hints_keep_article_blocks(extract):
+    html = page(f'<article><div class="article-head">Headline here</div>{PARAGRAPHS}</article>')
+    assert "Headline here" in extract(html, "text")
+
+def test_selector_and_html_output(extract):
+    html = page('<ul><li><a href="/a" class="x" onclick="go()">A</a></li></ul><p>Other</p>')
+    assert extract(html, "html", selector="ul") == '<ul>\n<li><a href="/a">A</a></li></ul>'
+    with pytest.raises(ValueError):
+        extract(html, "text", selector="table")
+
+def test_chunk_walks_the_text_with_a_cursor():
+    text = "\n".join(f"line {i} " + "word " * 20 for i in range(100))
+    cursor = 0
+    while True:
+        part = chunk(text, cursor, max_tokens=200)
+        if "call again with cursor=" not in part:
+            assert part == text[cursor:]
+            break
+        body, footer = part.rsplit("\n[... about ", 1)
+        next_cursor = int(footer.split("cursor=")[1].split(" ")[0])
+        assert body == text[cursor:next_cursor].rstrip()
+        assert estimate_tokens(body) <= 201
+        cursor = next_cursor
+    assert chunk(text, len(text)).startswith("[End of content")
+
+def test_extraction_cache_evicts_least_recently_used():
+    cache = ExtractionCache(max_entries=2)
+    cache.put(("a",), "A")
+    cache.put(("b",), "B")
+    assert cache.get(("a",)) == "A"
+    cache.put(("c",), "C")
+    assert cache.get(("b",)) is None
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 1}
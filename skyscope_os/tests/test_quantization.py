@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from memory.memory import KnowledgeStack, SkyMemory
+from memory.quantize_db import evaluate, migrate
+from memory.vector_index import Int8Index, normalize_rows, quantize
+
+TEXTS = [
+    "compiled the macos sources with clang",
+    "searched arxiv for retrieval papers",
+    "navigated to the github release page",
+    "rotated the signing certificate",
+    "restored the nginx config from a snapshot",
+]
+
+def test_int8_codes_approximate_the_dot_product():
+    vectors = normalize_rows(np.random.default_rng(0).standard_normal((50, 32)))
+    index = Int8Index()
+    index.add_codes(np.arange(50), quantize(vectors, "int8"))
+    approximate = dict(index.search(vectors[7], 50))
+    exact = vectors @ vectors[7]
+    assert max(abs(approximate[i] - exact[i]) for i in range(50)) < 0.05
+
+@pytest.mark.parametrize("kind", ["int8", "binary"])
+def test_code_sizes(kind):
+    codes = quantize(normalize_rows(np.ones((3, 64))), kind)
+    assert codes.dtype == np.uint8
+    assert codes.shape == (3, 4 + 64 if kind == "int8" else 8)
+
+@pytest.mark.parametrize("kind", ["int8", "binary"])
+def test_sky_memory_reranks_quantized_candidates(tmp_path, embedder, kind):
+    memory = SkyMemory(str(tmp_path / "memory.db"), embedder, quantization=kind)
+    ids = [memory.store("episode", text) for text in TEXTS]
+    assert memory.index.kind == kind and memory.index.needs_rerank
+    best_id, score = memory.nearest("arxiv retrieval papers", topk=1)[0]
+    assert best_id == ids[1]
+    # Re-ranked scores are exact cosine similarities on the float embeddings.
+    query = normalize_rows(embedder.encode(["arxiv retrieval papers"]))[0]
+    assert score == pytest.approx(float(normalize_rows(embedder.encode([TEXTS[1]]))[0] @ query), abs=1e-5)
+
+@pytest.mark.parametrize("kind", ["int8", "binary"])
+def test_knowledge_stack_with_quantized_index(tmp_path, embedder, kind):
+    stack = KnowledgeStack(str(tmp_path / "knowledge.db"), embedder, index=kind)
+    for i, text in enumerate(TEXTS):
+        stack.add(f"doc-{i}", "note", text)
+    assert "URI: doc-3" in stack.search("signing certificate", topk=1, mode="vector")
+
+    reloaded = KnowledgeStack(str(tmp_path / "knowledge.db"), embedder, index=kind)
+    assert len(reloaded.index) == len(TEXTS)
+
+def test_migrate_fills_codes_for_existing_rows(tmp_path, embedder):
+    path = str(tmp_path / "memory.db")
+    memory = SkyMemory(path, embedder)
+    for text in TEXTS:
+        memory.store("episode", text)
+
+    assert migrate(path, "binary", "memory") == len(TEXTS)
+    assert migrate(path, "binary", "memory") == 0
+    report = evaluate(path, "binary", "memory", queries=5, k=2, rerank_factor=2)
+    assert report["quantized_bytes"] * 32 == report["float32_bytes"]
+    assert report["recall_reranked"] >= report["recall_raw"]
+    assert len(SkyMemory(path, embedder, quantization="binary").index) == len(TEXTS)
@@ -0,0 +1,345 @@
+import json
+import os
+import time
+import pytest
+from governance.rollback_manager import RollbackManager
+
+@pytest.fixture
+def manager(tmp_path):
+    return RollbackManager(str(tmp_path / "store"), max_workers=4)
+
+def write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+def test_rollback_through_a_symlink_restores_the_target(manager, tmp_path):
+    target = tmp_path / "resolv.conf.real"
+    link = tmp_path / "resolv.conf"
+    write(target, "nameserver 1.1.1.1\n")
+    os.symlink(target, link)
+    snapshot_id, error = manager.create_snapshot([str(link)])
+    assert error is None
+    write(link, "nameserver 6.6.6.6\n")
+
+    ok, _ = manager.rollback(snapshot_id)
+    assert ok
+    assert os.path.islink(link)
+    assert read(target) == "nameserver 1.1.1.1\n"
+
+def test_rollback_keeps_hard_links(manager, tmp_path):
+    original = tmp_path / "a.conf"
+    alias = tmp_path / "b.conf"
+    write(original, "value = 1\n")
+    os.link(original, alias)
+    snapshot_id, _ = manager.create_snapshot([str(original)])
+    write(original, "value = 2, longer\n")
+
+    assert manager.rollback(snapshot_id)[0]
+    assert os.path.samefile(original, alias)
+    assert read(alias) == "value = 1\n"
+
+@pytest.mark.parametrize("links", [1, 2])
+@pytest.mark.parametrize("damage", ["missing", "truncated", "corrupt"])
+def test_damaged_blob_leaves_the_file_untouched(tmp_path, links, damage):
+    manager = RollbackManager(str(tmp_path / "store"), compression="zlib" if damage == "corrupt" else None)
+    path = tmp_path / "app.conf"
+    write(path, "value = 1\n" * 50)
+    for i in range(1, links):
+        os.link(path, tmp_path / f"alias{i}.conf")
+    snapshot_id, _ = manager.create_snapshot([str(path)])
+    write(path, "value = 2\n")
+
+    blob = os.path.join(manager.blob_dir, blob_files(manager)[0][:2], blob_files(manager)[0])
+    if damage == "missing":
+        os.remove(blob)
+    elif damage == "truncated":
+        with open(blob, "r+b") as f:
+            f.truncate(10)
+    else:
+        with open(blob, "r+b") as f:
+            f.seek(4)
+            f.write(b"\xff" * 8)
+
+    ok, _ = manager.rollback(snapshot_id)
+    assert not ok
+    assert read(path) == "value = 2\n"
+    assert [name for name in os.listdir(tmp_path) if name.startswith(".skyscope-restore-")] == []
+
+def test_rollback_keeps_the_current_owner_and_restores_the_mode(manager, tmp_path):
+    path = tmp_path / "app.conf"
+    write(path, "x = 1\n")
+    os.chmod(path, 0o640)
+    snapshot_id, _ = manager.create_snapshot([str(path)])
+    write(path, "x = 2\n")
+    os.chmod(path, 0o600)
+    before = os.stat(path)
+
+    assert manager.rollback(snapshot_id)[0]
+    after = os.stat(path)
+    assert read(path) == "x = 1\n"
+    assert after.st_mode & 0o7777 == 0o640
+    assert (after.st_uid, after.st_gid) == (before.st_uid, before.st_gid)
+
+def fake_reflink(src, dst) -> bool:
+    """Stands in for FICLONE on filesystems that cannot clone: dst ends up with src's content and offset 0."""
+    dst.write(src.read())
+    dst.seek(0)
+    return True
+
+def test_cloned_blobs_are_not_counted_as_written(manager, tmp_path):
+    large = tmp_path / "model.bin"
+    large.write_bytes(os.urandom(3 << 20))
+    manager._reflink = fake_reflink
+    snapshot_id, error = manager.create_snapshot([str(large)])
+    assert error is None
+
+    stats = manager.list_snapshots()[0]["stats"]
+    assert stats["new_blobs"] == 1
+    assert stats["bytes_new"] == stats["bytes_cloned"] == 3 << 20
+    assert stats["bytes_written"] == 0 and stats["ratio"] is None
+
+    large.write_bytes(b"\0" * 10)
+    assert manager.rollback(snapshot_id)[0]
+    assert large.stat().st_size == 3 << 20
+
+def test_copied_blobs_are_counted_as_written(manager, tmp_path):
+    large = tmp_path / "model.bin"
+    large.write_bytes(os.urandom(3 << 20))
+    manager._reflink = lambda src, dst: False
+    manager.create_snapshot([str(large)])
+
+    stats = manager.list_snapshots()[0]["stats"]
+    assert stats["bytes_written"] == stats["bytes_new"] == 3 << 20
+    assert stats["bytes_cloned"] == 0 and stats["ratio"] == 1.0
+
+def blob_files(manager) -> list[str]:
+    return [name for _, _, files in os.walk(manager.blob_dir) for name in files]
+
+def test_identical_content_is_stored_once(manager, tmp_path):
+    for name in ("a.conf", "b.conf"):
+        write(tmp_path / name, "same content\n")
+    first, _ = manager.create_snapshot([str(tmp_path / "a.conf"), str(tmp_path / "b.conf")])
+    second, _ = manager.create_snapshot([str(tmp_path / "a.conf")])
+    assert len(blob_files(manager)) == 1
+
+    assert manager.delete_snapshot(first)[0]
+    assert len(blob_files(manager)) == 1  # still referenced by the second snapshot
+    assert manager.delete_snapshot(second)[0]
+    assert blob_files(manager) == []
+    assert manager.delete_snapshot(second) == (False, f"Snapshot '{second}' not found.")
+
+def test_rollback_restores_modified_and_deleted_files(manager, tmp_path):
+    kept, deleted = tmp_path / "kept.conf", tmp_path / "deleted.conf"
+    write(kept, "original\n")
+    write(deleted, "will be deleted\n")
+    snapshot_id, _ = manager.create_snapshot([str(kept), str(deleted), str(tmp_path / "missing.conf")])
+    write(kept, "changed\n")
+    os.remove(deleted)
+
+    ok, message = manager.rollback(snapshot_id)
+    assert ok and "(2 of 2 files restored)" in message
+    assert (read(kept), read(deleted)) == ("original\n", "will be deleted\n")
+    assert manager.rollback("snapshot_missing") == (False, "Snapshot 'snapshot_missing' not found.")
+
+def test_keep_last_prunes_old_snapshots_and_their_blobs(tmp_path):
+    manager = RollbackManager(str(tmp_path / "store"), keep_last=2)
+    path = tmp_path / "app.conf"
+    ids = []
+    for version in range(4):
+        write(path, f"version {version}\n")
+        ids.append(manager.create_snapshot([str(path)])[0])
+    assert [s["snapshot_id"] for s in manager.list_snapshots()] == ids[:1:-1]
+    assert len(blob_files(manager)) == 2
+
+def test_gc_removes_orphaned_blobs(manager, tmp_path):
+    write(tmp_path / "app.conf", "content\n")
+    manager.create_snapshot([str(tmp_path / "app.conf")])
+    orphan = os.path.join(manager.blob_dir, "ab", "ab" + "0" * 62)
+    write(orphan, "left behind by a crash")
+    assert manager.gc() == (1, len("left behind by a crash"))
+    assert len(blob_files(manager)) == 1
+
+def test_legacy_snapshot_directories_still_roll_back(manager, tmp_path):
+    path = tmp_path / "app.conf"
+    legacy_dir = os.path.join(manager.snapshot_dir, "snapshot_20240101000000")
+    os.makedirs(legacy_dir)
+    write(os.path.join(legacy_dir, "app.conf"), "legacy copy\n")
+    with open(os.path.join(legacy_dir, "metadata.json"), "w") as f:
+        json.dump({"snapshot_id": "snapshot_20240101000000", "files": {
+            str(path): {"original_path": str(path), "backup_path": os.path.join(legacy_dir, "app.conf"), "original_hash": ""}
+        }}, f)
+    write(path, "current\n")
+    assert manager.rollback("snapshot_20240101000000")[0]
+    assert read(path) == "legacy copy\n"
+
+def test_parallel_snapshot_and_rollback_of_many_files(manager, tmp_path):
+    paths = [tmp_path / f"file{i}.txt" for i in range(200)]
+    for i, path in enumerate(paths):
+        write(path, f"content {i}\n" * (i + 1))
+    large = tmp_path / "large.bin"
+    large.write_bytes(os.urandom((1 << 20) * 2 + 123))
+    original = large.read_bytes()
+    snapshot_id, error = manager.create_snapshot([str(p) for p in paths] + [str(large)])
+    assert error is None
+
+    for path in paths[::2]:
+        write(path, "clobbered\n")
+    large.write_bytes(b"truncated")
+    ok, message = manager.rollback(snapshot_id)
+    assert ok and "(101 of 201 files restored)" in message
+    assert all(read(path) == f"content {i}\n" * (i + 1) for i, path in enumerate(paths))
+    assert large.read_bytes() == original
+
+def test_failed_clone_is_not_retried_on_the_same_devices(manager, tmp_path):
+    path = tmp_path / "large.bin"
+    path.write_bytes(os.urandom(1 << 20))
+    with open(path, "rb") as src, open(tmp_path / "copy.bin", "wb") as dst:
+        cloned = manager._reflink(src, dst)
+        devices = (os.fstat(src.fileno()).st_dev, os.fstat(dst.fileno()).st_dev)
+        assert cloned or devices in manager._no_reflink
+
+def test_incremental_snapshot_reuses_unchanged_files(manager, tmp_path):
+    paths = [tmp_path / f"file{i}.txt" for i in range(5)]
+    for path in paths:
+        write(path, f"{path.name}\n")
+    first, _ = manager.create_snapshot([str(p) for p in paths])
+    write(paths[0], "edited\n")
+    second, _ = manager.create_snapshot([str(p) for p in paths])
+
+    latest = manager.list_snapshots()[0]
+    assert latest["parent"] == first
+    assert latest["stats"]["reused"] == 4 and latest["stats"]["stored"] == 1
+    assert latest["files"] == 5  # every manifest still lists every file
+
+    # Deleting the parent must not break the child.
+    manager.delete_snapshot(first)
+    write(paths[3], "edited too\n")
+    assert manager.rollback(second)[0]
+    assert [read(p) for p in paths] == ["edited\n"] + [f"{p.name}\n" for p in paths[1:]]
+
+def test_files_modified_after_the_parent_started_are_reread(manager, tmp_path):
+    path = tmp_path / "app.conf"
+    write(path, "aaaa\n")
+    # An mtime at or after the parent's start means the file may have changed while it was read.
+    tick = time.time_ns() + 10**9
+    os.utime(path, ns=(tick, tick))
+    manager.create_snapshot([str(path)])
+    write(path, "bbbb\n")
+    os.utime(path, ns=(tick, tick))  # same size, same mtime, same inode
+    snapshot_id, _ = manager.create_snapshot([str(path)])
+
+    assert manager.list_snapshots()[0]["stats"]["reused"] == 0
+    write(path, "cccc\n")
+    manager.rollback(snapshot_id)
+    assert read(path) == "bbbb\n"
+
+def test_rollback_skips_files_that_already_match(manager, tmp_path):
+    same, changed = tmp_path / "same.conf", tmp_path / "changed.conf"
+    write(same, "same\n")
+    write(changed, "before\n")
+    snapshot_id, _ = manager.create_snapshot([str(same), str(changed)])
+    write(changed, "after\n")
+    inode = same.stat().st_ino
+    ok, message = manager.rollback(snapshot_id)
+    assert ok and "(1 of 2 files restored)" in message
+    assert same.stat().st_ino == inode
+
+def test_list_snapshots_by_metadata_and_time(manager, tmp_path):
+    write(tmp_path / "app.conf", "v1\n")
+    deploy, _ = manager.create_snapshot([str(tmp_path / "app.conf")], metadata={"reason": "deploy", "ticket": 42})
+    upgrade, _ = manager.create_snapshot([str(tmp_path / "app.conf")], metadata={"reason": "upgrade"})
+
+    assert [s["snapshot_id"] for s in manager.list_snapshots()] == [upgrade, deploy]
+    assert [s["snapshot_id"] for s in manager.list_snapshots(metadata={"reason": "deploy", "ticket": 42})] == [deploy]
+    assert manager.list_snapshots(metadata={"ticket": 43}) == []
+    assert manager.list_snapshots(until="2000-01-01") == []
+    assert len(manager.list_snapshots(since="2000-01-01", limit=1)) == 1
+
+def test_file_history_marks_snapshots_that_changed_the_file(manager, tmp_path):
+    path, other = tmp_path / "app.conf", tmp_path / "other.conf"
+    write(path, "v1\n")
+    write(other, "x\n")
+    first, _ = manager.create_snapshot([str(path), str(other)])
+    second, _ = manager.create_snapshot([str(path), str(other)])
+    write(path, "v2\n")
+    third, _ = manager.create_snapshot([str(path)])
+
+    history = manager.file_history(str(path))
+    assert [(h["snapshot_id"], h["changed"]) for h in history] == [(third, True), (second, False), (first, True)]
+    assert manager.file_history(str(path), limit=2)[-1]["changed"] is False
+
+def test_diff_snapshots(manager, tmp_path):
+    a, b, c = (tmp_path / name for name in ("a.conf", "b.conf", "c.conf"))
+    write(a, "a\n")
+    write(b, "b\n")
+    old, _ = manager.create_snapshot([str(a), str(b)])
+    write(a, "a2\n")
+    write(c, "c\n")
+    os.chmod(b, 0o600)
+    new, _ = manager.create_snapshot([str(a), str(c)])
+    diff = manager.diff_snapshots(old, new)
+    assert (diff["added"], diff["removed"], diff["modified"]) == ([str(c)], [str(b)], [str(a)])
+    assert manager.diff_snapshots(old, "nope") == "Error: snapshot 'nope' not found."
+
+def test_json_manifests_are_imported_into_the_catalogue(tmp_path):
+    store = tmp_path / "store"
+    manager = RollbackManager(str(store))
+    write(tmp_path / "app.conf", "content\n")
+    snapshot_id, _ = manager.create_snapshot([str(tmp_path / "app.conf")])
+    manifest = manager._load_manifest(snapshot_id)
+    manager.db.close()
+    os.remove(manager.catalogue_path)
+    # The layout written before the catalogue existed: one JSON manifest per snapshot.
+    os.makedirs(store / "manifests")
+    with open(store / "manifests" / f"{snapshot_id}.json", "w") as f:
+        json.dump(manifest, f)
+
+    reopened = RollbackManager(str(store))
+    assert [s["snapshot_id"] for s in reopened.list_snapshots()] == [snapshot_id]
+    assert not os.path.exists(store / "manifests")
+    write(tmp_path / "app.conf", "changed\n")
+    assert reopened.rollback(snapshot_id)[0]
+    assert read(tmp_path / "app.conf") == "content\n"
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+@pytest.mark.parametrize("size", [4096, 3 << 20])
+def test_compressed_blobs_round_trip(tmp_path, codec, size):
+    if codec == "zstd":
+        pytest.importorskip("zstandard")
+    manager = RollbackManager(str(tmp_path / "store"), compression=codec)
+    path = tmp_path / "app.log"
+    content = (b"GET /index.html 200 OK\n" * (size // 23 + 1))[:size]
+    path.write_bytes(content)
+    snapshot_id, _ = manager.create_snapshot([str(path)])
+
+    stats = manager.list_snapshots()[0]["stats"]
+    assert stats["compressed"] == 1 and stats["ratio"] > 5
+    assert blob_files(manager)[0].endswith({"zlib": ".z", "zstd": ".zst"}[codec])
+    path.write_bytes(b"")
+    assert manager.rollback(snapshot_id)[0]
+    assert path.read_bytes() == content
+
+def test_incompressible_files_are_stored_as_is(tmp_path):
+    manager = RollbackManager(str(tmp_path / "store"), compression="zlib")
+    path = tmp_path / "archive.bin"
+    path.write_bytes(os.urandom(8192))
+    manager.create_snapshot([str(path)])
+    stats = manager.list_snapshots()[0]["stats"]
+    assert (stats["compressed"], stats["incompressible"]) == (0, 1)
+    assert "." not in blob_files(manager)[0]
+
+def test_blobs_stored_uncompressed_still_restore_with_compression_on(tmp_path):
+    path = tmp_path / "app.conf"
+    write(path, "plain blob\n" * 100)
+    snapshot_id, _ = RollbackManager(str(tmp_path / "store")).create_snapshot([str(path)])
+    write(path, "changed\n")
+    assert RollbackManager(str(tmp_path / "store"), compression="zlib").rollback(snapshot_id)[0]
+    assert read(path) == "plain blob\n" * 100
+
+def test_unknown_codec_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        RollbackManager(str(tmp_path / "store"), compression="lz4")
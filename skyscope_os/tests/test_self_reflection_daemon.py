@@ -0,0 +1,130 @@
+import threading
+import time
+import pytest
+from learning.self_reflection_daemon import SelfReflectionDaemon
+from memory.memory import SkyMemory
+
+class RecordingLLM:
+    """Answers every prompt with a short fixed text and records the prompts it was given."""
+    def __init__(self, answer: str = "Lesson: retry flaky tools once."):
+        self.answer = answer
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def run(self, prompt: str) -> str:
+        with self._lock:
+            self.prompts.append(prompt)
+        return self.answer
+
+@pytest.fixture
+def memory(tmp_path, embedder):
+    return SkyMemory(str(tmp_path / "memory.db"), embedder)
+
+def daemon(memory, llm, **kwargs):
+    return SelfReflectionDaemon(memory, llm, **kwargs)
+
+def test_cluster_keeps_types_apart_and_batches_fit_the_budget(memory):
+    for i in range(12):
+        memory.store("tool_error", f"web_navigate timed out on page {i} " + "retrying the request " * 5)
+        memory.store("task_success", f"arxiv_search returned papers for query {i} " + "summarised results " * 5)
+    reflection = daemon(memory, RecordingLLM(), prompt_token_budget=120)
+    episodes = memory.since(0, limit=100, with_embeddings=True)
+
+    batches = reflection._cluster(episodes)
+
+    assert sorted(e["id"] for batch in batches for e in batch) == [e["id"] for e in episodes]
+    for batch in batches:
+        assert len({e["type"] for e in batch}) == 1
+        assert len(batch) == 1 or sum(reflection._estimate_tokens(reflection._episode_text(e)) for e in batch) <= 120
+
+def test_large_window_is_mapped_then_reflected_once(memory):
+    for i in range(20):
+        memory.store("tool_error", f"web_navigate timed out on page {i} " + "retrying the request " * 5)
+    llm = RecordingLLM()
+    reflection = daemon(memory, llm, prompt_token_budget=200, summary_token_budget=20)
+
+    assert reflection.reflect_once() == 20
+    cycle = reflection.last_cycle
+    assert cycle["clusters"] > 1
+    assert cycle["llm_calls"] == len(llm.prompts)
+    assert sum(prompt.startswith("Summarize") for prompt in llm.prompts) == cycle["llm_calls"] - 1 >= cycle["clusters"]
+    assert llm.prompts[-1].startswith("Analyze the following")
+    assert "page 0" not in llm.prompts[-1]  # the final prompt sees summaries, not raw logs
+
+def test_small_window_skips_map_reduce(memory):
+    memory.store("tool_error", "web_navigate timed out")
+    llm = RecordingLLM()
+    reflection = daemon(memory, llm)
+
+    assert reflection.reflect_once() == 1
+    assert reflection.last_cycle["llm_calls"] == 1
+    assert "web_navigate timed out" in llm.prompts[0]
+
+def test_cycles_only_read_episodes_past_the_high_water_mark(memory):
+    llm = RecordingLLM()
+    reflection = daemon(memory, llm)
+    first = memory.store("tool_error", "web_navigate timed out")
+    assert reflection.reflect_once() == 1
+    assert reflection.last_id == first
+
+    # Its own reflection is not fed back, and nothing new means no LLM call.
+    assert reflection.reflect_once() == 0
+    assert len(llm.prompts) == 1 and reflection.idle_cycles == 1
+
+    memory.store("task_success", "arxiv_search returned papers")
+    assert reflection.reflect_once() == 1
+    assert "web_navigate" not in llm.prompts[-1]
+
+def test_high_water_mark_survives_a_restart(memory):
+    memory.store("tool_error", "web_navigate timed out")
+    daemon(memory, RecordingLLM()).reflect_once()
+    restarted = daemon(memory, RecordingLLM())
+    assert restarted.last_id > 0
+    assert restarted.reflect_once() == 0
+
+def test_failed_llm_call_is_retried_next_cycle(memory):
+    class FlakyLLM(RecordingLLM):
+        def run(self, prompt):
+            if not self.prompts:
+                self.prompts.append(prompt)
+                raise RuntimeError("model unavailable")
+            return super().run(prompt)
+    memory.store("tool_error", "web_navigate timed out")
+    reflection = daemon(memory, FlakyLLM())
+    with pytest.raises(RuntimeError):
+        reflection.reflect_once()
+    assert reflection.last_id == 0
+    assert reflection.reflect_once() == 1
+
+def test_interval_follows_the_ingest_rate(memory):
+    reflection = daemon(memory, RecordingLLM(), lookback_limit=50, min_interval_sec=30, max_interval_sec=3600)
+    assert reflection._next_interval(50, backlog=True) == 30
+    reflection.interval_sec = 600
+    assert reflection._next_interval(0, backlog=False) == 1200
+    reflection.interval_sec = 3000
+    assert reflection._next_interval(0, backlog=False) == 3600
+
+def test_stop_wakes_the_daemon_from_its_sleep(memory):
+    reflection = daemon(memory, RecordingLLM(), reflection_interval_sec=3600, min_interval_sec=3600)
+    reflection.start()
+    assert reflection.stop(timeout=5)
+    assert not reflection.is_alive()
+
+def test_stop_gives_up_on_a_stuck_reflection(memory):
+    release = threading.Event()
+    class StuckLLM(RecordingLLM):
+        def run(self, prompt):
+            release.wait(5)
+            return super().run(prompt)
+    memory.store("tool_error", "web_navigate timed out")
+    reflection = daemon(memory, StuckLLM())
+    reflection.start()
+    while not reflection.in_flight:
+        time.sleep(0.01)
+    assert reflection.stop(timeout=0.1) is False
+    release.set()
+    reflection.join(5)
+    assert not reflection.is_alive()
+
+def test_stop_before_start(memory):
+    assert daemon(memory, RecordingLLM()).stop(timeout=0)
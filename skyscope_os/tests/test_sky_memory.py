@@ -0,0 +1,41 @@
+import pytest
+from memory.memory import SkyMemory
+
+@pytest.fixture
+def memory(tmp_path, embedder):
+    return SkyMemory(str(tmp_path / "memory.db"), embedder)
+
+def test_empty_memory(memory):
+    assert memory.search("anything") == "No memories found."
+    assert memory.nearest("anything") == []
+
+def test_nearest_ranks_by_cosine_similarity(memory):
+    ids = [memory.store("episode", text) for text in (
+        "compiled the macos sources with clang",
+        "searched arxiv for retrieval papers",
+        "navigated to the github release page",
+    )]
+    results = memory.nearest("arxiv retrieval papers", topk=3)
+    assert [row_id for row_id, _ in results][0] == ids[1]
+    scores = [score for _, score in results]
+    assert scores == sorted(scores, reverse=True)
+    assert 0 < scores[0] <= 1 + 1e-6
+
+def test_search_formats_the_winning_summaries(memory):
+    memory.store("episode", "searched arxiv for retrieval papers")
+    memory.store("episode", "compiled the macos sources")
+    result = memory.search("arxiv retrieval", topk=1)
+    assert result.startswith("Relevant Memories:\n- searched arxiv for retrieval papers (Score: ")
+    assert "macos" not in result
+
+def test_rows_written_by_another_instance_are_searchable(tmp_path, embedder):
+    path = str(tmp_path / "memory.db")
+    reader, writer = SkyMemory(path, embedder), SkyMemory(path, embedder)
+    row_id = writer.store("episode", "rotated the signing certificate")
+    assert reader.nearest("signing certificate", topk=1)[0][0] == row_id
+    assert len(reader.index) == 1
+
+def test_existing_rows_are_loaded_on_start(tmp_path, embedder):
+    path = str(tmp_path / "memory.db")
+    SkyMemory(path, embedder).store("episode", "rotated the signing certificate")
+    assert len(SkyMemory(path, embedder).index) == 1
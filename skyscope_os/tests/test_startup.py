@@ -0,0 +1,49 @@
+import threading
+from concurrent.futures import Future
+from core.startup import Deferred, StartupTracker
+
+def test_report_while_a_required_phase_is_running():
+    tracker = StartupTracker()
+    release = threading.Event()
+    with tracker.phase("import:x"):
+        pass
+    future = tracker.background("embedder", release.wait)
+    try:
+        report = tracker.report()
+        assert report["ready"] is False
+        assert report["ready_after_sec"] is None
+        assert report["pending"] == ["embedder"]
+    finally:
+        release.set()
+    future.result()
+    report = tracker.report()
+    assert report["ready"] is True
+    assert report["pending"] == []
+    assert report["ready_after_sec"] >= round(report["phases"]["embedder"]["start_sec"], 3)
+
+def test_failed_required_phase_is_not_ready():
+    tracker = StartupTracker()
+
+    def boom():
+        raise RuntimeError("no model")
+
+    tracker.background("agent", boom)
+    tracker.wait()
+    report = tracker.report()
+    assert report["ready"] is False
+    assert report["failed"] == {"agent": "no model"}
+
+def test_optional_phase_does_not_gate_readiness():
+    tracker = StartupTracker()
+    release = threading.Event()
+    tracker.background("swarm", release.wait, required=False)
+    try:
+        assert tracker.report()["ready"] is True
+    finally:
+        release.set()
+
+def test_deferred_waits_for_the_result():
+    future = Future()
+    deferred = Deferred(future, attr="real")
+    future.set_result(type("Loaded", (), {"real": "value"})())
+    assert deferred.get() == "value"
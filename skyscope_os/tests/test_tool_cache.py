@@ -0,0 +1,111 @@
+import os
+import time
+import pytest
+from core.tool_cache import TaskCache, ToolCache
+from memory.memory import SkyMemory
+
+class Counter:
+    """A tool body that counts its calls and echoes its arguments."""
+    def __init__(self, result: str = "ok"):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self, filepath: str = "", **kwargs) -> str:
+        self.calls += 1
+        return f"{self.result} {filepath} #{self.calls}"
+
+def test_repeated_calls_hit_the_cache():
+    cache, fn = ToolCache(ttls={}), Counter()
+    assert cache.call("search", fn, ("a",), {}) == cache.call("search", fn, ("a",), {})
+    cache.call("search", fn, ("b",), {})
+    assert fn.calls == 2
+    assert cache.stats()["per_tool"]["search"] == {"hits": 1, "misses": 2, "bypassed": 0}
+
+def test_errors_uncacheable_tools_and_expired_entries_run_again():
+    cache = ToolCache(ttls={"short": 0.05}, uncacheable={"write_file"})
+    failing, writer, short = Counter("Error: boom"), Counter(), Counter()
+    for _ in range(2):
+        cache.call("failing", failing, (), {})
+        cache.call("write_file", writer, (), {})
+    cache.call("short", short, (), {})
+    time.sleep(0.1)
+    cache.call("short", short, (), {})
+    assert (failing.calls, writer.calls, short.calls) == (2, 2, 2)
+
+def test_writes_invalidate_dependent_tools():
+    cache = ToolCache(ttls={}, uncacheable={"add"}, invalidates={"add": ("search",)})
+    search = Counter()
+    cache.call("search", search, ("q",), {})
+    cache.call("add", Counter(), (), {})
+    cache.call("search", search, ("q",), {})
+    assert search.calls == 2
+
+def test_lru_is_bounded():
+    cache, fn = ToolCache(max_entries=2, ttls={}), Counter()
+    for query in ("a", "b", "c", "a"):
+        cache.call("search", fn, (query,), {})
+    assert fn.calls == 4
+    assert cache.stats()["entries"] == 2
+
+def test_file_arguments_are_keyed_by_mtime_and_size(tmp_path):
+    binary = tmp_path / "app.bin"
+    binary.write_bytes(b"\x7fELF v1")
+    cache, fn = ToolCache(), Counter()
+    cache.call("analyze_binary", fn, (), {"filepath": str(binary)})
+    cache.call("analyze_binary", fn, (), {"filepath": str(binary)})
+    assert fn.calls == 1
+
+    # Rebuilt in place with the same size: only the modification time tells it apart.
+    binary.write_bytes(b"\x7fELF v2")
+    stat = binary.stat()
+    os.utime(binary, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    cache.call("analyze_binary", fn, (), {"filepath": str(binary)})
+    assert fn.calls == 2
+
+    binary.write_bytes(b"\x7fELF version 3")
+    os.utime(binary, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    cache.call("analyze_binary", fn, (), {"filepath": str(binary)})
+    assert fn.calls == 3
+
+def test_wrap_routes_forward_through_the_cache():
+    class Tool:
+        name = "search"
+        def __init__(self):
+            self.forward = Counter()
+    tool = Tool()
+    body = tool.forward
+    ToolCache(ttls={}).wrap(tool)
+    tool.forward(filepath="x")
+    tool.forward(filepath="x")
+    assert body.calls == 1
+
+@pytest.fixture
+def task_cache(tmp_path, embedder):
+    return TaskCache(SkyMemory(str(tmp_path / "memory.db"), embedder), threshold=0.95, ttl=60)
+
+def test_task_cache_reuses_near_duplicate_tasks(task_cache):
+    task_cache.store("summarise the latest arxiv papers on retrieval", "three papers")
+    result, score = task_cache.lookup("summarise the latest arxiv papers on retrieval")
+    assert result == "three papers" and score >= 0.95
+    assert task_cache.lookup("compile the macos sources") is None
+    assert task_cache.stats()["hits"] == 1
+
+def test_task_cache_ignores_stale_results(task_cache):
+    task_cache.ttl = 0
+    task_cache.store("list the drive files", "no files")
+    time.sleep(0.01)
+    assert task_cache.lookup("list the drive files") is None
+
+def test_task_cache_deletes_expired_results_and_their_memories(task_cache):
+    task_cache.store("list the drive files", "no files")
+    task_cache.store("compile the macos sources", "built")
+    task_cache.ttl = 0
+    time.sleep(0.01)
+    task_cache.store("summarise the latest arxiv papers on retrieval", "three papers")
+
+    memory = task_cache.memory
+    with memory.db.read() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM task_results").fetchone()[0] == 1
+        assert [row[0] for row in conn.execute("SELECT summary FROM memory")] == ["summarise the latest arxiv papers on retrieval"]
+    assert len(memory.index) == 1
+    assert memory.nearest("list the drive files", topk=5)[0][0] == memory.index.max_id
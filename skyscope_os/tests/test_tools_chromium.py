@@ -0,0 +1,281 @@
+import asyncio
+import datetime
+import threading
+import time
+import pytest
+
+pytest.importorskip("smolagents")
+from tooling import tools_chromium
+from tooling.tools_chromium import BrowserPool
+
+ARTICLE = "<html><body><nav>Home | About</nav><article>" + "<p>Readable paragraph, with commas, about testing.</p>" * 20 + "</article></body></html>"
+
+# --- Playwright test doubles ---
+class FakeResponse:
+    status = 200
+
+    def __init__(self, etag):
+        self.headers = {"etag": etag} if etag else {}
+
+class FakeRequest:
+    def __init__(self, body, headers):
+        self.body, self.headers = body, headers
+
+    async def sizes(self):
+        await asyncio.sleep(0.05)  # a round trip to the browser, still pending when goto() returns
+        return {"responseBodySize": self.body, "responseHeadersSize": self.headers}
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = "about:blank"
+        self.closed = False
+
+    def on(self, event, handler):
+        pass
+
+    def is_closed(self):
+        return self.closed
+
+    def _check(self):
+        if not self.context.browser.connected:
+            raise RuntimeError("Target closed")
+
+    async def goto(self, url, timeout=None, wait_until="load"):
+        self._check()
+        self.url = url
+        self.context.browser.visits.append((url, wait_until))
+        for body, headers in self.context.browser.resources:
+            for handler in self.context.handlers.get("requestfinished", []):
+                handler(FakeRequest(body, headers))
+        return FakeResponse(self.context.browser.etag)
+
+    async def evaluate(self, script):
+        return None
+
+    async def content(self):
+        self._check()
+        self.context.browser.content_calls += 1
+        return self.context.browser.html
+
+    async def click(self, selector, timeout=None):
+        self._check()
+
+    async def fill(self, selector, text, timeout=None):
+        self._check()
+
+    async def close(self):
+        self.closed = True
+
+class FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages = []
+        self.routes = []
+        self.handlers = {}
+
+    def on(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    async def route(self, pattern, handler):
+        self.routes.append(pattern)
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def close(self):
+        self.browser.contexts.remove(self)
+
+class FakeBrowser:
+    def __init__(self, playwright):
+        self.connected = True
+        self.contexts = []
+        self.visits = playwright.visits
+        self.resources = playwright.resources
+        self.html = playwright.html
+        self.etag = playwright.etag
+        self.content_calls = 0
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self):
+        context = FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.connected = False
+
+class FakePlaywright:
+    def __init__(self):
+        self.browsers = []
+        self.visits = []
+        self.resources = []
+        self.html = ARTICLE
+        self.etag = '"v1"'
+        self.chromium = self
+
+    async def launch(self, headless=True):
+        browser = FakeBrowser(self)
+        self.browsers.append(browser)
+        return browser
+
+    async def stop(self):
+        pass
+
+@pytest.fixture
+def pool():
+    pool = BrowserPool(max_contexts=2, idle_timeout_sec=0.2)
+    pool._playwright = FakePlaywright()
+    yield pool
+    pool.close()
+
+def test_sessions_get_isolated_contexts(pool):
+    with pool.session("a"):
+        pool.go_to("https://a.example/", "fast")
+        with pool.session("b"):
+            pool.go_to("https://b.example/", "full")
+            assert pool.stats()["contexts"] == 2
+    assert pool.stats()["contexts"] == 0
+    assert pool._playwright.visits == [("https://a.example/", "domcontentloaded"), ("https://b.example/", "load")]
+
+def test_idle_reaper_skips_running_tasks(pool):
+    with pool.session("task"):
+        pool.go_to("https://a.example/", "fast")
+        time.sleep(0.5)
+        assert pool.stats()["reaped"] == 0
+        assert "Readable paragraph" in pool.get_text_content()
+    assert pool.stats()["reaped"] == 0
+
+def test_reaped_lease_reopens_on_its_last_url(pool):
+    pool.go_to("https://a.example/page", "fast")
+    deadline = time.monotonic() + 3
+    while pool.stats()["reaped"] == 0 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.stats()["reaped"] == 1
+    pool.click("#next")
+    assert pool._playwright.visits[-1][0] == "https://a.example/page"
+    pool.release("default")
+
+def test_read_recovers_after_a_browser_crash(pool):
+    with pool.session("task"):
+        pool.go_to("https://a.example/page", "fast")
+        pool._playwright.browsers[-1].connected = False
+        assert "Readable paragraph" in pool.get_text_content()
+        assert len(pool._playwright.browsers) == 2
+        assert pool.stats()["crashes"] == 1
+        assert pool._playwright.visits[-1][0] == "https://a.example/page"
+
+def test_lease_fails_when_every_context_is_taken(pool):
+    pool.lease_timeout_sec = 0.2
+    results = {}
+
+    def visit(key):
+        with pool.session(key):
+            results[key] = pool.go_to(f"https://{key}.example/", "fast")
+            time.sleep(0.5)
+
+    threads = [threading.Thread(target=visit, args=(key,)) for key in ("a", "b")]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    visit("c")
+    for thread in threads:
+        thread.join()
+    assert "Successfully navigated" in results["a"] and "Successfully navigated" in results["b"]
+    assert "all 2 browser contexts are in use" in results["c"]
+
+def test_extractions_are_not_shared_across_profiles_or_sessions(pool):
+    pytest.importorskip("bs4")
+    with pool.session("a"):
+        pool.go_to("https://a.example/page", "commit")
+        pool.get_content()
+        pool.get_content()
+        browser = pool._playwright.browsers[-1]
+        assert browser.content_calls == 1
+        pool.go_to("https://a.example/page", "full")
+        pool.get_content()
+        assert browser.content_calls == 2
+        pool.go_to("https://a.example/page", "full")
+        pool.get_content()
+        assert browser.content_calls == 2
+    with pool.session("b"):
+        pool.go_to("https://a.example/page", "full")
+        pool.get_content()
+        assert browser.content_calls == 3
+
+# --- Navigation profiles ---
+class FakeRoute:
+    def __init__(self, url, resource_type):
+        self.request = type("Request", (), {"url": url, "resource_type": resource_type})()
+        self.outcome = None
+
+    async def abort(self):
+        self.outcome = "aborted"
+
+    async def continue_(self):
+        self.outcome = "continued"
+
+def test_only_blocking_profiles_install_the_route(pool):
+    with pool.session("a"):
+        assert "[full:" in pool.go_to("https://a.example/", "full")
+        context = pool._playwright.browsers[-1].contexts[0]
+        assert context.routes == []
+        assert "[fast:" in pool.go_to("https://a.example/", "fast")
+        pool.go_to("https://a.example/", "commit")
+        assert context.routes == ["**/*"]
+    assert [wait for _, wait in pool._playwright.visits] == ["load", "domcontentloaded", "commit"]
+    assert pool.go_to("https://a.example/", "turbo").startswith("Error: unknown navigation mode 'turbo'")
+    assert set(pool.stats()["navigations"]) == {"full", "fast", "commit"}
+
+def test_report_includes_sizes_still_pending_when_goto_returns(pool):
+    pool._playwright.resources.extend([(2048, 512), (1024, 0)])
+    with pool.session("a"):
+        assert "2 requests (0 blocked), 3.5 KB]" in pool.go_to("https://a.example/", "commit")
+        assert "2 requests (0 blocked), 3.5 KB]" in pool.go_to("https://a.example/", "fast")
+    assert pool.stats()["navigations"]["commit"]["avg_kb"] == 3.5
+
+@pytest.mark.parametrize("url, resource_type, outcome", [
+    ("https://a.example/logo.png", "image", "aborted"),
+    ("https://a.example/font.woff2", "font", "aborted"),
+    ("https://www.google-analytics.com/collect", "script", "aborted"),
+    ("https://stats.g.doubleclick.net:443/pixel", "xhr", "aborted"),
+    ("https://a.example/app.js", "script", "continued"),
+    ("https://notdoubleclick.net/app.js", "script", "continued"),
+])
+def test_blocking_route(url, resource_type, outcome):
+    pool = BrowserPool()
+    lease = tools_chromium._Lease(context=None, page=None)
+    lease.block = True
+    route = FakeRoute(url, resource_type)
+    asyncio.run(pool._route(lease, route))
+    assert route.outcome == outcome
+    assert lease.nav["blocked"] == (outcome == "aborted")
+
+def test_full_profile_lets_everything_through():
+    pool = BrowserPool()
+    lease = tools_chromium._Lease(context=None, page=None)
+    route = FakeRoute("https://a.example/logo.png", "image")
+    asyncio.run(pool._route(lease, route))
+    assert route.outcome == "continued"
+
+def test_http_mode_skips_the_browser(pool, monkeypatch):
+    requests = pytest.importorskip("requests")
+    pytest.importorskip("bs4")
+    class Response:
+        url, status_code, text, content = "https://a.example/doc", 200, ARTICLE, ARTICLE.encode()
+        headers = {"ETag": '"h1"'}
+        elapsed = datetime.timedelta(milliseconds=12)
+        def raise_for_status(self):
+            pass
+    calls = []
+    monkeypatch.setattr(requests, "get", lambda url, **kwargs: calls.append(url) or Response())
+    with pool.session("a"):
+        assert "[http:" in pool.go_to("https://a.example/doc", "http")
+        assert "Readable paragraph" in pool.get_text_content()
+        assert "without the browser" in pool.click("#next")
+    assert calls == ["https://a.example/doc"]
+    assert pool._playwright.browsers == []
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from memory.vector_index import INDEX_TYPES, FlatIndex, IVFIndex, VectorIndex, assign_clusters, normalize_rows
+
+def vectors(n, dim=16, seed=0):
+    return normalize_rows(np.random.default_rng(seed).standard_normal((n, dim)))
+
+@pytest.mark.parametrize("kind", sorted(INDEX_TYPES))
+def test_search_finds_the_query_vector(kind):
+    data = vectors(200)
+    index = INDEX_TYPES[kind]()
+    index.add(np.arange(1, 201), data)
+    assert len(index) == 200
+    best_id, _ = index.search(data[41], 5)[0]
+    assert best_id == 42
+
+@pytest.mark.parametrize("kind", sorted(INDEX_TYPES))
+def test_remove_ignores_ids_the_index_never_held(kind):
+    index = INDEX_TYPES[kind]()
+    index.add([1, 2, 3], vectors(3))
+    index.remove([2, 2, 99])
+    assert len(index) == 2
+    assert sorted(index.ids().tolist()) == [1, 3]
+    index.remove([2])
+    assert len(index) == 2
+
+@pytest.mark.parametrize("kind", sorted(INDEX_TYPES))
+def test_save_and_load_drops_tombstones(kind, tmp_path):
+    data = vectors(50)
+    index = INDEX_TYPES[kind]()
+    index.add(np.arange(1, 51), data)
+    index.remove([10, 20])
+    path = str(tmp_path / "index.npz")
+    index.save(path)
+    loaded = VectorIndex.load(path)
+    assert loaded.kind == kind
+    assert len(loaded) == 48
+    assert loaded.max_id == 50
+    assert 10 not in loaded.ids()
+
+def test_ivf_trains_and_keeps_recall():
+    data = vectors(600, dim=32)
+    index = IVFIndex(train_size=256, nprobe=4)
+    index.add(np.arange(1, 601), data)
+    assert index.centroids is not None
+    assert len(index) == 600
+    hits = sum(index.search(data[i], 1)[0][0] == i + 1 for i in range(0, 600, 20))
+    assert hits >= 27
+
+def test_ivf_retrain_keeps_live_count():
+    index = IVFIndex(train_size=8, retrain_factor=2)
+    index.add(np.arange(1, 9), vectors(8))
+    index.remove([1, 2])
+    index.add(np.arange(9, 20), vectors(11, seed=1))
+    assert len(index) == 17
+    assert len(index.ids()) == 17
+
+def test_flat_matches_exact_scores():
+    data = vectors(100)
+    index = FlatIndex()
+    index.add(np.arange(100), data)
+    ids, scores = zip(*index.search(data[0], 10))
+    expected = np.argsort(-(data @ data[0]))[:10]
+    assert list(ids) == expected.tolist()
+
+def test_assign_clusters_picks_the_most_similar_centroid():
+    centroids = vectors(4, seed=1)
+    data = normalize_rows(centroids[[2, 0, 3, 3, 1]] + 0.01 * vectors(5, seed=2))
+    assert assign_clusters(data, centroids, chunk_size=2).tolist() == [2, 0, 3, 3, 1]
@@ -0,0 +1,155 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any
+
+# Elements that never carry readable content.
+STRIP_TAGS = ["script", "style", "noscript", "template", "svg", "canvas", "iframe", "button", "input", "select"]
+# Page chrome that is dropped when extracting the main content.
+BOILERPLATE_TAGS = ["nav", "header", "footer", "aside"]
+BLOCK_TAGS = ["p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article",
+              "pre", "blockquote", "ul", "ol", "table", "dt", "dd", "figcaption"]
+KEEP_ATTRIBUTES = ("href", "src", "alt", "title")
+# class/id hints used by readability-style scoring, matched against whole class/id
+# tokens (split on "-", "_" and spaces) so "ad" does not match "head-" or "download-".
+NEGATIVE_HINTS = re.compile(
+    r"comment\w*|meta|footer|footnote\w*|nav|navbar|navigation|menu\w*|sidebar\w*|sponsor\w*|ads?|advert\w*|"
+    r"promo\w*|banner\w*|cookies?|consent|popup|modal|share|sharing|social|related|subscribe|newsletter|"
+    r"breadcrumbs?|skip|masthead|widgets?", re.I)
+POSITIVE_HINTS = re.compile(r"article|body|content|entry|main|page|post|text|blog|story", re.I)
+
+def estimate_tokens(text: str) -> int:
+    # Roughly four characters per token for English text.
+    return len(text) // 4 + 1
+
+def _hints(tag) -> list[str]:
+    words = " ".join(tag.get("class") or []) + " " + (tag.get("id") or "")
+    return [token for token in re.split(r"[\s_-]+", words) if token]
+
+def _strip(soup, boilerplate: bool):
+    for tag in soup(STRIP_TAGS):
+        tag.decompose()
+    if not boilerplate:
+        return
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in [t for t in soup.find_all(True) if t.name not in ("html", "body", "article", "main")]:
+        if tag.decomposed:
+            continue
+        hints = _hints(tag)
+        if (any(NEGATIVE_HINTS.fullmatch(hint) for hint in hints)
+                and not any(POSITIVE_HINTS.fullmatch(hint) for hint in hints)):
+            tag.decompose()
+
+def _link_density(tag) -> float:
+    text = len(tag.get_text(" ", strip=True))
+    links = sum(len(a.get_text(" ", strip=True)) for a in tag.find_all("a"))
+    return links / text if text else 1.0
+
+def _main_node(soup):
+    """
+    Picks the element holding the main content, readability style: explicit
+    <article>/<main> when it has real text, otherwise the container whose
+    paragraphs score highest (length, commas) after discounting link-heavy ones.
+    """
+    body = soup.body or soup
+    for selector in ("article", "main", "[role=main]"):
+        nodes = soup.select(selector)
+        if nodes:
+            best = max(nodes, key=lambda n: len(n.get_text(" ", strip=True)))
+            if len(best.get_text(" ", strip=True)) >= 250:
+                return best
+
+    scores: dict[int, list[Any]] = {}
+    for paragraph in soup.find_all(["p", "pre", "td", "blockquote"]):
+        text = paragraph.get_text(" ", strip=True)
+        if len(text) < 25:
+            continue
+        score = 1 + text.count(",") + min(len(text) // 100, 3)
+        for parent, weight in ((paragraph.parent, 1.0), (paragraph.parent.parent if paragraph.parent else None, 0.5)):
+            if parent is not None and parent.name not in (None, "[document]"):
+                entry = scores.setdefault(id(parent), [parent, 0.0])
+                entry[1] += score * weight
+    if not scores:
+        return body
+    best, _ = max(scores.values(), key=lambda entry: entry[1] * (1 - _link_density(entry[0])))
+    return best
+
+def _to_text(node) -> str:
+    for tag in node.find_all(BLOCK_TAGS):
+        tag.append("\n")
+    return "\n".join(" ".join(line.split()) for line in node.get_text().splitlines() if line.strip())
+
+def _to_html(node) -> str:
+    for tag in [node, *node.find_all(True)]:
+        tag.attrs = {key: value for key, value in tag.attrs.items() if key in KEEP_ATTRIBUTES}
+    html = re.sub(r"\s+", " ", node.decode())
+    # One block element per line, so chunks break between elements rather than inside them.
+    return re.sub(r"\s*(<(?:%s)\b)" % "|".join(BLOCK_TAGS), r"\n\1", html).strip()
+
+def extract(html: str, kind: str = "text", selector: str = "", full_page: bool = False) -> str:
+    """
+    Turns a page into compact text ("text") or attribute-stripped HTML ("html").
+    `selector` scopes extraction to the matching elements; otherwise the main
+    content is extracted, or the whole page minus scripts and styles when `full_page`.
+    """
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    _strip(soup, boilerplate=not full_page and not selector)
+    if selector:
+        nodes = soup.select(selector)
+        if not nodes:
+            raise ValueError(f"no element matches selector '{selector}'")
+    else:
+        nodes = [(soup.body or soup) if full_page else _main_node(soup)]
+    render = _to_text if kind == "text" else _to_html
+    return "\n".join(render(node) for node in nodes)
+
+def chunk(text: str, cursor: int = 0, max_tokens: int = 1500) -> str:
+    """
+    Returns the part of `text` starting at character `cursor` that fits `max_tokens`,
+    cut at a line (or word) boundary, followed by the cursor to continue from.
+    """
+    if cursor >= len(text):
+        return f"[End of content: {len(text)} characters total.]" if text else "[The page has no extractable content.]"
+    end = cursor + max_tokens * 4
+    if end >= len(text):
+        return text[cursor:]
+    # Prefer ending on a line break, then a space, as long as that keeps at least half the budget.
+    for separator in ("\n", " "):
+        boundary = text.rfind(separator, cursor + max_tokens * 2, end)
+        if boundary != -1:
+            end = boundary + 1
+            break
+    remaining = estimate_tokens(text[end:])
+    return f"{text[cursor:end].rstrip()}\n[... about {remaining} more tokens; call again with cursor={end} to continue.]"
+
+class ExtractionCache:
+    """Small LRU of extracted pages, keyed by URL and ETag (plus session and navigation profile) or by a page's session and version."""
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple) -> str | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: tuple, value: str):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
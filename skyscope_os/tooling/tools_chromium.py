@@ -1,92 +1,544 @@
 from smolagents import tool
-from playwright.sync_api import sync_playwright, Page, Browser
+from typing import TYPE_CHECKING, Any, Awaitable, Callable
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import functools
+import hashlib
+import logging
+import os
+import threading
 import time
+from tooling.page_extract import ExtractionCache, chunk, extract
 
-class ChromiumBrowser:
-    """A dedicated, agent-controlled Chromium browser instance."""
+if TYPE_CHECKING:
+    from playwright.async_api import Browser, BrowserContext, Page, Playwright
 
-    def __init__(self):
-        self.playwright = sync_playwright().start()
-        self.browser: Browser = self.playwright.chromium.launch(headless=True)
-        self.page: Page = self.browser.new_page()
+# How web_navigate loads a page. Blocking profiles abort the resource types and
+# ad/analytics hosts below; "http" skips the browser and fetches the raw HTML.
+NAVIGATION_PROFILES = {
+    "full": {"wait_until": "load", "block": False},
+    "fast": {"wait_until": "domcontentloaded", "block": True},
+    "commit": {"wait_until": "commit", "block": True},
+    "http": {},
+}
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "texttrack", "manifest"}
+BLOCKED_HOSTS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "adservice.google.com", "facebook.net", "hotjar.com", "segment.io", "scorecardresearch.com",
+    "criteo.com", "taboola.com", "outbrain.com",
+)
+# Upper bound on how long a navigation report waits for the byte counts of
+# responses that finished during the load; later ones are left out.
+BYTES_SETTLE_SEC = 0.5
+FETCH_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
 
-    def go_to(self, url: str) -> str:
-        """Navigates to a specific URL."""
+# Which lease the web_* tools use in the current task; set by browser_session().
+_session_key: contextvars.ContextVar[str] = contextvars.ContextVar("skyscope_browser_session", default="default")
+
+class _Lease:
+    """One task's isolated BrowserContext and the page the tools drive in it."""
+    def __init__(self, context: "BrowserContext", page: "Page"):
+        self.context = context
+        self.page = page
+        self.url: str | None = None
+        self.crashed = False
+        self.busy = 0
+        self.routed = False
+        self.block = False
+        self.nav = {"requests": 0, "blocked": 0, "bytes": 0}
+        # request.sizes() lookups still in flight; _navigate waits for them before reporting.
+        self.sizing: set[asyncio.Task] = set()
+        # Bumped by every navigation and interaction; an ETag only describes the DOM it was navigated to.
+        self.version = 0
+        self.nav_version = 0
+        self.etag: str | None = None
+        # Navigation profile the page was loaded with; a "commit" load may hold a partial DOM.
+        self.mode: str | None = None
+        self.last_used = time.monotonic()
+
+class BrowserPool:
+    """
+    One headless Chromium process shared by every task, driven through the async
+    Playwright API on its own event-loop thread. Each task leases an isolated
+    BrowserContext (cookies, storage and tabs), so parallel tasks browse
+    concurrently without clobbering each other's page.
+
+    At most `max_contexts` contexts are open at once; a further task waits up to
+    `lease_timeout_sec` for one to be released. Contexts idle for `idle_timeout_sec`
+    are closed unless their task is still running, and reopen on their last URL when
+    used again. Each keeps at most `max_pages` tabs, and when the browser or a page
+    crashes it is relaunched and the lease's last URL reloaded before retrying once.
+
+    Pages are read back as extracted main content (or a CSS selector's elements)
+    in chunks of at most `chunk_tokens`, with a cursor for the next chunk. Each
+    extraction is cached per session by URL, ETag and navigation profile (plain
+    HTTP fetches across sessions), and until the page changes, so continuing or
+    re-reading a page does not serialize and parse it again.
+    """
+    def __init__(self, max_contexts: int = 4, max_pages: int = 4, idle_timeout_sec: float = 300,
+                 lease_timeout_sec: float = 60, headless: bool = True, chunk_tokens: int = 1500):
+        self.max_contexts = max_contexts
+        self.max_pages = max_pages
+        self.idle_timeout_sec = idle_timeout_sec
+        self.lease_timeout_sec = lease_timeout_sec
+        self.headless = headless
+        self.chunk_tokens = chunk_tokens
+        self.extraction_cache = ExtractionCache()
+        self.launches = 0
+        self.crashes = 0
+        self.reaped = 0
+        self.navigations: dict[str, dict[str, float]] = {}
+        self._stats_lock = threading.Lock()
+        # Pages fetched over plain HTTP, per session: (final url, html, etag).
+        self._static: dict[str, tuple[str, str, str | None]] = {}
+        # Sessions inside a session() block; their tasks may be between tool calls, so they are never reaped.
+        self._active: set[str] = set()
+        self.logger = logging.getLogger('BrowserPool')
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._reaper = None
+        self._start_lock = threading.Lock()
+        # Everything below is only touched on the pool's loop.
+        self._playwright: "Playwright | None" = None
+        self._browser: "Browser | None" = None
+        self._launch_lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(max_contexts)
+        self._leases: dict[str, _Lease] = {}
+        self._lost_urls: dict[str, str] = {}
+
+    # --- Event loop thread ---
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="skyscope-browser", daemon=True)
+                self._thread.start()
+                self._loop = loop
+                self._reaper = asyncio.run_coroutine_threadsafe(self._start_reaper(), loop).result()
+            return self._loop
+
+    def _call(self, coro: Awaitable, timeout: float | None = None) -> Any:
+        """Runs a coroutine on the pool's loop and blocks the calling (tool) thread for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    # --- Browser and leases ---
+    async def _browser_ready(self) -> "Browser":
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            if self._browser is not None:
+                self.crashes += 1
+                self.logger.warning("Chromium disconnected; relaunching it.")
+                # Every context died with the browser; their pages are reloaded when next leased.
+                for key, lease in self._leases.items():
+                    if lease.url:
+                        self._lost_urls[key] = lease.url
+                    self._slots.release()
+                self._leases.clear()
+            if self._playwright is None:
+                # Imported here so playwright only loads when the agent first uses the browser.
+                from playwright.async_api import async_playwright
+                self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless)
+            self.launches += 1
+            return self._browser
+
+    async def _lease(self, key: str) -> _Lease:
+        # Also drops every lease if the browser died since the last call.
+        browser = await self._browser_ready()
+        lease = self._leases.get(key)
+        if lease is not None:
+            return lease
         try:
-            self.page.goto(url, timeout=60000)
-            return f"Successfully navigated to {url}."
+            await asyncio.wait_for(self._slots.acquire(), self.lease_timeout_sec)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"all {self.max_contexts} browser contexts are in use") from None
+        try:
+            context = await browser.new_context()
+            page = await context.new_page()
+        except BaseException:
+            self._slots.release()
+            raise
+        lease = self._leases[key] = _Lease(context, page)
+        page.on("crash", lambda _: setattr(lease, "crashed", True))
+        context.on("page", lambda _: self._limit_pages(lease))
+        context.on("requestfinished", functools.partial(self._on_request_finished, lease))
+        url = self._lost_urls.pop(key, None)
+        if url:
+            await page.goto(url, timeout=60000)
+            lease.url = url
+        return lease
+
+    def _limit_pages(self, lease: _Lease):
+        """Closes the oldest extra tabs (popups, target=_blank links) beyond `max_pages`."""
+        extra = [page for page in lease.context.pages if page is not lease.page]
+        for page in extra[:max(0, len(lease.context.pages) - self.max_pages)]:
+            asyncio.ensure_future(page.close())
+
+    async def _close_lease(self, key: str):
+        lease = self._leases.pop(key, None)
+        if lease is None:
+            return
+        self._slots.release()
+        try:
+            await lease.context.close()
+        except Exception:
+            pass  # Already gone with a crashed browser.
+
+    def _on_request_finished(self, lease: _Lease, request):
+        # Counted into the navigation that was current when the response finished.
+        task = asyncio.ensure_future(self._count_bytes(lease.nav, request))
+        lease.sizing.add(task)
+        task.add_done_callback(lease.sizing.discard)
+
+    @staticmethod
+    async def _count_bytes(nav: dict, request):
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        nav["requests"] += 1
+        nav["bytes"] += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+
+    async def _route(self, lease: _Lease, route):
+        request = route.request
+        host = request.url.split("/", 3)[2].split(":")[0] if "://" in request.url else ""
+        if lease.block and (request.resource_type in BLOCKED_RESOURCE_TYPES
+                            or any(host == h or host.endswith("." + h) for h in BLOCKED_HOSTS)):
+            lease.nav["blocked"] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _navigate(self, lease: _Lease, url: str, mode: str) -> dict:
+        profile = NAVIGATION_PROFILES[mode]
+        lease.block = profile["block"]
+        # Routing disables the HTTP cache, so it is only installed once a blocking profile is used.
+        if lease.block and not lease.routed:
+            await lease.context.route("**/*", functools.partial(self._route, lease))
+            lease.routed = True
+        lease.nav = {"requests": 0, "blocked": 0, "bytes": 0}
+        lease.version += 1
+        started = time.perf_counter()
+        response = await lease.page.goto(url, timeout=60000, wait_until=profile["wait_until"])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        lease.etag = response.headers.get("etag") if response else None
+        lease.mode = mode
+        lease.nav_version = lease.version
+        ttfb_ms = None
+        try:
+            ttfb_ms = await lease.page.evaluate(
+                "() => { const n = performance.getEntriesByType('navigation')[0]; return n ? n.responseStart : null; }")
+        except Exception:
+            pass  # With "commit" the new document may not be scriptable yet.
+        if lease.sizing:
+            # Each size is another round trip to the browser, still pending when goto() returns.
+            await asyncio.wait(set(lease.sizing), timeout=BYTES_SETTLE_SEC)
+        return dict(lease.nav, mode=mode, status=response.status if response else None, ms=elapsed_ms, ttfb_ms=ttfb_ms)
+
+    def _fetch_static(self, key: str, url: str) -> dict:
+        """Fetches a page without the browser; web_get_html/web_get_text then read the raw response."""
+        import requests
+        started = time.perf_counter()
+        response = requests.get(url, timeout=30, headers={"User-Agent": FETCH_USER_AGENT})
+        response.raise_for_status()
+        self._static[key] = (response.url, response.text, response.headers.get("ETag"))
+        return {
+            "mode": "http", "status": response.status_code, "ms": (time.perf_counter() - started) * 1000,
+            "ttfb_ms": response.elapsed.total_seconds() * 1000, "requests": 1, "blocked": 0, "bytes": len(response.content),
+        }
+
+    def _record(self, report: dict):
+        with self._stats_lock:
+            totals = self.navigations.setdefault(report["mode"], {"count": 0, "total_ms": 0.0, "bytes": 0})
+            totals["count"] += 1
+            totals["total_ms"] += report["ms"]
+            totals["bytes"] += report["bytes"]
+
+    @staticmethod
+    async def _touch(lease: _Lease, interaction: Awaitable[Any]) -> Any:
+        """Runs a page interaction, so content extracted from the previous DOM is no longer reused."""
+        lease.version += 1
+        return await interaction
+
+    def _healthy(self, lease: _Lease) -> bool:
+        return (self._browser is not None and self._browser.is_connected()
+                and not lease.crashed and not lease.page.is_closed())
+
+    async def _with_page(self, key: str, action: Callable[[_Lease], Awaitable[Any]]) -> Any:
+        """Runs `action` on the lease; after a browser or page crash, recovers and retries once."""
+        for attempt in (1, 2):
+            lease = await self._lease(key)
+            lease.busy += 1
+            try:
+                result = await action(lease)
+                if lease.page.url != "about:blank":
+                    lease.url = lease.page.url
+                return result
+            except Exception:
+                if attempt == 2 or self._healthy(lease):
+                    raise
+                self.logger.warning(f"Browser context for '{key}' crashed; recovering.")
+                if self._browser is not None and self._browser.is_connected():
+                    if lease.url:
+                        self._lost_urls[key] = lease.url
+                    await self._close_lease(key)
+            finally:
+                lease.busy -= 1
+                lease.last_used = time.monotonic()
+
+    async def _start_reaper(self) -> asyncio.Task:
+        return asyncio.create_task(self._reap_idle())
+
+    async def _reap_idle(self):
+        while True:
+            await asyncio.sleep(min(self.idle_timeout_sec / 4, 30))
+            now = time.monotonic()
+            for key, lease in list(self._leases.items()):
+                if key in self._active or lease.busy or now - lease.last_used <= self.idle_timeout_sec:
+                    continue
+                # The next call on this session starts where it left off.
+                if lease.url:
+                    self._lost_urls[key] = lease.url
+                await self._close_lease(key)
+                self.reaped += 1
+
+    # --- Tool-facing API (called from task threads) ---
+    def _run(self, action: Callable[[_Lease], Awaitable[Any]]) -> Any:
+        return self._call(self._with_page(_session_key.get(), action))
+
+    def go_to(self, url: str, mode: str = "fast") -> str:
+        """Navigates to a specific URL using one of NAVIGATION_PROFILES, and reports how long it took and what it cost."""
+        if mode not in NAVIGATION_PROFILES:
+            return f"Error: unknown navigation mode '{mode}'; use one of {', '.join(NAVIGATION_PROFILES)}."
+        key = _session_key.get()
+        try:
+            if mode == "http":
+                report = self._fetch_static(key, url)
+            else:
+                self._static.pop(key, None)
+                report = self._run(lambda lease: self._navigate(lease, url, mode))
         except Exception as e:
             return f"Error navigating to {url}: {str(e)}"
+        self._record(report)
+        ttfb = f", ttfb {report['ttfb_ms']:.0f} ms" if report["ttfb_ms"] is not None else ""
+        return (f"Successfully navigated to {url}. [{mode}: {report['ms']:.0f} ms{ttfb}, {report['requests']} requests "
+                f"({report['blocked']} blocked), {report['bytes'] / 1024:.1f} KB]")
+
+    @staticmethod
+    async def _page_state(lease: _Lease) -> tuple[str, str | None, str | None, int]:
+        """(url, ETag if the DOM is still the one it was navigated to, navigation mode, version) of the lease's page."""
+        untouched = lease.etag and lease.version == lease.nav_version
+        return lease.page.url, lease.etag if untouched else None, lease.mode, lease.version
+
+    def _static_page(self) -> tuple[str, str, str | None] | None:
+        return self._static.get(_session_key.get())
 
     def click(self, selector: str) -> str:
         """Clicks on an element matching the given selector."""
+        if self._static_page():
+            return f"Error clicking on '{selector}': the page was fetched without the browser; navigate with mode 'fast' to interact."
         try:
-            self.page.click(selector, timeout=10000)
+            self._run(lambda lease: self._touch(lease, lease.page.click(selector, timeout=10000)))
             return f"Successfully clicked on '{selector}'."
         except Exception as e:
             return f"Error clicking on '{selector}': {str(e)}"
 
     def fill(self, selector: str, text: str) -> str:
         """Fills an input field with the given text."""
+        if self._static_page():
+            return f"Error filling '{selector}': the page was fetched without the browser; navigate with mode 'fast' to interact."
         try:
-            self.page.fill(selector, text, timeout=10000)
+            self._run(lambda lease: self._touch(lease, lease.page.fill(selector, text, timeout=10000)))
             return f"Successfully filled '{selector}' with text."
         except Exception as e:
             return f"Error filling '{selector}': {str(e)}"
 
-    def get_content(self) -> str:
-        """Returns the full HTML content of the current page."""
+    def _read(self, kind: str, selector: str, cursor: int, full_page: bool) -> str:
+        """Extracts the current page (or fetches the extraction from the cache) and returns the chunk at `cursor`."""
+        session = _session_key.get()
+        variant = (kind, selector, full_page)
+        static = self._static.get(session)
+        if static:
+            url, html, etag = static
+            # Plain fetches carry no cookies, so every session gets the same response for an ETag.
+            shared_key = ("etag", "http", url, etag or hashlib.sha1(html.encode()).hexdigest(), *variant)
+            session_key = None
+        else:
+            url, etag, mode, version = self._run(self._page_state)
+            # Browser pages depend on the context's cookies and on how much the profile loaded.
+            shared_key = ("etag", session, mode, url, etag, *variant) if etag else None
+            session_key = ("session", session, url, version, *variant)
+
+        # Continuations read the extraction the first chunk came from, even if the page has changed since.
+        text = self.extraction_cache.get(session_key) if cursor and session_key else None
+        if text is None and shared_key:
+            text = self.extraction_cache.get(shared_key)
+        if text is None:
+            if static:
+                text = extract(static[1], kind, selector, full_page)
+            elif kind == "text" and full_page and not selector:
+                # Rendered text honours CSS visibility, which parsing the HTML cannot.
+                text = self._run(lambda lease: lease.page.evaluate("() => document.body.innerText"))
+            else:
+                text = extract(self._run(lambda lease: lease.page.content()), kind, selector, full_page)
+            for key in (shared_key, session_key):
+                if key:
+                    self.extraction_cache.put(key, text)
+        return chunk(text, cursor, self.chunk_tokens)
+
+    def get_content(self, selector: str = "", cursor: int = 0, full_page: bool = False) -> str:
+        """Returns the current page's main content (or `selector`'s elements) as compact HTML, one chunk at a time."""
         try:
-            return self.page.content()
+            return self._read("html", selector, cursor, full_page)
         except Exception as e:
             return f"Error getting page content: {str(e)}"
 
-    def get_text_content(self) -> str:
-        """Returns the user-visible text content of the current page."""
+    def get_text_content(self, selector: str = "", cursor: int = 0, full_page: bool = False) -> str:
+        """Returns the current page's main content (or `selector`'s elements) as text, one chunk at a time."""
         try:
-            return self.page.evaluate("() => document.body.innerText")
+            return self._read("text", selector, cursor, full_page)
         except Exception as e:
             return f"Error getting text content: {str(e)}"
 
+    @contextmanager
+    def session(self, key: str):
+        """Routes the web_* tools called in this block to `key`'s context, which is closed on exit."""
+        token = _session_key.set(key)
+        self._active.add(key)
+        try:
+            yield
+        finally:
+            _session_key.reset(token)
+            self._active.discard(key)
+            self.release(key)
+
+    def release(self, key: str):
+        self._static.pop(key, None)
+        self._lost_urls.pop(key, None)
+        if self._loop is not None:
+            self._call(self._close_lease(key))
+
+    def stats(self) -> dict:
+        return {
+            "started": self._loop is not None,
+            "contexts": len(self._leases),
+            "max_contexts": self.max_contexts,
+            "launches": self.launches,
+            "crashes": self.crashes,
+            "reaped": self.reaped,
+            "extraction_cache": self.extraction_cache.stats(),
+            "navigations": {
+                mode: {"count": t["count"], "avg_ms": round(t["total_ms"] / t["count"], 1), "avg_kb": round(t["bytes"] / t["count"] / 1024, 1)}
+                for mode, t in self.navigations.items()
+            },
+        }
+
     def close(self):
-        """Closes the browser instance."""
-        self.browser.close()
-        self.playwright.stop()
+        """Closes every context, the browser and Playwright, then stops the loop thread."""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._reaper.cancel()
+            await asyncio.gather(self._reaper, return_exceptions=True)
+            for key in list(self._leases):
+                await self._close_lease(key)
+            if self._browser is not None:
+                await self._browser.close()
+            if self._playwright is not None:
+                await self._playwright.stop()
+        try:
+            self._call(shutdown(), timeout=30)
+        finally:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+            self._loop = None
 
 # --- Tool Interface ---
-# We'll manage a single browser instance for the agent's lifecycle.
+# One pool for the agent's lifecycle; Chromium starts on the first web_* call.
 _browser_instance = None
+_browser_lock = threading.Lock()
 
-def get_browser():
+def get_browser() -> BrowserPool:
     global _browser_instance
-    if _browser_instance is None:
-        _browser_instance = ChromiumBrowser()
-    return _browser_instance
+    with _browser_lock:
+        if _browser_instance is None:
+            _browser_instance = BrowserPool(
+                max_contexts=int(os.getenv("SKYSCOPE_BROWSER_CONTEXTS", "4")),
+                max_pages=int(os.getenv("SKYSCOPE_BROWSER_MAX_PAGES", "4")),
+                idle_timeout_sec=float(os.getenv("SKYSCOPE_BROWSER_IDLE_SEC", "300")),
+                chunk_tokens=int(os.getenv("SKYSCOPE_WEB_CHUNK_TOKENS", "1500"))
+            )
+        return _browser_instance
+
+def browser_session(key: str):
+    """Gives the web_* tools called inside the block their own browser context (one per task)."""
+    return get_browser().session(key)
 
 @tool
-def web_navigate(url: str) -> str:
-    """Navigates the integrated browser to a specific URL."""
-    return get_browser().go_to(url)
+def web_navigate(url: str, mode: str = "") -> str:
+    """
+    Navigates the integrated browser to a specific URL.
+
+    Args:
+        url: The URL to open.
+        mode: How to load it: "fast" (skips images, fonts, media and trackers; returns
+            once the DOM is parsed), "commit" (returns as soon as the response starts),
+            "full" (loads everything) or "http" (plain HTTP fetch without the browser,
+            for static pages you only read).
+    """
+    return get_browser().go_to(url, mode or os.getenv("SKYSCOPE_BROWSER_PROFILE", "fast"))
 
 @tool
 def web_click(selector: str) -> str:
-    """Clicks on an element in the browser."""
+    """
+    Clicks on an element in the browser.
+
+    Args:
+        selector: CSS selector of the element.
+    """
     return get_browser().click(selector)
 
 @tool
 def web_fill(selector: str, text: str) -> str:
-    """Fills an input field in the browser."""
+    """
+    Fills an input field in the browser.
+
+    Args:
+        selector: CSS selector of the input field.
+        text: The text to type.
+    """
     return get_browser().fill(selector, text)
 
 @tool
-def web_get_text() -> str:
-    """Returns the user-visible text of the current page."""
-    return get_browser().get_text_content()
+def web_get_text(selector: str = "", cursor: int = 0, full_page: bool = False) -> str:
+    """
+    Returns the readable main content of the current page as text, without menus,
+    ads and other boilerplate. Long pages come in chunks: when the output ends with
+    a cursor, call again with that `cursor` for the next one.
+
+    Args:
+        selector: CSS selector limiting the text to the matching elements.
+        cursor: Where to continue a long page, as given at the end of the previous chunk.
+        full_page: Return all visible text instead of the main content.
+    """
+    return get_browser().get_text_content(selector, cursor, full_page)
 
 @tool
-def web_get_html() -> str:
-    """Returns the full HTML of the current page."""
-    return get_browser().get_content()
+def web_get_html(selector: str = "", cursor: int = 0, full_page: bool = False) -> str:
+    """
+    Returns the HTML of the current page's main content, with scripts, styles and
+    most attributes removed. Long pages come in chunks, continued with `cursor`.
+
+    Args:
+        selector: CSS selector limiting the HTML to the matching elements.
+        cursor: Where to continue a long page, as given at the end of the previous chunk.
+        full_page: Return the whole page instead of the main content.
+    """
+    return get_browser().get_content(selector, cursor, full_page)
 
 # A function to be called at the end of the agent's lifecycle
 def shutdown_browser():
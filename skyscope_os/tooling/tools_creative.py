@@ -1,18 +1,16 @@
 from smolagents import tool
 import os
 import json
-import lief
-from capstone import Cs, CS_ARCH_X86, CS_MODE_64
-from uncompyle6.main import decompile
-from io import StringIO
-from jinja2 import Environment, FileSystemLoader
-import moviepy.editor as mpe
-from gtts import gTTS
+
+# lief, capstone, jinja2, moviepy and gTTS are imported inside the tools that use them,
+# so loading this module at orchestrator startup stays cheap.
 
 @tool
 def analyze_binary(filepath: str) -> str:
     """Analyzes a binary file using lief and capstone."""
     try:
+        import lief
+        from capstone import Cs, CS_ARCH_X86, CS_MODE_64
         binary = lief.parse(filepath)
         if not binary:
             return f"Error: Could not parse binary file at {filepath}"
@@ -40,6 +38,7 @@ def analyze_binary(filepath: str) -> str:
 def generate_website(template_dir: str, output_dir: str, context_json: str) -> str:
     """Generates a responsive website from a Jinja2 template and a JSON context."""
     try:
+        from jinja2 import Environment, FileSystemLoader
         context = json.loads(context_json)
         env = Environment(loader=FileSystemLoader(template_dir))
         template = env.get_template('index.html')
@@ -59,6 +58,8 @@ def generate_website(template_dir: str, output_dir: str, context_json: str) -> s
 def create_documentary_video(image_files_str: str, narration_text: str, output_file: str) -> str:
     """Creates a narrated documentary video from a list of images and a narration script."""
     try:
+        import moviepy.editor as mpe
+        from gtts import gTTS
         image_files = image_files_str.split(',')
         clips = []
         for img_path in image_files:
@@ -1,7 +1,7 @@
 from smolagents import tool
 import os
+import sys
 import subprocess
-import git
 
 class MacOSPorter:
     def __init__(self, work_dir=os.path.expanduser('~/.skyscope_os/macos_porting')):
@@ -15,6 +15,7 @@ class MacOSPorter:
 
     def clone_sources(self):
         """Clones the necessary open-source repositories for macOS porting."""
+        import git
         for name, url in self.opensource_repos.items():
             repo_path = os.path.join(self.work_dir, name)
             if not os.path.exists(repo_path):
@@ -56,23 +57,30 @@ class MacOSPorter:
             return (False, f"Codesign failed: {e.stderr}")
 
 
-porter = MacOSPorter()
+# Created on first use, like the browser, so importing the tools does no filesystem work.
+_porter_instance = None
+
+def get_porter():
+    global _porter_instance
+    if _porter_instance is None:
+        _porter_instance = MacOSPorter()
+    return _porter_instance
 
 @tool
 def macos_clone_sources() -> str:
     """Clones the necessary open-source repositories for macOS porting."""
-    return porter.clone_sources()
+    return get_porter().clone_sources()
 
 @tool
 def macos_cross_compile(source_path: str, output_path: str) -> str:
     """Cross-compiles a C/C++ source file for macOS."""
-    success, message = porter.cross_compile(source_path, output_path)
+    success, message = get_porter().cross_compile(source_path, output_path)
     return message
 
 @tool
 def macos_sign_binary(binary_path: str, identity: str) -> str:
     """Signs a macOS binary. Requires being run on a macOS host."""
-    success, message = porter.sign_binary(binary_path, identity)
+    success, message = get_porter().sign_binary(binary_path, identity)
     return message
 
 @tool
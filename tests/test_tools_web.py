@@ -0,0 +1,230 @@
+import datetime
+import json
+import threading
+import time
+import pytest
+
+for module in ("smolagents", "helium", "selenium", "arxiv"):
+    pytest.importorskip(module)
+import tools_web
+from tools_web import ArxivCache
+
+# Trimmed arXiv API responses (export.arxiv.org/api/query), replayed by RecordedClient.
+RECORDED = {
+    "attention is all you need": [
+        {"entry_id": "http://arxiv.org/abs/1706.03762v7", "title": "Attention Is All You Need",
+         "authors": ["Ashish Vaswani", "Noam Shazeer", "Niki Parmar"], "published": "2017-06-12", "updated": "2023-08-02",
+         "categories": ["cs.CL", "cs.LG"], "summary": "The dominant sequence transduction models are based on complex "
+         "recurrent or convolutional neural networks in an encoder-decoder configuration. " * 8},
+    ],
+    "ti:transformer": [
+        {"entry_id": f"http://arxiv.org/abs/2101.0000{i}v1", "title": f"Transformer variant {i}",
+         "authors": ["A. Author"], "published": f"2021-01-0{i + 1}", "updated": None, "categories": ["cs.LG"],
+         "summary": f"We study transformer model number {i} on sequence tasks."}
+        for i in range(3)
+    ],
+    "protein folding": [
+        {"entry_id": "http://arxiv.org/abs/2108.00001v2", "title": "Protein folding with deep learning",
+         "authors": ["B. Author"], "published": "2021-08-01", "updated": None, "categories": ["q-bio.BM"],
+         "summary": "Predicting protein structure from sequence."},
+    ],
+}
+
+class RecordedResult:
+    class Author:
+        def __init__(self, name):
+            self.name = name
+
+    def __init__(self, entry):
+        self.entry_id = entry["entry_id"]
+        self.title = entry["title"]
+        self.authors = [self.Author(name) for name in entry["authors"]]
+        self.summary = entry["summary"]
+        self.categories = entry["categories"]
+        self.published = datetime.datetime.fromisoformat(entry["published"])
+        self.updated = datetime.datetime.fromisoformat(entry["updated"]) if entry["updated"] else None
+        self.pdf_url = self.entry_id.replace("/abs/", "/pdf/")
+
+class RecordedClient:
+    """Stands in for arxiv.Client, replaying RECORDED with a fixed per-request latency."""
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def results(self, search):
+        with self._lock:
+            self.requests.append((search.query, time.monotonic()))
+        time.sleep(self.latency)
+        if search.query == "unavailable":
+            raise ConnectionError("HTTP 503")
+        return iter([RecordedResult(e) for e in RECORDED.get(search.query.lower(), [])[:search.max_results]])
+
+class RecordedStack:
+    def __init__(self):
+        self.batches = []
+
+    def add_many(self, documents):
+        self.batches.append(list(documents))
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ArxivCache(str(tmp_path / "arxiv" / "arxiv.db"), client=RecordedClient(), delay_sec=0)
+    yield cache
+    cache.close()
+
+def test_repeated_query_is_served_from_the_cache(cache):
+    first = cache.search_many(["Attention is all you need"])["Attention is all you need"]
+    again = cache.search_many(["attention  is ALL you need"], max_results=1)["attention  is ALL you need"]
+    assert again == first
+    assert first[0]["title"] == "Attention Is All You Need"
+    assert first[0]["summary"] == RECORDED["attention is all you need"][0]["summary"]
+    assert len(cache.client.requests) == 1
+    assert cache.stats()["hits"] == 1
+
+def test_overlapping_query_is_answered_by_full_text_search(cache):
+    cache.search_many(["ti:transformer"], max_results=3)
+    papers = cache.lookup("transformer sequence", max_results=2)
+    assert len(papers) == 2 and all(p["title"].startswith("Transformer variant") for p in papers)
+    assert cache.stats()["fts_hits"] == 1
+    assert cache.lookup("transformer sequence", max_results=5) is None
+
+def test_entries_expire_after_the_ttl(cache, monkeypatch):
+    cache.ttl_sec = 60
+    cache.search_many(["protein folding"], max_results=1)
+    now = time.time()
+    monkeypatch.setattr(tools_web.time, "time", lambda: now + 61)
+    assert cache.lookup("protein folding", max_results=1) is None
+    cache.search_many(["protein folding"], max_results=1)
+    assert len(cache.client.requests) == 2
+
+def test_queries_are_fetched_concurrently_with_spaced_requests(tmp_path):
+    cache = ArxivCache(str(tmp_path / "arxiv.db"), client=RecordedClient(latency=0.3), delay_sec=0.1, max_workers=4)
+    try:
+        queries = ["attention is all you need", "ti:transformer", "protein folding", "Protein Folding", "unavailable"]
+        started = time.monotonic()
+        results = cache.search_many(queries, max_results=3)
+        elapsed = time.monotonic() - started
+    finally:
+        cache.close()
+    assert list(results) == queries
+    assert results["Protein Folding"] == results["protein folding"]
+    assert isinstance(results["unavailable"], ConnectionError)
+    starts = sorted(at for _, at in cache.client.requests)
+    assert len(starts) == 4
+    assert all(b - a >= 0.09 for a, b in zip(starts, starts[1:]))
+    # Four sequential requests would take at least 4 * 0.3 s.
+    assert elapsed < 1.0
+
+def test_new_papers_are_pushed_to_the_knowledge_stack_in_one_batch(cache):
+    cache.knowledge_stack = RecordedStack()
+    cache.search_many(["ti:transformer", "protein folding"], max_results=3)
+    cache.search_many(["protein folding"], max_results=1)
+    assert len(cache.knowledge_stack.batches) == 1
+    uris = sorted(uri for uri, _, _ in cache.knowledge_stack.batches[0])
+    assert uris[-1] == "http://arxiv.org/abs/2108.00001v2" and len(uris) == 4
+
+def test_tools_return_truncated_json(cache, monkeypatch):
+    monkeypatch.setattr(tools_web, "_arxiv_cache", cache)
+    papers = json.loads(tools_web.arxiv_search("attention is all you need", 1))
+    assert papers[0]["summary"].endswith("...") and len(papers[0]["summary"]) == 503
+    assert tools_web.arxiv_search("no such topic") == "No papers found for the given query."
+    assert tools_web.arxiv_search("unavailable") == "Error searching Arxiv: HTTP 503"
+    many = json.loads(tools_web.arxiv_search_many(["protein folding", "unavailable"]))
+    assert many["protein folding"][0]["pdf_url"] == "http://arxiv.org/pdf/2108.00001v2"
+    assert many["unavailable"] == "Error searching Arxiv: HTTP 503"
+
+# --- WebDriverPool ---
+class FakeDriver:
+    """Selenium Chrome driver double tracking tabs, per-tab history and the CDP commands sent."""
+    def __init__(self):
+        self.tabs = {"t0": {"history": ["about:blank"], "resources": []}}
+        self.current = "t0"
+        self.cdp = []
+        self.quit_called = False
+        self.crashed = False
+        self._next = 1
+        self.switch_to = self
+
+    @property
+    def window_handles(self):
+        return list(self.tabs)
+
+    @property
+    def current_window_handle(self):
+        return self.current
+
+    def window(self, handle):
+        self.current = handle
+
+    def new_window(self, kind):
+        handle = f"t{self._next}"
+        self._next += 1
+        self.tabs[handle] = {"history": ["about:blank"], "resources": []}
+        self.current = handle
+
+    def close(self):
+        del self.tabs[self.current]
+
+    def visit(self, url, resources=()):
+        self.tabs[self.current]["history"].append(url)
+        self.tabs[self.current]["resources"] = list(resources)
+
+    def execute_script(self, script):
+        return self.tabs[self.current]["resources"]
+
+    def execute_cdp_cmd(self, command, params):
+        if self.crashed:
+            raise ConnectionError("chrome not reachable")
+        if command == "Page.getNavigationHistory":
+            return {"currentIndex": 0, "entries": [{"url": url} for url in self.tabs[self.current]["history"]]}
+        if command == "Storage.clearDataForOrigin" and not params["origin"].startswith(("http://", "https://")):
+            raise ValueError(f"Invalid origin: {params['origin']}")  # What Chrome answers for "*".
+        self.cdp.append((command, params.get("origin")))
+        return {}
+
+    def quit(self):
+        self.quit_called = True
+
+@pytest.fixture
+def driver_pool(monkeypatch):
+    pool = tools_web.WebDriverPool(size=1, idle_timeout_sec=300)
+    drivers = []
+    monkeypatch.setattr(pool, "_start", lambda: drivers.append(FakeDriver()) or drivers[-1])
+    pool.drivers = drivers
+    return pool
+
+def test_lease_reuses_a_reset_session(driver_pool):
+    with driver_pool.lease() as driver:
+        driver.visit("https://login.example.com/form", ["https://cdn.example.net/app.js", "data:image/png;base64,x"])
+        driver.new_window("tab")
+        driver.visit("http://localhost:8000/page")
+    assert driver.cdp == [
+        ("Network.clearBrowserCookies", None),
+        ("Storage.clearDataForOrigin", "http://localhost:8000"),
+        ("Storage.clearDataForOrigin", "https://cdn.example.net"),
+        ("Storage.clearDataForOrigin", "https://login.example.com"),
+    ]
+    assert len(driver.tabs) == 1 and driver.tabs[driver.current]["history"] == ["about:blank"]
+
+    with driver_pool.lease() as again:
+        assert again is driver
+    assert driver_pool.stats() == {"open": 1, "idle": 1, "started": 1, "reused": 1, "discarded": 0}
+
+def test_session_that_fails_to_reset_is_replaced(driver_pool):
+    with driver_pool.lease() as driver:
+        driver.crashed = True
+    assert driver.quit_called
+    with driver_pool.lease() as replacement:
+        assert replacement is not driver
+    assert driver_pool.stats()["discarded"] == 1
+    assert driver_pool.stats()["started"] == 2
+
+def test_idle_sessions_are_quit(driver_pool):
+    with driver_pool.lease() as driver:
+        pass
+    driver_pool.idle_timeout_sec = 0
+    time.sleep(0.01)
+    with driver_pool.lease() as fresh:
+        assert fresh is not driver
+    assert driver.quit_called
@@ -1,65 +1,515 @@
 from smolagents import tool
-from helium import start_chrome, go_to, click, write, get_driver
+from helium import start_chrome, go_to, click, write, set_driver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver import ChromeOptions
+from selenium.webdriver.support.ui import WebDriverWait
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from urllib.parse import urlsplit
 import arxiv
 import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+class WebDriverPool:
+    """
+    Keeps up to `size` headless Chrome sessions warm across browser_automate calls,
+    so a call pays a reset instead of a cold start. Between leases each session is
+    left with a single fresh about:blank tab and no cookies or site storage (the
+    HTTP cache is kept). Sessions that fail to reset are quit and replaced, and
+    sessions unused for `idle_timeout_sec` are quit.
+    """
+    def __init__(self, size: int = 1, idle_timeout_sec: float = 300):
+        self.size = size
+        self.idle_timeout_sec = idle_timeout_sec
+        self._idle = []  # (driver, last used), most recently used last
+        self._open = 0
+        self._cond = threading.Condition()
+        self.started = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _start(self):
+        opts = ChromeOptions()
+        opts.add_argument("--headless=new")
+        return start_chrome(headless=True, options=opts)
+
+    def _reap(self):
+        now = time.monotonic()
+        with self._cond:
+            expired = [driver for driver, last_used in self._idle if now - last_used > self.idle_timeout_sec]
+            self._idle = [(driver, last_used) for driver, last_used in self._idle if driver not in expired]
+        for driver in expired:
+            self._discard(driver)
+
+    def _acquire(self):
+        self._reap()
+        with self._cond:
+            while True:
+                if self._idle:
+                    self.reused += 1
+                    return self._idle.pop()[0]
+                if self._open < self.size:
+                    self._open += 1
+                    break
+                self._cond.wait()
+        try:
+            driver = self._start()
+        except BaseException:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        self.started += 1
+        return driver
+
+    def _discard(self, driver):
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        with self._cond:
+            self._open -= 1
+            self.discarded += 1
+            self._cond.notify()
+
+    @staticmethod
+    def _origins(driver) -> set[str]:
+        """HTTP(S) origins the current tab navigated to or loaded resources from."""
+        history = driver.execute_cdp_cmd("Page.getNavigationHistory", {})["entries"]
+        urls = [entry["url"] for entry in history]
+        urls += driver.execute_script("return performance.getEntriesByType('resource').map(e => e.name)") or []
+        origins = set()
+        for url in urls:
+            parts = urlsplit(url)
+            if parts.scheme in ("http", "https") and parts.netloc:
+                origins.add(f"{parts.scheme}://{parts.netloc.rsplit('@', 1)[-1]}")
+        return origins
+
+    def _reset(self, driver):
+        """
+        Leaves one fresh about:blank tab (new sessionStorage), clears every cookie and
+        clears site storage for each origin the closed tabs visited. CDP's
+        clearDataForOrigin only takes a concrete origin, so they are collected first.
+        """
+        old_handles = driver.window_handles
+        origins = set()
+        for handle in old_handles:
+            driver.switch_to.window(handle)
+            origins |= self._origins(driver)
+        driver.switch_to.new_window("tab")
+        fresh = driver.current_window_handle
+        for handle in old_handles:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(fresh)
+        driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        for origin in sorted(origins):
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+
+    @contextmanager
+    def lease(self):
+        driver = self._acquire()
+        try:
+            yield driver
+        finally:
+            try:
+                self._reset(driver)
+            except Exception:
+                self._discard(driver)  # Crashed or wedged; the next lease starts a new one.
+            else:
+                with self._cond:
+                    self._idle.append((driver, time.monotonic()))
+                    self._cond.notify()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"open": self._open, "idle": len(self._idle), "started": self.started,
+                    "reused": self.reused, "discarded": self.discarded}
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for driver, _ in idle:
+            self._discard(driver)
+
+_webdriver_pool = None
+_webdriver_pool_lock = threading.Lock()
+# Helium drives one process-wide driver, so its commands run one lease at a time.
+_helium_lock = threading.Lock()
+
+def get_webdriver_pool() -> WebDriverPool:
+    global _webdriver_pool
+    with _webdriver_pool_lock:
+        if _webdriver_pool is None:
+            _webdriver_pool = WebDriverPool(
+                size=int(os.getenv("SKYSCOPE_WEBDRIVER_POOL_SIZE", "1")),
+                idle_timeout_sec=float(os.getenv("SKYSCOPE_WEBDRIVER_IDLE_SEC", "300"))
+            )
+        return _webdriver_pool
+
+def shutdown_webdriver_pool():
+    global _webdriver_pool
+    if _webdriver_pool:
+        _webdriver_pool.close()
+        _webdriver_pool = None
+
+def _wait_for_settled(driver, timeout: float = 10, quiet_sec: float = 0.5):
+    """
+    Waits until the document has loaded and no new resource has finished for
+    `quiet_sec` (network idle), or `timeout` passes. Pages that poll forever
+    simply run into the timeout.
+    """
+    state = {"count": -1, "since": time.monotonic()}
+
+    def settled(d):
+        if d.execute_script("return document.readyState") != "complete":
+            return False
+        count = d.execute_script("return performance.getEntriesByType('resource').length")
+        now = time.monotonic()
+        if count != state["count"]:
+            state["count"], state["since"] = count, now
+            return False
+        return now - state["since"] >= quiet_sec
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(settled)
+    except TimeoutException:
+        pass
 
 @tool
 def browser_automate(url: str, actions: str = "") -> str:
     """
     Perform headless browser tasks. Actions are semi-colon separated.
     Example: 'write username to #user; write password to #pass; click Login Button'
+
+    Args:
+        url: The page to open.
+        actions: Semi-colon separated 'click <target>' and 'write <text> to <target>' steps.
     """
-    driver = None
     try:
-        opts = ChromeOptions()
-        opts.add_argument("--headless=new")
-        driver = start_chrome(headless=True, options=opts)
-        go_to(url)
-
-        if actions:
-            for act in actions.split(";"):
-                act = act.strip()
-                if not act:
-                    continue
-                if "click" in act:
-                    target = act.replace("click", "").strip()
-                    click(target)
-                elif "write" in act:
-                    parts = act.replace("write", "").split(" to ", 1)
-                    if len(parts) == 2:
-                        text, target = parts
-                        write(text.strip(), to=target.strip())
-
-        # Give a moment for any async actions to complete
-        import time
-        time.sleep(2)
-
-        page_title = get_driver().title
+        with get_webdriver_pool().lease() as driver, _helium_lock:
+            set_driver(driver)
+            go_to(url)
+
+            if actions:
+                for act in actions.split(";"):
+                    act = act.strip()
+                    if not act:
+                        continue
+                    if "click" in act:
+                        target = act.replace("click", "").strip()
+                        click(target)
+                    elif "write" in act:
+                        parts = act.replace("write", "").split(" to ", 1)
+                        if len(parts) == 2:
+                            text, target = parts
+                            write(text.strip(), into=target.strip())
+
+            # Wait for navigations and requests started by the actions to finish.
+            _wait_for_settled(driver)
+
+            page_title = driver.title
         return f"Browser automation complete. Final page title: '{page_title}'"
 
     except Exception as e:
         return f"Browser automation failed: {str(e)}"
-    finally:
-        if driver:
-            driver.quit()
+
+class ArxivCache:
+    """
+    Local SQLite copy of arXiv search results. Papers are stored in full (the
+    tools only return a truncated summary) with an FTS5 index over title, summary
+    and authors. A query is answered locally when the same query was fetched within
+    `ttl_sec` with at least as many results, or when the fresh papers already hold
+    `max_results` full-text matches for it; otherwise it goes to the API.
+
+    `client` is anything with arxiv.Client's `results(search)` method, so a
+    recorded-response stand-in can replace the live API. Fetches of several
+    queries run on `max_workers` threads, but request starts are spaced
+    `delay_sec` apart as the arXiv API terms ask. When `knowledge_stack` (any
+    object with KnowledgeStack's `add_many`) is set, each batch of newly fetched
+    papers is added to it in one call.
+    """
+    def __init__(self, db_path: str, ttl_sec: float = 86400, client=None, max_workers: int = 4,
+                 delay_sec: float = 3.0, knowledge_stack=None):
+        self.db_path = db_path
+        self.ttl_sec = ttl_sec
+        self.max_workers = max_workers
+        self.delay_sec = delay_sec
+        self.client = client or arxiv.Client(page_size=100, delay_seconds=delay_sec, num_retries=3)
+        self.knowledge_stack = knowledge_stack
+        self.logger = logging.getLogger('ArxivCache')
+        self._rate_lock = threading.Lock()
+        self._next_request = 0.0
+        self.hits = 0
+        self.fts_hits = 0
+        self.fetches = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # One connection for the cache's lifetime; searches from several task threads take turns on it.
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._db_lock = threading.Lock()
+        self._initialize_db()
+
+    def _initialize_db(self):
+        with self._db_lock, self._conn as conn:
+            conn.executescript("""
+            CREATE TABLE IF NOT EXISTS papers (
+              id TEXT PRIMARY KEY,
+              title TEXT,
+              authors TEXT,
+              summary TEXT,
+              categories TEXT,
+              published TEXT,
+              updated TEXT,
+              pdf_url TEXT,
+              fetched REAL
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+              title, summary, authors, content='papers', content_rowid='rowid'
+            );
+            CREATE TRIGGER IF NOT EXISTS papers_ai AFTER INSERT ON papers BEGIN
+              INSERT INTO papers_fts (rowid, title, summary, authors) VALUES (new.rowid, new.title, new.summary, new.authors);
+            END;
+            CREATE TRIGGER IF NOT EXISTS papers_ad AFTER DELETE ON papers BEGIN
+              INSERT INTO papers_fts (papers_fts, rowid, title, summary, authors)
+              VALUES ('delete', old.rowid, old.title, old.summary, old.authors);
+            END;
+            CREATE TRIGGER IF NOT EXISTS papers_au AFTER UPDATE ON papers BEGIN
+              INSERT INTO papers_fts (papers_fts, rowid, title, summary, authors)
+              VALUES ('delete', old.rowid, old.title, old.summary, old.authors);
+              INSERT INTO papers_fts (rowid, title, summary, authors) VALUES (new.rowid, new.title, new.summary, new.authors);
+            END;
+            CREATE TABLE IF NOT EXISTS queries (
+              query TEXT PRIMARY KEY,
+              max_results INTEGER,
+              ids TEXT,
+              fetched REAL
+            );
+            """)
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def _fts_query(query: str) -> str:
+        # Drop arXiv field prefixes and boolean operators; every remaining term must match.
+        query = re.sub(r"\b(?:ti|au|abs|co|jr|cat|rn|id|all):", " ", query)
+        terms = [t for t in re.findall(r"\w+", query) if t not in ("AND", "OR", "ANDNOT")]
+        return " ".join(f'"{t}"' for t in terms)
+
+    @staticmethod
+    def _paper(result) -> dict:
+        return {
+            "id": result.entry_id,
+            "title": result.title,
+            "authors": [author.name for author in result.authors],
+            "summary": result.summary,
+            "categories": list(getattr(result, "categories", []) or []),
+            "published": result.published.strftime("%Y-%m-%d"),
+            "updated": result.updated.strftime("%Y-%m-%d") if getattr(result, "updated", None) else None,
+            "pdf_url": result.pdf_url
+        }
+
+    def _load(self, conn, ids: list[str]) -> list[dict]:
+        if not ids:
+            return []
+        rows = conn.execute(
+            f"SELECT id, title, authors, summary, categories, published, updated, pdf_url FROM papers "
+            f"WHERE id IN ({','.join('?' * len(ids))})", ids
+        ).fetchall()
+        by_id = {row[0]: row for row in rows}
+        papers = []
+        for paper_id in ids:
+            if paper_id in by_id:
+                _, title, authors, summary, categories, published, updated, pdf_url = by_id[paper_id]
+                papers.append({"id": paper_id, "title": title, "authors": json.loads(authors), "summary": summary,
+                               "categories": json.loads(categories), "published": published,
+                               "updated": updated, "pdf_url": pdf_url})
+        return papers
+
+    def lookup(self, query: str, max_results: int = 5) -> list[dict] | None:
+        """Returns the cached papers for `query`, or None when it has to be fetched."""
+        fresh = time.time() - self.ttl_sec
+        with self._db_lock:
+            conn = self._conn
+            row = conn.execute("SELECT max_results, ids FROM queries WHERE query = ? AND fetched >= ?",
+                               (self._normalize(query), fresh)).fetchone()
+            if row:
+                ids = json.loads(row[1])
+                # A cached query answers any request for at most as many results,
+                # and any request at all when arXiv had no more to give.
+                if row[0] >= max_results or len(ids) < row[0]:
+                    self.hits += 1
+                    return self._load(conn, ids[:max_results])
+            match = self._fts_query(query)
+            if not match:
+                return None
+            ids = [r[0] for r in conn.execute(
+                "SELECT papers.id FROM papers_fts JOIN papers ON papers.rowid = papers_fts.rowid "
+                "WHERE papers_fts MATCH ? AND papers.fetched >= ? ORDER BY bm25(papers_fts) LIMIT ?",
+                (match, fresh, max_results)
+            )]
+            if len(ids) < max_results:
+                return None
+            self.fts_hits += 1
+            return self._load(conn, ids)
+
+    def _wait_turn(self):
+        with self._rate_lock:
+            wait = self._next_request - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._next_request = time.monotonic() + self.delay_sec
+
+    def _fetch(self, query: str, max_results: int) -> list[dict]:
+        self._wait_turn()
+        search = arxiv.Search(query=query, max_results=max_results)
+        papers = [self._paper(result) for result in self.client.results(search)]
+        self.fetches += 1
+        return papers
+
+    def _store(self, fetched: dict[str, tuple[int, list[dict]]]):
+        now = time.time()
+        with self._db_lock, self._conn as conn:
+            for query, (max_results, papers) in fetched.items():
+                conn.executemany(
+                    "INSERT INTO papers (id, title, authors, summary, categories, published, updated, pdf_url, fetched) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(id) DO UPDATE SET title = excluded.title, "
+                    "authors = excluded.authors, summary = excluded.summary, categories = excluded.categories, "
+                    "published = excluded.published, updated = excluded.updated, pdf_url = excluded.pdf_url, "
+                    "fetched = excluded.fetched",
+                    [(p["id"], p["title"], json.dumps(p["authors"]), p["summary"], json.dumps(p["categories"]),
+                      p["published"], p["updated"], p["pdf_url"], now) for p in papers]
+                )
+                conn.execute("INSERT OR REPLACE INTO queries (query, max_results, ids, fetched) VALUES (?, ?, ?, ?)",
+                             (query, max_results, json.dumps([p["id"] for p in papers]), now))
+
+    def _push(self, papers: list[dict]):
+        if self.knowledge_stack is None or not papers:
+            return
+        try:
+            self.knowledge_stack.add_many(
+                (p["id"], p["title"], f"{', '.join(p['authors'])} ({p['published']})\n\n{p['summary']}") for p in papers
+            )
+        except Exception as e:
+            self.logger.warning(f"Could not add {len(papers)} arXiv papers to the knowledge stack: {e}")
+
+    def search_many(self, queries: list[str], max_results: int = 5) -> dict[str, list[dict] | Exception]:
+        """
+        Answers each query from the cache where possible and fetches the rest
+        concurrently. Maps every query to its papers, or to the exception its fetch raised.
+        """
+        results, missing = {}, {}
+        for query in queries:
+            cached = self.lookup(query, max_results)
+            if cached is not None:
+                results[query] = cached
+            else:
+                missing.setdefault(self._normalize(query), []).append(query)
+
+        fetched = {}
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                futures = {executor.submit(self._fetch, originals[0], max_results): normalized
+                           for normalized, originals in missing.items()}
+                for future in as_completed(futures):
+                    normalized = futures[future]
+                    try:
+                        fetched[normalized] = (max_results, future.result())
+                    except Exception as e:
+                        self.logger.warning(f"arXiv search failed for '{normalized}': {e}")
+                        for query in missing[normalized]:
+                            results[query] = e
+            self._store(fetched)
+            new_papers = {p["id"]: p for _, papers in fetched.values() for p in papers}
+            self._push(list(new_papers.values()))
+
+        for normalized, (_, papers) in fetched.items():
+            for query in missing[normalized]:
+                results[query] = papers
+        return {query: results[query] for query in queries}
+
+    def stats(self) -> dict:
+        with self._db_lock:
+            papers = self._conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+            queries = self._conn.execute("SELECT COUNT(*) FROM queries").fetchone()[0]
+        return {"papers": papers, "queries": queries, "hits": self.hits,
+                "fts_hits": self.fts_hits, "fetches": self.fetches}
+
+    def close(self):
+        with self._db_lock:
+            self._conn.close()
+
+_arxiv_cache = None
+_arxiv_cache_lock = threading.Lock()
+
+def get_arxiv_cache() -> ArxivCache:
+    global _arxiv_cache
+    with _arxiv_cache_lock:
+        if _arxiv_cache is None:
+            _arxiv_cache = ArxivCache(
+                os.path.expanduser("~/.skyscope_unified/arxiv/arxiv.db"),
+                ttl_sec=float(os.getenv("SKYSCOPE_ARXIV_TTL_SEC", "86400")),
+                max_workers=int(os.getenv("SKYSCOPE_ARXIV_WORKERS", "4"))
+            )
+        return _arxiv_cache
+
+def shutdown_arxiv_cache():
+    global _arxiv_cache
+    if _arxiv_cache:
+        _arxiv_cache.close()
+        _arxiv_cache = None
+
+def _brief(papers: list[dict]) -> list[dict]:
+    return [{
+        "id": p["id"],
+        "title": p["title"],
+        "authors": p["authors"],
+        "summary": p["summary"][:500] + '...', # Truncate for brevity
+        "published": p["published"],
+        "pdf_url": p["pdf_url"]
+    } for p in papers]
 
 @tool
 def arxiv_search(query: str, max_results: int = 5) -> str:
-    """Searches for research papers on Arxiv and returns a JSON string of the results."""
+    """
+    Searches for research papers on Arxiv and returns a JSON string of the results.
+    Recent searches are answered from a local cache.
+
+    Args:
+        query: The Arxiv search query.
+        max_results: Maximum number of papers returned.
+    """
     try:
-        search = arxiv.Search(query=query, max_results=max_results)
-        results = []
-        for result in search.results():
-            results.append({
-                "title": result.title,
-                "authors": [author.name for author in result.authors],
-                "summary": result.summary[:500] + '...', # Truncate for brevity
-                "published": result.published.strftime("%Y-%m-%d"),
-                "pdf_url": result.pdf_url
-            })
-        if not results:
+        papers = get_arxiv_cache().search_many([query], max_results)[query]
+        if isinstance(papers, Exception):
+            raise papers
+        if not papers:
             return "No papers found for the given query."
-        return json.dumps(results, indent=2)
+        return json.dumps(_brief(papers), indent=2)
+    except Exception as e:
+        return f"Error searching Arxiv: {str(e)}"
+
+@tool
+def arxiv_search_many(queries: list[str], max_results: int = 5) -> str:
+    """
+    Runs several Arxiv searches at once and returns a JSON object mapping each query to its results.
+
+    Args:
+        queries: The Arxiv search queries.
+        max_results: Maximum number of papers returned per query.
+    """
+    try:
+        results = get_arxiv_cache().search_many(queries, max_results)
+        return json.dumps({
+            query: f"Error searching Arxiv: {papers}" if isinstance(papers, Exception) else _brief(papers)
+            for query, papers in results.items()
+        }, indent=2)
     except Exception as e:
         return f"Error searching Arxiv: {str(e)}"